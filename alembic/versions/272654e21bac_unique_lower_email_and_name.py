@@ -0,0 +1,51 @@
+"""unique lower(email) and lower(name)
+
+Revision ID: 272654e21bac
+Revises: 9b6986345462
+Create Date: 2026-10-17 15:21:48.530617
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '272654e21bac'
+down_revision = '9b6986345462'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Build the indexes without locking the tables against writes. Emails or
+    # names differing only in case must be merged first, or the build fails
+    # and leaves an invalid index to drop before retrying.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_user_lower_email',
+            'user',
+            [sa.text('lower(email)')],
+            unique=True,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_institution_lower_name',
+            'institution',
+            [sa.text('lower(name)')],
+            unique=True,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_institution_lower_name',
+            table_name='institution',
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            'ix_user_lower_email',
+            table_name='user',
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,36 @@
+"""index user.institution_id
+
+Revision ID: 5c1f3a9e7b42
+Revises: 1e255e637a9d
+Create Date: 2026-10-17 10:12:04.518233
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '5c1f3a9e7b42'
+down_revision = '1e255e637a9d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Build the index without locking the table against writes
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_user_institution_id',
+            'user',
+            ['institution_id', 'id'],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_user_institution_id',
+            table_name='user',
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,33 @@
+"""add version_id to user and institution
+
+Revision ID: 9b6986345462
+Revises: 5c1f3a9e7b42
+Create Date: 2026-10-17 14:02:37.118402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b6986345462'
+down_revision = '5c1f3a9e7b42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # A constant default is stored in the catalog, without rewriting the rows
+    op.add_column(
+        'institution',
+        sa.Column('version_id', sa.Integer(), server_default=sa.text('1'), nullable=False),
+    )
+    op.add_column(
+        'user',
+        sa.Column('version_id', sa.Integer(), server_default=sa.text('1'), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('user', 'version_id')
+    op.drop_column('institution', 'version_id')
@@ -0,0 +1,220 @@
+import csv
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple, Type
+
+from fastapi import HTTPException, Request, status
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.base import AsyncCRUDBase
+
+CSV_MEDIA_TYPE = "text/csv"
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/jsonl")
+BULK_DESCRIPTION = (
+    f"Upload records as CSV (`{CSV_MEDIA_TYPE}`, with a header row) or as "
+    f"newline-delimited JSON (`{NDJSON_MEDIA_TYPES[0]}`). Records are validated "
+    "and saved in chunks as they are received."
+)
+INVALID_UTF8 = "Not valid UTF-8"
+
+
+async def iter_lines(request: Request) -> AsyncIterator[bytes]:
+    """
+    Iterate over the lines of a request body as it is received.
+
+    #### Parameters:
+        `request`: The request to read.
+
+    #### Returns:
+        The lines, without their line endings. They are decoded by the
+        caller, so that a line that is not valid UTF-8 only fails its record.
+    """
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.rstrip(b"\r")
+    if buffer:
+        yield buffer.rstrip(b"\r")
+
+
+async def iter_records(
+    request: Request,
+) -> AsyncIterator[Tuple[int, Optional[Dict[str, Any]], Optional[str]]]:
+    """
+    Parse the records of a CSV or NDJSON request body as it is received.
+
+    #### Parameters:
+        `request`: The request to parse.
+
+    #### Returns:
+        Tuples of the record number, and either the record or the reason it
+        could not be parsed.
+
+    #### Raises:
+        `HTTPException`: If the content type is not supported, or the CSV
+        header row is not valid UTF-8.
+    """
+    media_type = request.headers.get("content-type", "").split(";")[0].strip()
+    number = 0
+    if media_type in NDJSON_MEDIA_TYPES:
+        async for raw in iter_lines(request):
+            if not raw.strip():
+                continue
+            number += 1
+            try:
+                line = raw.decode()
+            except UnicodeDecodeError:
+                yield number, None, INVALID_UTF8
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield number, None, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(record, dict):
+                yield number, None, "Expected a JSON object"
+                continue
+            yield number, record, None
+    elif media_type == CSV_MEDIA_TYPE:
+        header: Optional[List[str]] = None
+        pending = ""
+        async for raw in iter_lines(request):
+            try:
+                line = raw.decode()
+            except UnicodeDecodeError:
+                if header is None:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail=f"Header row: {INVALID_UTF8}",
+                    )
+                # The line fails the record it starts or continues
+                number += 1
+                pending = ""
+                yield number, None, INVALID_UTF8
+                continue
+            # A quoted field may span several lines, in which case its record
+            # has an odd number of quotes until its last line is read.
+            pending = f"{pending}\n{line}" if pending else line
+            if pending.count('"') % 2:
+                continue
+            values = next(csv.reader([pending]), [])
+            pending = ""
+            if not values:
+                continue
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            number += 1
+            if len(values) != len(header):
+                yield number, None, f"Expected {len(header)} fields, got {len(values)}"
+                continue
+            # Empty CSV fields stand for missing values
+            yield number, {k: v for k, v in zip(header, values) if v != ""}, None
+        if pending:
+            yield number + 1, None, "Unterminated quoted field"
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Expected {CSV_MEDIA_TYPE} or {NDJSON_MEDIA_TYPES[0]} content",
+        )
+
+
+async def import_records(
+    request: Request,
+    db: AsyncSession,
+    *,
+    crud: AsyncCRUDBase,
+    schema: Type[BaseModel],
+    key: str,
+    upsert: bool = False,
+    chunk_size: int = 500,
+) -> Dict[str, Any]:
+    """
+    Validate the records of an upload and save them in chunks.
+
+    Records conflicting with an existing row on `key` are updated if `upsert`
+    is set, and reported as errors otherwise. When a chunk fails on another
+    constraint, its records are saved again one at a time, from the column
+    values converted for the chunk (so passwords are hashed once), and only
+    the ones violating it are reported.
+
+    #### Parameters:
+        * `request`: The request carrying the upload.
+        * `db`: The SQLAlchemy async session.
+        * `crud`: The CRUD object of the model to import.
+        * `schema`: The Pydantic model to validate the records with.
+        * `key`: The uniquely constrained field that identifies a record.
+        * `upsert`: Whether to update existing rows.
+        * `chunk_size`: The number of records saved at once.
+
+    #### Returns:
+        `dict`: The number of imported records and the errors per record.
+    """
+    imported = 0
+    errors: List[Dict[str, Any]] = []
+    chunk: List[Tuple[int, BaseModel]] = []
+    # The keys of the records of the chunk, as their unique index compares them
+    chunk_keys: Set[Any] = set()
+
+    async def save(
+        records: List[Tuple[int, BaseModel]], rows: List[Dict[str, Any]]
+    ) -> None:
+        nonlocal imported
+        saved = await crud.upsert_multi(
+            db,
+            objs_in=rows,
+            index_elements=[key],
+            update_fields=None if upsert else (),
+        )
+        imported += len(saved)
+        saved_keys = {crud.crud.unique_key(key, getattr(obj, key)) for obj in saved}
+        errors.extend(
+            {"row": number, "detail": f"A record with this {key} already exists"}
+            for number, obj_in in records
+            if crud.crud.unique_key(key, getattr(obj_in, key)) not in saved_keys
+        )
+
+    async def flush() -> None:
+        rows = await crud.to_rows([obj_in for _, obj_in in chunk])
+        try:
+            await save(chunk, rows)
+        except IntegrityError:
+            await db.rollback()
+            # Save the records one at a time, so that only the ones violating
+            # a constraint fail
+            for record, row in zip(chunk, rows):
+                try:
+                    await save([record], [row])
+                except IntegrityError as e:
+                    await db.rollback()
+                    detail = crud.crud.violation_detail(e)
+                    errors.append({"row": record[0], "detail": detail})
+        chunk.clear()
+        chunk_keys.clear()
+
+    async for number, record, error in iter_records(request):
+        if error is not None:
+            errors.append({"row": number, "detail": error})
+            continue
+        try:
+            obj_in = schema(**record)
+        except ValidationError as e:
+            detail = "; ".join(
+                f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()
+            )
+            errors.append({"row": number, "detail": detail})
+            continue
+        # A statement cannot insert and then update the same row
+        record_key = crud.crud.unique_key(key, getattr(obj_in, key))
+        if record_key in chunk_keys:
+            await flush()
+        chunk.append((number, obj_in))
+        chunk_keys.add(record_key)
+        if len(chunk) >= chunk_size:
+            await flush()
+    if chunk:
+        await flush()
+    return {"imported": imported, "errors": errors}
@@ -0,0 +1,125 @@
+"""
+Conditional requests, see RFC 9110 section 13.
+
+Entities are tagged with the version of their rows, incremented by every
+update, and lists with a hash of their body. A GET whose `If-None-Match`
+header matches the tag of the representation gets an empty 304 response,
+and a PUT whose `If-Match` header does not gets a 412, so that clients
+polling an entity do not download it again, and clients updating one do not
+overwrite the changes they have not seen.
+"""
+import hashlib
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException, Request, Response, status
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import inspect
+
+# Responses depend on the user and must be revalidated before being reused
+CACHE_CONTROL = "private, no-cache"
+
+
+def entity_tag(*objs: Any) -> str:
+    """
+    Tag the representation of model instances with the versions of their
+    rows.
+
+    #### Parameters:
+        `objs`: The instances the representation shows, None ones skipped.
+
+    #### Returns:
+        `str`: The strong entity tag.
+    """
+    versions = []
+    for obj in objs:
+        if obj is None:
+            continue
+        mapper = inspect(obj).mapper
+        version = mapper.get_property_by_column(mapper.version_id_col).key
+        versions.append(f"{mapper.local_table.name}.{obj.id}.{getattr(obj, version)}")
+    return f'"{"-".join(versions)}"'
+
+
+def body_tag(body: bytes) -> str:
+    """
+    Tag a representation with a hash of its body.
+
+    #### Parameters:
+        `body`: The body of the response.
+
+    #### Returns:
+        `str`: The strong entity tag.
+    """
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def _matches(header: Optional[str], etag: str, *, weak: bool) -> bool:
+    if header is None:
+        return False
+    for tag in (tag.strip() for tag in header.split(",")):
+        if tag == "*":
+            return True
+        if weak and tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+def conditional(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """
+    Tag the response to a GET, or answer it with 304 Not Modified if the
+    client already has the representation.
+
+    #### Parameters:
+        * `request`: The request.
+        * `response`: The response whose headers the route sets.
+        * `etag`: The entity tag of the representation.
+
+    #### Returns:
+        `Response`: The 304 response, or None if the representation must be
+        sent.
+    """
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": "Authorization"}
+    if _matches(request.headers.get("if-none-match"), etag, weak=True):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
+def conditional_json(
+    request: Request, content: Any, headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """
+    Serialize content to JSON, tagged with a hash of the body, or answer
+    with 304 Not Modified if the client already has it.
+
+    #### Parameters:
+        * `request`: The request.
+        * `content`: The content of the response.
+        * `headers`: The other headers of the response.
+
+    #### Returns:
+        `Response`: The JSON or 304 response.
+    """
+    response = ORJSONResponse(content, headers=headers)
+    return conditional(request, response, body_tag(response.body)) or response
+
+
+def check_if_match(request: Request, etag: str) -> None:
+    """
+    Check that the client updates the representation it has.
+
+    #### Parameters:
+        * `request`: The request.
+        * `etag`: The entity tag of the current representation.
+
+    #### Raises:
+        `HTTPException`: If the `If-Match` header is set and does not match.
+    """
+    if_match = request.headers.get("if-match")
+    if if_match is not None and not _matches(if_match, etag, weak=False):
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="The resource was modified since it was read",
+        )
@@ -1,82 +1,158 @@
 import os
-from fastapi import Depends, HTTPException, status
+from typing import Any, AsyncGenerator, Callable, Coroutine, Tuple, Type
+
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 
-from jose import JWTError, jwt
+from jose import JWTError
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.interfaces import ORMOption
 
 from pydantic import ValidationError
 
-from app import crud
-from app.data import models, schemas
+from app import crud, models
 from app.core import security
-from app.core.config import settings
-from app.db.session import SessionLocal
+from app.core.principal import Principal, principal_cache
+from app.crud.loading import loader_options
+from app.db.session import AsyncSessionLocal, RoutingSessionLocal, replica_router
 
 # Other constants
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
+# Pagination of list endpoints
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TOTAL_COUNT_HEADER = "X-Total-Count"
+CURSOR_DESCRIPTION = (
+    f"Opaque cursor from the `{NEXT_CURSOR_HEADER}` response header of the "
+    "previous page. The header is omitted on the last page."
+)
+ORDER_BY_DESCRIPTION = (
+    "Column to order cursor pages by, prefixed with `-` for descending order."
+)
+
+
+# Methods of the requests that only read, see `get_db`
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
 
-def get_db():
+
+async def get_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
     """
-    Create and return a SQLAlchemy session.
+    Create and return an asynchronous SQLAlchemy session.
+
+    Requests with a safe method read from a replica lagging behind the
+    primary within the tolerance, if any, until they write, see
+    `app.db.replicas.RoutingSession`. Other requests use the primary only.
+
+    #### Parameters:
+        `request`: The request.
 
     #### Returns:
-        `Session`: The SQLAlchemy session object.
+        `AsyncSession`: The SQLAlchemy async session object.
     """
-    try:
-        db = SessionLocal()
+    if request.method in SAFE_METHODS and (replica := await replica_router.pick()):
+        async with RoutingSessionLocal(replica=replica.sync_engine) as db:
+            yield db
+        return
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
-def get_current_user(
-    db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)
-) -> models.User:
+def response_loader_options(
+    model: Type[Any],
+) -> Callable[[Request], Coroutine[Any, Any, Tuple[ORMOption, ...]]]:
     """
-    Get the current user based on the provided token.
+    Create a dependency providing the loader options that load every
+    relationship of `model` serialized by the `response_model` of the route.
+
+    #### Parameters:
+        `model`: The SQLAlchemy model the route reads.
+
+    #### Returns:
+        The dependency, see `app.crud.loading.loader_options`.
+    """
+
+    async def get_loader_options(request: Request) -> Tuple[ORMOption, ...]:
+        route = request.scope.get("route")
+        return loader_options(model, getattr(route, "response_model", None))
+
+    return get_loader_options
+
+
+async def get_current_principal(
+    db: AsyncSession = Depends(get_db), token: str = Depends(oauth2_scheme)
+) -> Principal:
+    """
+    Get the principal of the current user based on the provided token.
+
+    Principals are cached by user ID, so most requests authenticate without
+    a database round trip.
 
     #### Parameters:
         `db`: The SQLAlchemy session.
         `token`: The OAuth2 token.
 
     #### Returns:
-        `models.User`: The current user.
+        `Principal`: The snapshot of the current user.
 
     #### Raises:
         `HTTPException`: If the token is invalid or the user is not found.
     """
     try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
-        )
-        token_data = schemas.TokenPayload(**payload)
+        token_data = security.decode_access_token(token)
     except (JWTError, ValidationError):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
-    user = crud.user.get(db, id=token_data.sub)
+    if (principal := principal_cache.get(token_data.sub)) is not None:
+        return principal
+    user = await crud.async_user.get(db, id=token_data.sub)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="User not found"
         )
-    return user
+    principal = Principal.from_user(user)
+    principal_cache.set(user.id, principal)
+    return principal
 
 
-def get_current_active_user(
-    current_user: models.User = Depends(get_current_user),
+async def get_current_user(
+    db: AsyncSession = Depends(get_db),
+    principal: Principal = Depends(get_current_principal),
 ) -> models.User:
+    """
+    Get the current user based on the provided token.
+
+    #### Parameters:
+        `db`: The SQLAlchemy session.
+        `principal`: The principal of the current user.
+
+    #### Returns:
+        `models.User`: The current user.
+
+    #### Raises:
+        `HTTPException`: If the token is invalid or the user is not found.
+    """
+    user = await crud.async_user.get(db, id=principal.id)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="User not found"
+        )
+    return user
+
+
+async def get_current_active_user(
+    current_user: Principal = Depends(get_current_principal),
+) -> Principal:
     """
     Get the current active user.
 
     #### Parameters:
-        `current_user`: The current user.
+        `current_user`: The principal of the current user.
 
     #### Returns:
-        `models.User`: The current active user.
+        `Principal`: The principal of the current active user.
 
     #### Raises:
         `HTTPException`: If the user is not active.
@@ -88,17 +164,17 @@ def get_current_active_user(
     return current_user
 
 
-def get_if_admin_privileges(
-    current_user: models.User = Depends(get_current_active_user),
-) -> models.User:
+async def get_if_admin_privileges(
+    current_user: Principal = Depends(get_current_active_user),
+) -> Principal:
     """
     Get the current user with admin privileges.
 
     #### Parameters:
-        `current_user`: The current user.
+        `current_user`: The principal of the current user.
 
     #### Returns:
-        `models.User`: The current user with admin privileges.
+        `Principal`: The principal of the current user with admin privileges.
 
     #### Raises:
         `HTTPException`: If the user does not have admin privileges.
@@ -111,17 +187,17 @@ def get_if_admin_privileges(
     return current_user
 
 
-def get_current_active_superuser(
-    current_user: models.User = Depends(get_current_active_user),
-) -> models.User:
+async def get_current_active_superuser(
+    current_user: Principal = Depends(get_current_active_user),
+) -> Principal:
     """
     Get the current active superuser.
 
     #### Parameters:
-        `current_user`: The current user.
+        `current_user`: The principal of the current user.
 
     #### Returns:
-        `models.User`: The current active superuser.
+        `Principal`: The principal of the current active superuser.
 
     #### Raises:
         `HTTPException`: If the user is not a superuser.
@@ -0,0 +1,132 @@
+import csv
+import io
+import json
+from enum import Enum
+from typing import AsyncIterator, List, Optional, Sequence
+
+from fastapi import HTTPException, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import ColumnElement
+from sqlalchemy.ext.asyncio import AsyncResult, AsyncSession
+
+from app.crud.base import AsyncCRUDBase
+
+EXPORT_DESCRIPTION = (
+    "Download every matching record as CSV (with a header row) or as "
+    "newline-delimited JSON. Records are read from a server-side cursor and "
+    "sent as they are fetched."
+)
+COLUMNS_DESCRIPTION = "Comma separated columns to export. Defaults to all of them."
+
+
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+EXPORT_MEDIA_TYPES = {
+    ExportFormat.ndjson: "application/x-ndjson",
+    ExportFormat.csv: "text/csv",
+}
+
+
+def parse_columns(columns: Optional[str]) -> Optional[List[str]]:
+    """
+    Parse a comma separated list of columns.
+
+    #### Parameters:
+        `columns`: The list of columns, if any.
+
+    #### Returns:
+        The column names, or None to export all of them.
+    """
+    if columns is None:
+        return None
+    return [column.strip() for column in columns.split(",") if column.strip()] or None
+
+
+async def iter_ndjson(result: AsyncResult) -> AsyncIterator[str]:
+    """
+    Serialize the rows of a result as newline-delimited JSON.
+
+    #### Parameters:
+        `result`: The result to serialize.
+
+    #### Returns:
+        One chunk of lines per batch of rows fetched from the cursor.
+    """
+    async for partition in result.partitions():
+        yield "".join(
+            json.dumps(dict(row._mapping), default=str) + "\n" for row in partition
+        )
+
+
+async def iter_csv(result: AsyncResult) -> AsyncIterator[str]:
+    """
+    Serialize the rows of a result as CSV, starting with a header row.
+
+    #### Parameters:
+        `result`: The result to serialize.
+
+    #### Returns:
+        The header, then one chunk of lines per batch of rows fetched from the
+        cursor.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(result.keys())
+    async for partition in result.partitions():
+        writer.writerows(partition)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+async def export_records(
+    db: AsyncSession,
+    *,
+    crud: AsyncCRUDBase,
+    name: str,
+    format: ExportFormat,
+    columns: Optional[str] = None,
+    filters: Sequence[ColumnElement[bool]] = (),
+    batch_size: int = 1000,
+) -> StreamingResponse:
+    """
+    Stream the records of a model as a file download.
+
+    The query is executed before the response starts, so that invalid columns
+    are reported with a proper status code rather than a truncated download.
+
+    #### Parameters:
+        * `db`: The SQLAlchemy async session, which must stay open until the
+          response is sent.
+        * `crud`: The CRUD object of the model to export.
+        * `name`: The base name of the downloaded file.
+        * `format`: The format of the download.
+        * `columns`: Comma separated columns to export.
+        * `filters`: Criteria the records must match.
+        * `batch_size`: The number of records fetched from the cursor at once.
+
+    #### Returns:
+        `StreamingResponse`: The download.
+
+    #### Raises:
+        `HTTPException`: If a column cannot be exported.
+    """
+    try:
+        result = await crud.stream(
+            db, columns=parse_columns(columns), filters=filters, batch_size=batch_size
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    content = iter_csv(result) if format is ExportFormat.csv else iter_ndjson(result)
+    return StreamingResponse(
+        content,
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{name}.{format.value}"'
+        },
+    )
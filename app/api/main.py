@@ -1,13 +1,42 @@
-from fastapi import FastAPI
+import logging
+import os
+import time
+
+from fastapi import FastAPI, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Gauge,
+    generate_latest,
+)
+from prometheus_client.multiprocess import MultiProcessCollector
+from sqlalchemy.orm.exc import StaleDataError
+
+from app.api.deps import NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER
+from app.api.middleware import MetricsMiddleware
+from app.core.config import settings
+from app.api.routers import admin, users, auth, health, institutions
+from app.core.security import PasswordHashingOverloaded, password_hasher
+
+logger = logging.getLogger(__name__)
 
-from app.api.routers import users, auth, institutions
+COLD_START = Gauge(
+    "process_cold_start_seconds",
+    "Seconds from the start of the container to the application being ready.",
+    # The slowest of the running workers
+    multiprocess_mode="livemax",
+)
 
 app = FastAPI()
 
 app.include_router(users.router)
 app.include_router(auth.router)
 app.include_router(institutions.router)
+app.include_router(admin.router)
+app.include_router(health.router)
 
 origins = ["*"]
 
@@ -17,8 +46,60 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER, "ETag"],
 )
+app.add_middleware(MetricsMiddleware)
+
+@app.exception_handler(PasswordHashingOverloaded)
+async def password_hashing_overloaded_handler(
+    request: Request, exc: PasswordHashingOverloaded
+) -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "The server is busy, please try again shortly"},
+        headers={"Retry-After": "1"},
+    )
+
+
+@app.exception_handler(StaleDataError)
+async def stale_data_handler(request: Request, exc: StaleDataError) -> JSONResponse:
+    # Another request updated the row between the read and the update
+    if "if-match" in request.headers:
+        status_code = status.HTTP_412_PRECONDITION_FAILED
+    else:
+        status_code = status.HTTP_409_CONFLICT
+    return JSONResponse(
+        status_code=status_code,
+        content={"detail": "The resource was modified since it was read"},
+    )
+
+
+@app.on_event("startup")
+def report_cold_start() -> None:
+    if settings.STARTED_AT is None:
+        return
+    cold_start = time.time() - settings.STARTED_AT
+    COLD_START.set(cold_start)
+    logger.info("Application ready %.2fs after the container started", cold_start)
+
+
+@app.on_event("shutdown")
+def shutdown_password_hasher() -> None:
+    password_hasher.shutdown()
+
 
 @app.get("/ping")
 def pong():
-    return {"ping": "pong!"}
\ No newline at end of file
+    return {"ping": "pong!"}
+
+
+@app.get("/metrics", include_in_schema=False)
+def read_metrics() -> Response:
+    registry = REGISTRY
+    # Under gunicorn, merge the metrics the workers record in the directory
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+    return Response(
+        generate_latest(registry), headers={"Content-Type": CONTENT_TYPE_LATEST}
+    )
@@ -0,0 +1,92 @@
+import time
+
+from prometheus_client import Counter, Gauge, Histogram
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.db.metrics import track_queries
+
+# Label of the requests that did not match any route, so that arbitrary paths
+# do not each create new samples
+UNMATCHED_ROUTE = "<unmatched>"
+
+REQUESTS = Counter(
+    "http_requests_total",
+    "Number of HTTP requests handled.",
+    ("method", "route", "status"),
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "Number of HTTP requests being handled.",
+    ("method",),
+    multiprocess_mode="livesum",
+)
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time spent handling HTTP requests, until the response is fully sent.",
+    ("method", "route"),
+)
+REQUEST_DB_STATEMENTS = Histogram(
+    "http_request_db_statements",
+    "Number of SQL statements executed per HTTP request.",
+    ("method", "route"),
+    buckets=(0, 1, 2, 3, 5, 10, 25, 50, 100),
+)
+REQUEST_DB_DURATION = Histogram(
+    "http_request_db_duration_seconds",
+    "Time spent executing SQL statements per HTTP request.",
+    ("method", "route"),
+)
+
+
+class MetricsMiddleware:
+    """
+    Record the latency, status code and database usage of every HTTP request,
+    per route template, and enforce the budget of repeated statements.
+
+    #### Parameters:
+        `app`: The ASGI application to instrument.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        REQUESTS_IN_PROGRESS.labels(method=method).inc()
+        start = time.perf_counter()
+        try:
+            with track_queries(
+                repeat_budget=(
+                    None
+                    if settings.QUERY_BUDGET_MODE == "off"
+                    else settings.QUERY_REPEAT_BUDGET
+                ),
+                strict=settings.QUERY_BUDGET_MODE == "raise",
+            ) as queries:
+                await self.app(scope, receive, send_with_status)
+        finally:
+            duration = time.perf_counter() - start
+            REQUESTS_IN_PROGRESS.labels(method=method).dec()
+            # The router stores the matched route in the scope
+            route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+            REQUESTS.labels(method=method, route=route, status=str(status_code)).inc()
+            REQUEST_DURATION.labels(method=method, route=route).observe(duration)
+            REQUEST_DB_STATEMENTS.labels(method=method, route=route).observe(
+                queries.statements
+            )
+            REQUEST_DB_DURATION.labels(method=method, route=route).observe(
+                queries.duration
+            )
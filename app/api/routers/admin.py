@@ -0,0 +1,65 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Any, List
+
+from app import schemas
+from app.api.deps import get_current_active_superuser
+from app.core.principal import principal_cache
+from app.core.security import password_hasher, token_cache
+from app.db.pool import pool_stats
+from app.db.session import async_engine, replica_router
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"],
+    dependencies=[Depends(get_current_active_superuser)],
+)
+
+
+@router.get(
+    "/stats/password-hashing",
+    response_model=schemas.PasswordHashingStats,
+    summary="Get the queue and latency statistics of password hashing",
+)
+async def read_password_hashing_stats() -> Any:
+    return password_hasher.stats()
+
+
+@router.get(
+    "/stats/principal-cache",
+    response_model=schemas.CacheStats,
+    summary="Get the statistics of the authenticated user cache",
+)
+async def read_principal_cache_stats() -> Any:
+    return principal_cache.stats()
+
+
+@router.get(
+    "/stats/token-cache",
+    response_model=schemas.CacheStats,
+    summary="Get the statistics of the verified access token cache",
+)
+async def read_token_cache_stats() -> Any:
+    return token_cache.stats()
+
+
+@router.get(
+    "/stats/pool",
+    response_model=schemas.PoolStats,
+    summary="Get the live statistics of the database connection pool",
+)
+async def read_pool_stats() -> Any:
+    if (stats := pool_stats(async_engine.pool)) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="The connection pool is not instrumented",
+        )
+    return stats
+
+
+@router.get(
+    "/stats/replicas",
+    response_model=List[schemas.ReplicaStats],
+    summary="Get the lag of the read replicas, as last measured",
+)
+async def read_replica_stats() -> Any:
+    return replica_router.stats()
@@ -0,0 +1,32 @@
+from typing import Any
+
+from fastapi import APIRouter, Response, status
+
+from app import schemas
+from app.db.health import health_probe
+
+router = APIRouter(prefix="/health", tags=["health"])
+
+
+@router.get(
+    "/live",
+    response_model=schemas.Liveness,
+    summary="Check that the process is serving requests",
+)
+async def read_liveness() -> Any:
+    # Must not depend on the database, or its outages would restart every
+    # process at once
+    return {"status": "ok"}
+
+
+@router.get(
+    "/ready",
+    response_model=schemas.Readiness,
+    responses={status.HTTP_503_SERVICE_UNAVAILABLE: {"model": schemas.Readiness}},
+    summary="Check that the process can serve requests needing the database",
+)
+async def read_readiness(response: Response) -> Any:
+    readiness = await health_probe.status()
+    if not readiness["ready"]:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return readiness
@@ -1,9 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session
-from typing import Any, List
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, List, Optional
 
 from app import crud, schemas
+from app.api.bulk import BULK_DESCRIPTION, import_records
+from app.api.conditional import (
+    check_if_match,
+    conditional,
+    conditional_json,
+    entity_tag,
+)
+from app.api.export import (
+    COLUMNS_DESCRIPTION,
+    EXPORT_DESCRIPTION,
+    ExportFormat,
+    export_records,
+)
+from app.models.institution import Institution
+from app.core.principal import Principal
 from app.api.deps import (
+    CURSOR_DESCRIPTION,
+    NEXT_CURSOR_HEADER,
+    ORDER_BY_DESCRIPTION,
+    TOTAL_COUNT_HEADER,
     get_current_active_user,
     get_db,
     get_current_active_superuser,
@@ -16,46 +44,131 @@ router = APIRouter(prefix="/institutions", tags=["institution"])
 @router.get(
     "/", response_model=List[schemas.Institution], summary="Get all Institutions"
 )
-def read_all_institution_details(
-    db: Session = Depends(get_db),
+async def read_all_institution_details(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, gt=0),
-    superadmin: schemas.User = Depends(get_current_active_superuser),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    order_by: str = Query("id", description=ORDER_BY_DESCRIPTION),
+    superadmin: Principal = Depends(get_current_active_superuser),
 ) -> Any:
-    institutions = crud.institution.get_multi(db, skip=skip, limit=limit)
-    return institutions
+    if skip:
+        if cursor is not None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="`skip` cannot be combined with `cursor`",
+            )
+        return conditional_json(
+            request,
+            await crud.async_institution.get_multi_projected(
+                db, schema=schemas.Institution, skip=skip, limit=limit
+            ),
+        )
+    try:
+        (
+            institutions,
+            next_cursor,
+        ) = await crud.async_institution.get_multi_projected_by_cursor(
+            db,
+            schema=schemas.Institution,
+            cursor=cursor,
+            limit=limit,
+            order_by=order_by,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor is not None else None
+    return conditional_json(request, institutions, headers=headers)
 
 
 @router.post("/", response_model=schemas.Institution, summary="Create an Institution")
-def create_institution(
+async def create_institution(
     institution_in: schemas.InstitutionCreate,
-    db: Session = Depends(get_db),
-    sadmin: schemas.User = Depends(get_current_active_superuser),
+    db: AsyncSession = Depends(get_db),
+    sadmin: Principal = Depends(get_current_active_superuser),
 ) -> Any:
-    if crud.institution.get_by_name(db, name=institution_in.name) is not None:
+    try:
+        institution = await crud.async_institution.create(db, obj_in=institution_in)
+    except crud.DuplicateError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Institution with this name already exists",
         )
-    institution = crud.institution.create(db, obj_in=institution_in)
     return institution
 
 
+@router.post(
+    "/bulk",
+    response_model=schemas.BulkImportResult,
+    summary="Create Institutions in bulk from a CSV or NDJSON upload",
+    description=BULK_DESCRIPTION,
+)
+async def create_institutions_bulk(
+    request: Request,
+    upsert: bool = Query(
+        False, description="Update the Institutions whose name already exists."
+    ),
+    db: AsyncSession = Depends(get_db),
+    sadmin: Principal = Depends(get_current_active_superuser),
+) -> Any:
+    return await import_records(
+        request,
+        db,
+        crud=crud.async_institution,
+        schema=schemas.InstitutionCreate,
+        key="name",
+        upsert=upsert,
+    )
+
+
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    summary="Export Institutions as CSV or NDJSON",
+    description=EXPORT_DESCRIPTION,
+)
+async def export_institutions(
+    export_format: ExportFormat = Query(ExportFormat.ndjson, alias="format"),
+    columns: Optional[str] = Query(None, description=COLUMNS_DESCRIPTION),
+    membership: Optional[int] = None,
+    db: AsyncSession = Depends(get_db),
+    sadmin: Principal = Depends(get_current_active_superuser),
+) -> Any:
+    filters = []
+    if membership is not None:
+        filters.append(Institution.membership == membership)
+    return await export_records(
+        db,
+        crud=crud.async_institution,
+        name="institutions",
+        format=export_format,
+        columns=columns,
+        filters=filters,
+    )
+
+
 @router.get(
     "/me",
     response_model=schemas.Institution,
     summary="Get the currently logged-in user's Institution details",
 )
-def get_current_institution_details(
-    db: Session = Depends(get_db),
-    current_user: schemas.User = Depends(get_current_active_user),
+async def get_current_institution_details(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user),
 ) -> Any:
-    if current_user.institution is None:
+    if current_user.institution_id is None or not (
+        institution := await crud.async_institution.get(
+            db, id=current_user.institution_id
+        )
+    ):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="The user is not assigned to an institution.",
         )
-    return schemas.Institution.from_orm(current_user.institution)
+    return conditional(request, response, entity_tag(institution)) or institution
 
 
 @router.get(
@@ -63,17 +176,19 @@ def get_current_institution_details(
     response_model=schemas.Institution,
     summary="Get Institution by ID",
 )
-def read_institution_by_id(
+async def read_institution_by_id(
+    request: Request,
+    response: Response,
     institution_id: int,
-    db: Session = Depends(get_db),
-    current_user: schemas.User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user),
 ) -> Any:
-    if not (institution := crud.institution.get(db, id=institution_id)):
+    if not (institution := await crud.async_institution.get(db, id=institution_id)):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Institution with ID {institution_id} was not found",
         )
-    return institution
+    return conditional(request, response, entity_tag(institution)) or institution
 
 
 @router.get(
@@ -81,16 +196,51 @@ def read_institution_by_id(
     response_model=List[schemas.User],
     summary="Get all Users associated to a particular Institution",
 )
-def read_all_users_of_institution(
+async def read_all_users_of_institution(
+    request: Request,
     institution_id: int,
-    db: Session = Depends(get_db),
-    admin: schemas.User = Depends(get_if_admin_privileges),
-    skip: int = 0,
-    limit: int = 100,
+    db: AsyncSession = Depends(get_db),
+    admin: Principal = Depends(get_if_admin_privileges),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, gt=0),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    order_by: str = Query("id", description=ORDER_BY_DESCRIPTION),
+    include_total: bool = Query(
+        False,
+        description=f"Report the total number of users in the `{TOTAL_COUNT_HEADER}` "
+        "response header.",
+    ),
 ) -> Any:
-    return crud.institution.get_multi_user(
-        db, id=institution_id, skip=skip, limit=limit
-    )
+    if skip and cursor is not None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="`skip` cannot be combined with `cursor`",
+        )
+    try:
+        page = await crud.async_institution.get_multi_user(
+            db,
+            id=institution_id,
+            skip=skip,
+            limit=limit,
+            cursor=cursor,
+            order_by=order_by,
+            count_total=include_total,
+            schema=schemas.User,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if page is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Institution with ID {institution_id} was not found",
+        )
+    users, next_cursor, total = page
+    headers = {}
+    if next_cursor is not None:
+        headers[NEXT_CURSOR_HEADER] = next_cursor
+    if total is not None:
+        headers[TOTAL_COUNT_HEADER] = str(total)
+    return conditional_json(request, users, headers=headers)
 
 
 @router.put(
@@ -98,28 +248,34 @@ def read_all_users_of_institution(
     response_model=schemas.Institution,
     summary="Update an existing Institution.",
 )
-def update_institution(
+async def update_institution(
+    request: Request,
+    response: Response,
     institution_id: int,
     institution_in: schemas.InstitutionUpdate,
-    db: Session = Depends(get_db),
-    admin: schemas.User = Depends(get_if_admin_privileges),
+    db: AsyncSession = Depends(get_db),
+    admin: Principal = Depends(get_if_admin_privileges),
 ) -> Any:
-    if not (institution := crud.institution.get(db, id=institution_id)):
+    if not (institution := await crud.async_institution.get(db, id=institution_id)):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="The user with this username does not exist in the system",
         )
-    institution_update = crud.institution.update(db, db_obj=institution, obj_in=institution_in)
+    check_if_match(request, entity_tag(institution))
+    institution_update = await crud.async_institution.update(
+        db, db_obj=institution, obj_in=institution_in
+    )
+    response.headers["ETag"] = entity_tag(institution_update)
     return institution_update
 
 
 @router.delete("/{institution_id}", summary="Delete an existing Institution by its ID")
-def delete_institution(
+async def delete_institution(
     institution_id: int,
-    db: Session = Depends(get_db),
-    sadmin: schemas.User = Depends(get_current_active_superuser),
+    db: AsyncSession = Depends(get_db),
+    sadmin: Principal = Depends(get_current_active_superuser),
 ) -> Any:
-    if not crud.institution.remove(db, id=institution_id):
+    if not await crud.async_institution.remove(db, id=institution_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Institution with ID {institution_id} does not exist",
@@ -1,99 +1,225 @@
-from fastapi import APIRouter, Body, Depends, HTTPException, Query, status
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from fastapi.responses import StreamingResponse
 from pydantic import EmailStr
-from sqlalchemy.orm import Session
-from typing import Any, List
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.interfaces import ORMOption
+from typing import Any, List, Optional, Sequence
 
 from app import crud
 from app.core.config import settings
-from app import schemas, models
+from app import schemas
+from app.api.bulk import BULK_DESCRIPTION, import_records
+from app.api.conditional import (
+    check_if_match,
+    conditional,
+    conditional_json,
+    entity_tag,
+)
+from app.api.export import (
+    COLUMNS_DESCRIPTION,
+    EXPORT_DESCRIPTION,
+    ExportFormat,
+    export_records,
+)
+from app.models.user import User
+from app.core.principal import Principal
 from app.api.deps import (
+    CURSOR_DESCRIPTION,
+    NEXT_CURSOR_HEADER,
+    ORDER_BY_DESCRIPTION,
     get_current_user,
     get_db,
     get_current_active_superuser,
     get_if_admin_privileges,
+    response_loader_options,
 )
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 
+def duplicate_user_detail(error: crud.DuplicateError) -> str:
+    if error.field == "email":
+        return "The user with this username already exists in the system"
+    return f"The user with this {error.field} already exists in the system"
+
+
 @router.get("/", response_model=List[schemas.User], summary="Retrieve users")
-def read_users(
-    db: Session = Depends(get_db),
+async def read_users(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, gt=0),
-    sadmin: models.User = Depends(get_current_active_superuser),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    order_by: str = Query("id", description=ORDER_BY_DESCRIPTION),
+    sadmin: Principal = Depends(get_current_active_superuser),
 ) -> Any:
-    users = crud.user.get_multi(db, skip=skip, limit=limit)
-    return users
+    # Users are projected on the response model and serialized without being
+    # validated again
+    if skip:
+        if cursor is not None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="`skip` cannot be combined with `cursor`",
+            )
+        return conditional_json(
+            request,
+            await crud.async_user.get_multi_projected(
+                db, schema=schemas.User, skip=skip, limit=limit
+            ),
+        )
+    try:
+        users, next_cursor = await crud.async_user.get_multi_projected_by_cursor(
+            db, schema=schemas.User, cursor=cursor, limit=limit, order_by=order_by
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor is not None else None
+    return conditional_json(request, users, headers=headers)
 
 
 @router.post("/", response_model=schemas.User, summary="Create new user")
 async def create_user(
     user_in: schemas.UserCreate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_active_superuser),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_superuser),
 ) -> Any:
-    if crud.user.get_by_email(db, email=user_in.email):
+    user_in.enabled = True
+    try:
+        user = await crud.async_user.create(db, obj_in=user_in)
+    except crud.DuplicateError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="The user with this username already exists in the system.",
+            detail=duplicate_user_detail(e) + ".",
         )
-    user_in.enabled = True
-    user = crud.user.create(db, obj_in=user_in)
     return user
 
 
+@router.post(
+    "/bulk",
+    response_model=schemas.BulkImportResult,
+    summary="Create users in bulk from a CSV or NDJSON upload",
+    description=BULK_DESCRIPTION,
+)
+async def create_users_bulk(
+    request: Request,
+    upsert: bool = Query(
+        False, description="Update the users whose email already exists."
+    ),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_superuser),
+) -> Any:
+    return await import_records(
+        request,
+        db,
+        crud=crud.async_user,
+        schema=schemas.UserCreate,
+        key="email",
+        upsert=upsert,
+    )
+
+
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    summary="Export users as CSV or NDJSON",
+    description=EXPORT_DESCRIPTION,
+)
+async def export_users(
+    export_format: ExportFormat = Query(ExportFormat.ndjson, alias="format"),
+    columns: Optional[str] = Query(None, description=COLUMNS_DESCRIPTION),
+    role: Optional[schemas.RoleEnum] = None,
+    enabled: Optional[bool] = None,
+    institution_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_superuser),
+) -> Any:
+    filters = []
+    if role is not None:
+        filters.append(User.role == role.value)
+    if enabled is not None:
+        filters.append(User.enabled == enabled)
+    if institution_id is not None:
+        filters.append(User.institution_id == institution_id)
+    return await export_records(
+        db,
+        crud=crud.async_user,
+        name="users",
+        format=export_format,
+        columns=columns,
+        filters=filters,
+    )
+
+
 @router.get(
     "/me", response_model=schemas.User, summary="Get information about the current user"
 )
-def get_current_user_information(
-    current_user: schemas.User = Depends(get_current_user),
+async def get_current_user_information(
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_user),
 ):
-    return current_user
+    etag = entity_tag(current_user, current_user.institution)
+    return conditional(request, response, etag) or current_user
 
 
 @router.get("/{user_id}", response_model=schemas.User, summary="Get a user by user ID")
 async def get_user_by_user_id(
+    request: Request,
+    response: Response,
     user_id: int,
-    db: Session = Depends(get_db),
-    admin: schemas.User = Depends(get_if_admin_privileges),
+    db: AsyncSession = Depends(get_db),
+    options: Sequence[ORMOption] = Depends(response_loader_options(User)),
+    admin: Principal = Depends(get_if_admin_privileges),
 ) -> Any:
-    if not (user := crud.user.get(db, id=user_id)):
+    if not (user := await crud.async_user.get(db, id=user_id, options=options)):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"User with ID {user_id} not found",
         )
-    return user
+    return conditional(request, response, entity_tag(user, user.institution)) or user
 
 
 @router.put("/{user_id}", response_model=schemas.User, summary="Update a user")
-def update_user(
+async def update_user(
+    request: Request,
+    response: Response,
     user_id: int,
     user_in: schemas.UserUpdate,
-    db: Session = Depends(get_db),
-    admin: models.User = Depends(get_if_admin_privileges),
+    db: AsyncSession = Depends(get_db),
+    admin: Principal = Depends(get_if_admin_privileges),
 ) -> Any:
-    if not (user := crud.user.get(db, id=user_id)):
+    if not (user := await crud.async_user.get(db, id=user_id)):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="The user with this username does not exist in the system",
         )
-    user = crud.user.update(db, db_obj=user, obj_in=user_in)
+    check_if_match(request, entity_tag(user, user.institution))
+    user = await crud.async_user.update(db, db_obj=user, obj_in=user_in)
+    response.headers["ETag"] = entity_tag(user, user.institution)
     return user
 
 
 @router.delete("/{user_id}", summary="Delete an existing user by user ID")
 async def delete_user_by_user_id(
     user_id: int,
-    db: Session = Depends(get_db),
-    admin: schemas.User = Depends(get_if_admin_privileges),
+    db: AsyncSession = Depends(get_db),
+    admin: Principal = Depends(get_if_admin_privileges),
 ):
     if user_id == admin.id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Deletion of self not allowed.",
         )
-    if not crud.user.remove(db, id=user_id):
+    if not await crud.async_user.remove(db, id=user_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"User with ID {user_id} does not exist",
@@ -107,7 +233,7 @@ async def delete_user_by_user_id(
     response_model=schemas.User,
     summary="Create new user without the need to be logged in",
 )
-def create_user_open(
+async def create_user_open(
     password: str = Body(...),
     email: EmailStr = Body(...),
     name: str = Body(...),
@@ -115,19 +241,13 @@ def create_user_open(
     title: schemas.TitleEnum = Body(None),
     department: str = Body(None),
     institution_id: int = Body(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ) -> Any:
     if not settings.USERS_OPEN_REGISTRATION:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Open user registration is forbidden on this server",
         )
-    user = crud.user.get_by_email(db, email=email)
-    if user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="The user with this username already exists in the system",
-        )
     user_in = schemas.UserCreate(
         password=password,
         email=email,
@@ -138,5 +258,11 @@ def create_user_open(
         institution_id=institution_id,
         enabled=False,
     )
-    user = crud.user.create(db, obj_in=user_in)
+    try:
+        user = await crud.async_user.create(db, obj_in=user_in)
+    except crud.DuplicateError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=duplicate_user_detail(e),
+        )
     return user
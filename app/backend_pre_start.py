@@ -1,6 +1,12 @@
 import logging
 
-from tenacity import after_log, before_log, retry, stop_after_attempt, wait_fixed
+from tenacity import (
+    after_log,
+    before_log,
+    retry,
+    stop_after_delay,
+    wait_random_exponential,
+)
 
 from app.db.session import SessionLocal
 
@@ -9,21 +15,27 @@ from sqlalchemy import text
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-max_tries = 60 * 5  # 5 minutes
-wait_seconds = 1
+max_wait_seconds = 60 * 5  # 5 minutes
+# Waits grow exponentially from the first one up to the longest one, each
+# drawn at random below its bound, so that containers started together do
+# not retry in lockstep
+first_wait_seconds = 0.1
+longest_wait_seconds = 10
 
 
 @retry(
-    stop=stop_after_attempt(max_tries),
-    wait=wait_fixed(wait_seconds),
+    stop=stop_after_delay(max_wait_seconds),
+    wait=wait_random_exponential(
+        multiplier=first_wait_seconds, max=longest_wait_seconds
+    ),
     before=before_log(logger, logging.INFO),
     after=after_log(logger, logging.WARN),
 )
 def init() -> None:
     try:
-        db = SessionLocal()
         # Try to create session to check if DB is awake
-        db.execute(text("SELECT 1"))
+        with SessionLocal() as db:
+            db.execute(text("SELECT 1"))
     except Exception as e:
         logger.error(e)
         raise e
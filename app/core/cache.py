@@ -0,0 +1,117 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """
+    A thread-safe, size-bounded in-process cache with per-entry expiry.
+
+    Entries expire `ttl` seconds after being stored, unless an explicit
+    expiry time is given, and the least recently used entry is evicted once
+    the cache holds `maxsize` entries.
+
+    #### Parameters:
+        * `maxsize`: The maximum number of entries.
+        * `ttl`: The default lifetime of an entry in seconds.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[K, Tuple[V, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key: K) -> Optional[V]:
+        """
+        Get the value stored for a key.
+
+        #### Parameters:
+            `key`: The key to look up.
+
+        #### Returns:
+            The stored value, or None if it is missing or expired.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self._misses += 1
+                return None
+            self._data.move_to_end(key)
+            self._hits += 1
+            return entry[0]
+
+    def set(self, key: K, value: V, *, expires_at: Optional[float] = None) -> None:
+        """
+        Store a value for a key.
+
+        #### Parameters:
+            * `key`: The key to store the value under.
+            * `value`: The value to store.
+            * `expires_at`: The `time.monotonic()` time at which the entry
+              expires, if it should not expire after the default `ttl`.
+        """
+        if expires_at is None:
+            expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, key: K) -> None:
+        """
+        Remove the entry of a key, if any.
+
+        #### Parameters:
+            `key`: The key to remove.
+        """
+        with self._lock:
+            self._data.pop(key, None)
+
+    def invalidate_where(self, predicate: Callable[[V], bool]) -> None:
+        """
+        Remove every entry whose value matches a predicate.
+
+        #### Parameters:
+            `predicate`: Returns True for the values to remove.
+        """
+        with self._lock:
+            for key in [k for k, (v, _) in self._data.items() if predicate(v)]:
+                del self._data[key]
+
+    def clear(self) -> None:
+        """
+        Remove every entry.
+        """
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report the size and the effectiveness of the cache.
+
+        #### Returns:
+            `dict`: The number of entries, the hit and miss counters and the
+            number of entries evicted to respect `maxsize`.
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": self._hits / lookups if lookups else None,
+                "evictions": self._evictions,
+            }
@@ -1,9 +1,25 @@
 import secrets
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Literal, Optional, Union
 
 from pydantic import AnyHttpUrl, BaseSettings, EmailStr, HttpUrl, validator, AnyUrl
 
 
+def use_connection_scheme(uri: Optional[str], scheme: Optional[str]) -> Optional[str]:
+    """
+    Replace the scheme (dialect and driver) of a database URI.
+
+    #### Parameters:
+        * `uri`: The database URI.
+        * `scheme`: The new connection scheme, e.g. `postgresql+asyncpg`.
+
+    #### Returns:
+        `str`: The database URI using the new scheme, or None if `uri` is None.
+    """
+    if uri is None:
+        return None
+    return f"{scheme}://{str(uri).split('://', 1)[1]}"
+
+
 class Settings(BaseSettings):
     SECRET_KEY: str = secrets.token_urlsafe(32)
     # 60 minutes * 24 hours * 8 days = 8 days
@@ -11,6 +27,7 @@ class Settings(BaseSettings):
 
     DATABASE_SERVER: str
     DATABASE_CONNECTION_SCHEME: str = "postgresql+psycopg2"
+    DATABASE_ASYNC_CONNECTION_SCHEME: str = "postgresql+asyncpg"
     DATABASE_PORT: str
     DATABASE_USER: str
     DATABASE_PASSWORD: str
@@ -47,11 +64,106 @@ class Settings(BaseSettings):
             path=f"/{values.get('DATABASE_TEST_DB') or ''}",
         )
 
+    SQLALCHEMY_ASYNC_DATABASE_URI: Optional[AnyUrl] = None
+
+    @validator("SQLALCHEMY_ASYNC_DATABASE_URI", pre=True)
+    def assemble_async_db_connection(
+        cls, v: Optional[str], values: Dict[str, Any]
+    ) -> Any:
+        if isinstance(v, str):
+            return v
+        return use_connection_scheme(
+            values.get("SQLALCHEMY_DATABASE_URI"),
+            values.get("DATABASE_ASYNC_CONNECTION_SCHEME"),
+        )
+
+    SQLALCHEMY_ASYNC_TEST_DATABASE_URI: Optional[AnyUrl] = None
+
+    @validator("SQLALCHEMY_ASYNC_TEST_DATABASE_URI", pre=True)
+    def assemble_async_test_db_connection(
+        cls, v: Optional[str], values: Dict[str, Any]
+    ) -> Any:
+        if isinstance(v, str):
+            return v
+        return use_connection_scheme(
+            values.get("SQLALCHEMY_TEST_DATABASE_URI"),
+            values.get("DATABASE_ASYNC_CONNECTION_SCHEME"),
+        )
+
+    # Read replicas of the database, e.g. streaming standbys, as a JSON list
+    # of URIs. Requests with a safe method read from the ones lagging behind
+    # by at most DATABASE_REPLICA_MAX_LAG_SECONDS, measured at most once per
+    # interval, and from the primary if none does.
+    SQLALCHEMY_ASYNC_REPLICA_URIS: List[AnyUrl] = []
+    DATABASE_REPLICA_MAX_LAG_SECONDS: float = 1
+    DATABASE_REPLICA_CHECK_INTERVAL_SECONDS: float = 1
+    DATABASE_REPLICA_CHECK_TIMEOUT_SECONDS: float = 1
+
+    # Connections kept open per engine, and opened on top of them under load
+    DATABASE_POOL_SIZE: int = 5
+    DATABASE_MAX_OVERFLOW: int = 10
+    # Seconds to wait for a connection before failing the request
+    DATABASE_POOL_TIMEOUT: float = 30
+    # Seconds after which a connection is replaced, -1 to keep it indefinitely
+    DATABASE_POOL_RECYCLE: int = -1
+    # Test connections with a round trip when they are checked out
+    DATABASE_POOL_PRE_PING: bool = True
+    # Reuse the most recently returned connection, letting idle ones time out
+    DATABASE_POOL_USE_LIFO: bool = False
+    # Connections the worker processes of a server may open in total, their
+    # pools being shrunk to fit. Defaults to the limit of the database server,
+    # which must then not be shared with other servers.
+    DATABASE_CONNECTION_LIMIT: Optional[int] = None
+    # Connect through PgBouncer in transaction pooling mode, which does the
+    # pooling and does not support server-side prepared statements
+    DATABASE_PGBOUNCER: bool = False
+
+    # Readiness checks are answered from a probe of the database run at most
+    # once per interval, and fail while more than this share of the pool
+    # capacity is checked out
+    HEALTH_CHECK_INTERVAL_SECONDS: float = 5
+    HEALTH_CHECK_TIMEOUT_SECONDS: float = 2
+    HEALTH_MAX_POOL_SATURATION: float = 0.9
+
+    # What to do when a request repeats a statement of the same shape more
+    # than QUERY_REPEAT_BUDGET times, as N+1 lazy loads do
+    QUERY_BUDGET_MODE: Literal["off", "log", "raise"] = "off"
+    QUERY_REPEAT_BUDGET: int = 10
+
+    # Apply the migrations when the container starts if the database is not
+    # up to date, instead of failing until the migration job ran
+    MIGRATE_ON_START: bool = False
+    # Unix time the container started at, set by scripts/prestart.sh
+    STARTED_AT: Optional[float] = None
+
     FIRST_SUPERUSER: EmailStr
     FIRST_SUPERUSER_PASSWORD: str
     FIRST_SUPERUSER_CONTACT_NO: str
     USERS_OPEN_REGISTRATION: bool = True
 
+    # Maximum number of verified access tokens cached per process
+    TOKEN_CACHE_SIZE: int = 10_000
+
+    # Authenticated users are cached per process for this many seconds
+    PRINCIPAL_CACHE_TTL_SECONDS: float = 30
+    PRINCIPAL_CACHE_SIZE: int = 10_000
+
+    # Size of the password hashing process pool, defaults to the CPU count
+    PASSWORD_HASH_WORKERS: Optional[int] = None
+    # Hashing requests allowed in flight before new ones are rejected
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    # Scheme new passwords are hashed with. Stored hashes of the other one,
+    # or of a lower cost, are upgraded when their user logs in
+    PASSWORD_HASH_SCHEME: Literal["bcrypt", "argon2"] = "bcrypt"
+    # Milliseconds hashing a password should take. The server calibrates the
+    # cost of the scheme against it when it starts, unless the cost is set
+    PASSWORD_HASH_BUDGET_MS: float = 250
+    BCRYPT_ROUNDS: Optional[int] = None
+    ARGON2_TIME_COST: Optional[int] = None
+    # Memory of argon2id in KiB, and its lanes
+    ARGON2_MEMORY_COST: int = 65536
+    ARGON2_PARALLELISM: int = 1
+
     class Config:
         case_sensitive = True
 
@@ -0,0 +1,190 @@
+"""
+Password hashing policy: the scheme new passwords are hashed with, and its
+cost, calibrated against a latency budget.
+
+    python -m app.core.hashing
+
+reports the policy the server would select on this machine, how long it
+takes to verify a password with it, and so how many logins a CPU can serve
+per second.
+"""
+import dataclasses
+import math
+import secrets
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Optional
+
+from app.core.config import settings
+
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
+
+SCHEMES = ("bcrypt", "argon2")
+
+# Costs used when they are neither configured nor calibrated: the default of
+# passlib for bcrypt, and the second recommendation of RFC 9106 for argon2id
+BCRYPT_DEFAULT_ROUNDS = 12
+ARGON2_DEFAULT_TIME_COST = 3
+
+# Bounds of the calibrated costs. The lower ones are the OWASP minimums, kept
+# however slow the machine is.
+BCRYPT_MIN_ROUNDS = 10
+BCRYPT_MAX_ROUNDS = 16
+ARGON2_MIN_TIME_COST = 2
+ARGON2_MAX_TIME_COST = 16
+
+
+@dataclass(frozen=True)
+class HashingPolicy:
+    """
+    The scheme new passwords are hashed with, and the cost of every scheme.
+
+    Passwords hashed with another scheme, or with a lower cost, are verified
+    all the same, and their hash is reported as outdated, so that it can be
+    upgraded when the password is known.
+
+    #### Parameters:
+        * `scheme`: The scheme of new hashes, "bcrypt" or "argon2" (argon2id).
+        * `bcrypt_rounds`: The log2 of the bcrypt iterations.
+        * `argon2_time_cost`: The passes of argon2 over its memory.
+        * `argon2_memory_cost`: The memory of argon2, in KiB.
+        * `argon2_parallelism`: The lanes of argon2.
+    """
+
+    scheme: str = "bcrypt"
+    bcrypt_rounds: int = BCRYPT_DEFAULT_ROUNDS
+    argon2_time_cost: int = ARGON2_DEFAULT_TIME_COST
+    argon2_memory_cost: int = 65536
+    argon2_parallelism: int = 1
+
+    def context(self) -> "CryptContext":
+        """
+        Create the passlib context applying the policy.
+
+        #### Returns:
+            `CryptContext`: The password hashing context.
+        """
+        from passlib.context import CryptContext
+        from passlib.hash import argon2, bcrypt
+
+        return CryptContext(
+            schemes=[self.scheme, *(s for s in SCHEMES if s != self.scheme)],
+            default=self.scheme,
+            # Hashes of the other schemes are outdated, and so are the ones
+            # of fewer rounds, but not the ones of more. passlib also reports
+            # argon2 hashes of another memory cost as outdated.
+            deprecated="auto",
+            bcrypt__rounds=self.bcrypt_rounds,
+            bcrypt__min_rounds=self.bcrypt_rounds,
+            bcrypt__max_rounds=bcrypt.max_rounds,
+            argon2__type="ID",
+            argon2__rounds=self.argon2_time_cost,
+            argon2__min_rounds=self.argon2_time_cost,
+            argon2__max_rounds=argon2.max_rounds,
+            argon2__memory_cost=self.argon2_memory_cost,
+            argon2__parallelism=self.argon2_parallelism,
+        )
+
+    def __str__(self) -> str:
+        if self.scheme == "bcrypt":
+            return f"bcrypt, {self.bcrypt_rounds} rounds"
+        return (
+            f"argon2id, time cost {self.argon2_time_cost}, "
+            f"{self.argon2_memory_cost} KiB, parallelism {self.argon2_parallelism}"
+        )
+
+
+def hash_time(policy: HashingPolicy, repeat: int = 3) -> float:
+    """
+    Measure how long hashing a password with a policy takes.
+
+    #### Parameters:
+        * `policy`: The hashing policy.
+        * `repeat`: The number of hashes measured, the fastest one counting.
+
+    #### Returns:
+        `float`: The time in seconds.
+    """
+    context = policy.context()
+    password = secrets.token_urlsafe(12)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        context.hash(password)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def calibrate(policy: HashingPolicy, budget: float) -> HashingPolicy:
+    """
+    Select the highest cost of the scheme of a policy hashing a password
+    within a latency budget on this machine.
+
+    A hash is measured at the lowest cost, and the time extrapolated: every
+    bcrypt round doubles it, and every argon2 pass adds to it.
+
+    #### Parameters:
+        * `policy`: The policy whose scheme is calibrated.
+        * `budget`: The time a hash should take, in seconds.
+
+    #### Returns:
+        `HashingPolicy`: The policy with the selected cost, within the
+        bounds of the scheme.
+    """
+    if policy.scheme == "bcrypt":
+        lowest = dataclasses.replace(policy, bcrypt_rounds=BCRYPT_MIN_ROUNDS)
+        elapsed = hash_time(lowest)
+        rounds = BCRYPT_MIN_ROUNDS + math.floor(math.log2(budget / elapsed))
+        return dataclasses.replace(
+            policy,
+            bcrypt_rounds=min(max(rounds, BCRYPT_MIN_ROUNDS), BCRYPT_MAX_ROUNDS),
+        )
+    elapsed = hash_time(dataclasses.replace(policy, argon2_time_cost=1))
+    time_cost = math.floor(budget / elapsed)
+    return dataclasses.replace(
+        policy,
+        argon2_time_cost=min(
+            max(time_cost, ARGON2_MIN_TIME_COST), ARGON2_MAX_TIME_COST
+        ),
+    )
+
+
+def policy_from_settings(*, calibrated: bool = False) -> HashingPolicy:
+    """
+    Build the policy of the settings.
+
+    #### Parameters:
+        `calibrated`: Whether to calibrate the cost of the selected scheme
+        against `PASSWORD_HASH_BUDGET_MS` when it is not set, instead of
+        using the default one.
+
+    #### Returns:
+        `HashingPolicy`: The hashing policy.
+    """
+    policy = HashingPolicy(
+        scheme=settings.PASSWORD_HASH_SCHEME,
+        bcrypt_rounds=settings.BCRYPT_ROUNDS or BCRYPT_DEFAULT_ROUNDS,
+        argon2_time_cost=settings.ARGON2_TIME_COST or ARGON2_DEFAULT_TIME_COST,
+        argon2_memory_cost=settings.ARGON2_MEMORY_COST,
+        argon2_parallelism=settings.ARGON2_PARALLELISM,
+    )
+    cost: Optional[int] = (
+        settings.BCRYPT_ROUNDS
+        if policy.scheme == "bcrypt"
+        else settings.ARGON2_TIME_COST
+    )
+    if calibrated and cost is None:
+        policy = calibrate(policy, settings.PASSWORD_HASH_BUDGET_MS / 1000)
+    return policy
+
+
+if __name__ == "__main__":
+    policy = policy_from_settings(calibrated=True)
+    context = policy.context()
+    hashed = context.hash("password")
+    start = time.perf_counter()
+    context.verify("password", hashed)
+    elapsed = time.perf_counter() - start
+    print(f"Policy: {policy}")
+    print(f"Verify: {elapsed * 1000:.1f} ms, {1 / elapsed:.1f} logins/s per CPU")
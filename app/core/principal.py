@@ -0,0 +1,43 @@
+from dataclasses import dataclass
+from typing import Optional
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """
+    The authenticated user, reduced to what authorization checks need.
+    """
+
+    id: int
+    role: Optional[str]
+    enabled: bool
+    institution_id: Optional[int]
+
+    @classmethod
+    def from_user(cls, user) -> "Principal":
+        """
+        Take a snapshot of a user.
+
+        #### Parameters:
+            `user`: The User instance.
+
+        #### Returns:
+            `Principal`: The snapshot of the user.
+        """
+        return cls(
+            id=user.id,
+            role=user.role,
+            enabled=user.enabled,
+            institution_id=user.institution_id,
+        )
+
+
+# Principals of recently authenticated users, keyed by user ID. The cache is
+# local to the process: writes through the CRUD layer invalidate it, but other
+# workers only see a change once their entry expires.
+principal_cache: TTLCache[int, Principal] = TTLCache(
+    maxsize=settings.PRINCIPAL_CACHE_SIZE, ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS
+)
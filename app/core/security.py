@@ -1,16 +1,154 @@
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-from typing import Any
+from functools import lru_cache
+from types import ModuleType
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    TypeVar,
+)
 
-from jose import jwt
-from passlib.context import CryptContext
+from prometheus_client import Histogram
 
+from app.core.cache import TTLCache
 from app.core.config import settings
+from app.core.hashing import HashingPolicy, policy_from_settings
+from app.schemas.tokens import TokenPayload
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
+
+T = TypeVar("T")
 
 
 ALGORITHM = "HS256"
 
+PASSWORD_VERIFY_DURATION = Histogram(
+    "password_verify_duration_seconds",
+    "Time spent verifying a password against its hash, per hashing scheme.",
+    ("scheme",),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.15, 0.2, 0.25, 0.3, 0.4, 0.5, 0.75, 1, 2.5),
+)
+
+# The policy set by the server when it starts, see `configure_password_hashing`
+_hashing_policy: Optional[HashingPolicy] = None
+
+
+def hashing_policy() -> HashingPolicy:
+    """
+    Get the policy passwords are hashed with: the one configured, or else the
+    one of the settings, uncalibrated.
+
+    #### Returns:
+        `HashingPolicy`: The hashing policy.
+    """
+    return _hashing_policy or policy_from_settings()
+
+
+def configure_password_hashing(policy: HashingPolicy) -> None:
+    """
+    Hash passwords with a policy from now on, in this process and in the
+    password hashing processes, which are restarted with it.
+
+    #### Parameters:
+        `policy`: The hashing policy.
+    """
+    global _hashing_policy
+    _hashing_policy = policy
+    password_context.cache_clear()
+    password_hasher.shutdown()
+
+
+# jose loads the cryptography backend and passlib its hash handlers when
+# imported, which the processes that never sign a token or hash a password,
+# such as the migration job, need not pay for. The server loads them before
+# forking its workers, see `preload`.
+@lru_cache(maxsize=None)
+def password_context() -> "CryptContext":
+    """
+    Get the passlib context hashing the passwords with the current policy,
+    created on first use.
+
+    #### Returns:
+        `CryptContext`: The password hashing context.
+    """
+    return hashing_policy().context()
+
+
+@lru_cache(maxsize=None)
+def _jwt() -> ModuleType:
+    from jose import jwt
+
+    return jwt
+
+
+def preload() -> None:
+    """
+    Load the token and password hashing libraries ahead of the first request
+    that needs them.
+    """
+    _jwt()
+    password_context().handler().get_backend()
+
+
+class Verification(NamedTuple):
+    """
+    The outcome of the verification of a password.
+    """
+
+    # Whether the password matches the hash
+    valid: bool
+    # The hash of the password with the current policy, if it matches a hash
+    # made with another scheme or a lower cost
+    new_hash: Optional[str]
+    # The scheme of the hash, and the seconds it took to verify the password
+    scheme: str
+    duration: float
+
+
+def _verify_and_update(plain_password: str, hashed_password: str) -> Verification:
+    context = password_context()
+    start = time.perf_counter()
+    valid, new_hash = context.verify_and_update(plain_password, hashed_password)
+    duration = time.perf_counter() - start
+    return Verification(
+        valid, new_hash, context.identify(hashed_password) or "unknown", duration
+    )
+
+
+def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> Verification:
+    """
+    Verify if the plain password matches the hashed password, and hash it
+    again if the hash is outdated.
+
+    #### Parameters:
+        * `plain_password`: The plain password to verify.
+        * `hashed_password`: The hashed password to compare against.
+
+    #### Returns:
+        `Verification`: Whether the passwords match, and the hash to store
+        instead of the outdated one.
+    """
+    verification = _verify_and_update(plain_password, hashed_password)
+    PASSWORD_VERIFY_DURATION.labels(scheme=verification.scheme).observe(
+        verification.duration
+    )
+    return verification
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
@@ -23,7 +161,7 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     #### Returns:
         `bool`: True if the passwords match, False otherwise.
     """
-    return pwd_context.verify(plain_password, hashed_password)
+    return verify_and_update_password(plain_password, hashed_password).valid
 
 
 def get_password_hash(password: str) -> str:
@@ -36,7 +174,20 @@ def get_password_hash(password: str) -> str:
     #### Returns:
         `str`: The hashed password.
     """
-    return pwd_context.hash(password)
+    return password_context().hash(password)
+
+
+def get_password_hashes(passwords: Sequence[str]) -> List[str]:
+    """
+    Generate the hashes of the given passwords.
+
+    #### Parameters:
+        `passwords`: The passwords to hash.
+
+    #### Returns:
+        `list`: The hashed passwords, in the same order.
+    """
+    return [password_context().hash(password) for password in passwords]
 
 
 def create_access_token(subject: str | Any, expires_delta: timedelta = None) -> str:
@@ -57,5 +208,189 @@ def create_access_token(subject: str | Any, expires_delta: timedelta = None) ->
             minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
         )
     to_encode = {"exp": expire, "sub": str(subject)}
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
+    encoded_jwt = _jwt().encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
+
+
+# Verified access tokens, keyed by their digest, until they expire
+token_cache: TTLCache[bytes, TokenPayload] = TTLCache(
+    maxsize=settings.TOKEN_CACHE_SIZE, ttl=0
+)
+_token_cache_secret_key = settings.SECRET_KEY
+
+
+def decode_access_token(token: str) -> TokenPayload:
+    """
+    Verify an access token and decode its payload.
+
+    Verified tokens are cached until they expire, so repeated requests with
+    the same token skip the signature check and the payload validation. The
+    cache is flushed whenever the secret key changes.
+
+    #### Parameters:
+        `token`: The access token.
+
+    #### Returns:
+        `TokenPayload`: The validated payload of the token.
+
+    #### Raises:
+        `JWTError`: If the token is invalid or expired.
+        `ValidationError`: If the payload is invalid.
+    """
+    global _token_cache_secret_key
+    if settings.SECRET_KEY != _token_cache_secret_key:
+        token_cache.clear()
+        _token_cache_secret_key = settings.SECRET_KEY
+    digest = hashlib.sha256(token.encode()).digest()
+    if (token_data := token_cache.get(digest)) is not None:
+        return token_data
+    payload = _jwt().decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
+    token_data = TokenPayload(**payload)
+    if isinstance(exp := payload.get("exp"), (int, float)):
+        token_cache.set(
+            digest, token_data, expires_at=time.monotonic() + exp - time.time()
+        )
+    return token_data
+
+
+class PasswordHashingOverloaded(Exception):
+    """
+    Raised when too many password hashing requests are already in flight.
+    """
+
+
+class PasswordHasher:
+    """
+    Runs password hashing and verification in a dedicated process pool.
+
+    Password hashing is deliberately slow, so running it on the event loop
+    stalls every other request served by the worker. Requests beyond `max_pending` are
+    rejected straight away with `PasswordHashingOverloaded` instead of
+    queueing up behind work that would finish long after the client gave up.
+
+    #### Parameters:
+        * `max_workers`: The number of processes. Defaults to the CPU count.
+        * `max_pending`: The number of requests allowed in flight at once.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_pending: int = 64):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        self._submitted = 0
+        self._rejected = 0
+        # Latencies (in seconds) of the most recent requests
+        self._latencies: deque[float] = deque(maxlen=1024)
+
+    async def hash(self, password: str) -> str:
+        """
+        Generate a hash for the given password. See `get_password_hash`.
+        """
+        return await self._run(get_password_hash, password)
+
+    async def hash_many(self, passwords: Sequence[str]) -> List[str]:
+        """
+        Generate the hashes of many passwords, spread across every process.
+
+        The passwords are split into one batch per process, and each batch
+        counts as a single request towards `max_pending`.
+        """
+        size = -(-len(passwords) // self.max_workers) or 1
+        batches = [passwords[i : i + size] for i in range(0, len(passwords), size)]
+        hashes = await asyncio.gather(
+            *(self._run(get_password_hashes, batch) for batch in batches)
+        )
+        return [hashed for batch in hashes for hashed in batch]
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """
+        Verify if the plain password matches the hashed password. See
+        `verify_password`.
+        """
+        verification = await self.verify_and_update(plain_password, hashed_password)
+        return verification.valid
+
+    async def verify_and_update(
+        self, plain_password: str, hashed_password: str
+    ) -> Verification:
+        """
+        Verify if the plain password matches the hashed password, and hash it
+        again if the hash is outdated. See `verify_and_update_password`.
+        """
+        verification = await self._run(
+            _verify_and_update, plain_password, hashed_password
+        )
+        # Recorded here, as the hashing processes do not expose their metrics
+        PASSWORD_VERIFY_DURATION.labels(scheme=verification.scheme).observe(
+            verification.duration
+        )
+        return verification
+
+    async def _run(self, fn: Callable[..., T], *args: Any) -> T:
+        if self._pending >= self.max_pending:
+            self._rejected += 1
+            raise PasswordHashingOverloaded()
+        self._pending += 1
+        self._submitted += 1
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self._pending -= 1
+            self._latencies.append(time.perf_counter() - start)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Spawned processes start on demand and do not inherit the
+            # threads and sockets of the server process, nor its hashing
+            # policy, which is handed to them.
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=configure_password_hashing,
+                initargs=(hashing_policy(),),
+            )
+        return self._executor
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report the queue depth and latency of the hashing requests.
+
+        #### Returns:
+            `dict`: The pool size, queue counters and the latency percentiles
+            (in milliseconds) of the most recent requests.
+        """
+        latencies = sorted(self._latencies)
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+
+        return {
+            "workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "pending": self._pending,
+            "submitted": self._submitted,
+            "rejected": self._rejected,
+            "latency_p50_ms": percentile(0.50),
+            "latency_p95_ms": percentile(0.95),
+            "latency_p99_ms": percentile(0.99),
+            "latency_max_ms": latencies[-1] * 1000 if latencies else None,
+        }
+
+    def shutdown(self) -> None:
+        """
+        Stop the worker processes. They are started again on the next request.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+)
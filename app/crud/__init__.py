@@ -1,2 +1,3 @@
-from app.crud.crud_user import user
-from app.crud.crud_institution import institution
\ No newline at end of file
+from app.crud.crud_user import user, async_user
+from app.crud.crud_institution import institution, async_institution
+from app.crud.base import DuplicateError
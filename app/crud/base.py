@@ -1,13 +1,103 @@
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+import base64
+import binascii
+import json
+from typing import (
+    Any,
+    Dict,
+    Generic,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
+from sqlalchemy import (
+    ColumnElement,
+    Select,
+    and_,
+    delete,
+    func,
+    insert,
+    inspect,
+    or_,
+    select,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.engine import Result
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncResult, AsyncSession
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.orm.interfaces import ORMOption
+from app.crud.projection import projection
 from app.db.base_class import Base
 
 ModelType = TypeVar("ModelType", bound=Base)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 
+# SQLSTATE of the errors raised by unique constraints and indexes, and by
+# foreign keys
+UNIQUE_VIOLATION = "23505"
+FOREIGN_KEY_VIOLATION = "23503"
+
+
+class DuplicateError(ValueError):
+    """
+    Raised when a write conflicts with a unique constraint or index.
+
+    #### Parameters
+
+    * `field`: The field whose value already exists.
+    """
+
+    def __init__(self, field: str):
+        super().__init__(f"A record with this {field} already exists")
+        self.field = field
+
+
+def violated_constraint(error: IntegrityError) -> Optional[str]:
+    """
+    Gets the name of the unique constraint or index a statement violated.
+
+    #### Parameters
+
+    * `error`: The error raised by the statement.
+
+    #### Returns
+
+    * The name of the constraint, or None if the error is not a unique
+      violation.
+    """
+    if getattr(error.orig, "pgcode", None) != UNIQUE_VIOLATION:
+        return None
+    return constraint_name(error)
+
+
+def constraint_name(error: IntegrityError) -> Optional[str]:
+    """
+    Gets the name of the constraint a statement violated.
+
+    #### Parameters
+
+    * `error`: The error raised by the statement.
+
+    #### Returns
+
+    * The name of the constraint, if the database reported it.
+    """
+    # psycopg2 reports it in the diagnostics, asyncpg on the original error
+    if (diag := getattr(error.orig, "diag", None)) is not None:
+        return diag.constraint_name
+    return getattr(error.orig.__cause__, "constraint_name", None)
+
 
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     """
@@ -20,6 +110,24 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     * `UpdateSchemaType`: The Pydantic model type for update operations.
     """
 
+    # Columns a client is allowed to order cursor pages by. The primary key is
+    # always appended as a tie-breaker so that every cursor position is unique.
+    cursor_columns: Tuple[str, ...] = ("id",)
+
+    # Number of rows sent per INSERT statement by the bulk operations
+    bulk_chunk_size: int = 500
+
+    # Columns that may be exported by `stream`
+    export_columns: Tuple[str, ...] = ("id",)
+
+    # Fields guarded by the unique constraints and indexes, by name, that
+    # `create` reports conflicts on with `DuplicateError`
+    unique_fields: Dict[str, str] = {}
+
+    # Unique fields compared case-insensitively, by an index on lower(field)
+    # that the upserts resolve conflicts on
+    case_insensitive_fields: Tuple[str, ...] = ()
+
     def __init__(self, model: Type[ModelType]):
         """
         Initializes the CRUD object with the provided SQLAlchemy model.
@@ -29,8 +137,20 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         * `model`: A SQLAlchemy model class.
         """
         self.model = model
+        mapper = inspect(model)
+        # The version column is maintained by the writes, see `update`
+        self.version_key: Optional[str] = None
+        if mapper.version_id_col is not None:
+            self.version_key = mapper.get_property_by_column(mapper.version_id_col).key
+        primary_keys = {mapper.get_property_by_column(c).key for c in mapper.primary_key}
+        # Attributes of the columns the writes may set
+        self.writable_columns = frozenset(
+            attr.key for attr in mapper.column_attrs
+        ) - primary_keys - {self.version_key}
 
-    def get(self, db: Session, id: Any) -> Optional[ModelType]:
+    def get(
+        self, db: Session, id: Any, *, options: Sequence[ORMOption] = ()
+    ) -> Optional[ModelType]:
         """
         Retrieves a single model instance by its ID.
 
@@ -38,15 +158,23 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
 
         * `db`: The SQLAlchemy database session.
         * `id`: The ID of the model instance to retrieve.
+        * `options`: Loader options for its relationships, see
+          `app.crud.loading.loader_options`.
 
         #### Returns
 
         * An optional instance of the model if found, otherwise None.
         """
-        return db.get(self.model, id)
+        return db.get(self.model, id, options=options)
 
     def get_multi(
-        self, db: Session, *, skip: int = 0, limit: int = 100
+        self,
+        db: Session,
+        *,
+        skip: int = 0,
+        limit: int = 100,
+        filters: Sequence[ColumnElement[bool]] = (),
+        options: Sequence[ORMOption] = (),
     ) -> List[ModelType]:
         """
         Retrieves multiple instances of the model.
@@ -56,33 +184,563 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         * `db`: The SQLAlchemy database session.
         * `skip`: The number of instances to skip (for pagination).
         * `limit`: The maximum number of instances to retrieve.
+        * `filters`: Criteria the instances must match.
+        * `options`: Loader options for their relationships.
 
         #### Returns
 
         * A list of model instances.
         """
-        return db.query(self.model).offset(skip).limit(limit).all()
+        return (
+            db.query(self.model)
+            .options(*options)
+            .filter(*filters)
+            .order_by(self.model.id)
+            .offset(skip)
+            .limit(limit)
+            .all()
+        )
+
+    def count(
+        self, db: Session, *, filters: Sequence[ColumnElement[bool]] = ()
+    ) -> int:
+        """
+        Counts the instances of the model.
+
+        #### Parameters
+
+        * `db`: The SQLAlchemy database session.
+        * `filters`: Criteria the instances must match.
+
+        #### Returns
+
+        * The number of matching instances.
+        """
+        return db.scalar(select(func.count()).select_from(self.model).where(*filters))
+
+    def get_multi_by_cursor(
+        self,
+        db: Session,
+        *,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        order_by: str = "id",
+        filters: Sequence[ColumnElement[bool]] = (),
+        options: Sequence[ORMOption] = (),
+    ) -> Tuple[List[ModelType], Optional[str]]:
+        """
+        Retrieves a page of model instances using keyset (cursor) pagination.
+
+        Unlike `get_multi`, the cost of fetching a page does not grow with its
+        depth, since the database seeks straight to the cursor position instead
+        of walking past every skipped row.
+
+        #### Parameters
+
+        * `db`: The SQLAlchemy database session.
+        * `cursor`: The opaque cursor returned with the previous page, or None
+          for the first page.
+        * `limit`: The maximum number of instances to retrieve.
+        * `order_by`: One of `cursor_columns`, optionally prefixed with `-` for
+          descending order.
+        * `filters`: Criteria the instances must match.
+        * `options`: Loader options for their relationships.
+
+        #### Returns
+
+        * A tuple of the list of model instances and the cursor of the next
+          page, which is None when there are no more instances.
+
+        #### Raises
+
+        * `ValueError`: If `order_by` is not allowed or the cursor is invalid.
+        """
+        stmt, keys = self._apply_cursor(
+            select(self.model).options(*options).where(*filters),
+            cursor=cursor,
+            order_by=order_by,
+        )
+        rows = list(db.scalars(stmt.limit(limit + 1)))
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        last = rows[-1]
+        return rows, self.encode_cursor(
+            order_by, [getattr(last, key) for key in keys]
+        )
+
+    def get_multi_projected(
+        self,
+        db: Session,
+        *,
+        schema: Type[BaseModel],
+        skip: int = 0,
+        limit: int = 100,
+        filters: Sequence[ColumnElement[bool]] = (),
+    ) -> List[Dict[str, Any]]:
+        """
+        Retrieves multiple instances of the model as dictionaries shaped like
+        `schema`, selecting only the columns it reads.
+
+        No ORM object is built, and the dictionaries can be serialized as is,
+        without validating them against the schema again.
+
+        #### Parameters
+
+        * `db`: The SQLAlchemy database session.
+        * `schema`: The Pydantic model to project on, see
+          `app.crud.projection.Projection`.
+        * `skip`: The number of instances to skip (for pagination).
+        * `limit`: The maximum number of instances to retrieve.
+        * `filters`: Criteria the instances must match.
+
+        #### Returns
+
+        * A list of dictionaries.
+        """
+        proj = projection(self.model, schema)
+        stmt = (
+            proj.select()
+            .where(*filters)
+            .order_by(self.model.id)
+            .offset(skip)
+            .limit(limit)
+        )
+        return [proj.to_dict(row) for row in db.execute(stmt)]
+
+    def get_multi_projected_by_cursor(
+        self,
+        db: Session,
+        *,
+        schema: Type[BaseModel],
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        order_by: str = "id",
+        filters: Sequence[ColumnElement[bool]] = (),
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Retrieves a page of instances of the model as dictionaries shaped like
+        `schema`, using keyset pagination. See `get_multi_projected` and
+        `get_multi_by_cursor`.
+
+        #### Returns
+
+        * A tuple of the list of dictionaries and the cursor of the next page,
+          which is None when there are no more instances.
+
+        #### Raises
+
+        * `ValueError`: If `order_by` is not allowed or the cursor is invalid.
+        """
+        proj = projection(self.model, schema)
+        stmt, keys = self._apply_cursor(
+            proj.select().where(*filters), cursor=cursor, order_by=order_by
+        )
+        # The sort key is selected last, whether or not the schema reads it
+        stmt = stmt.add_columns(*(getattr(self.model, key) for key in keys))
+        rows = db.execute(stmt.limit(limit + 1)).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = self.encode_cursor(order_by, list(rows[-1][-len(keys) :]))
+        return [proj.to_dict(row) for row in rows], next_cursor
+
+    def _apply_cursor(
+        self, stmt: Select, *, cursor: Optional[str], order_by: str
+    ) -> Tuple[Select, List[str]]:
+        """
+        Orders a statement by the sort key and seeks past the cursor position.
+
+        #### Parameters
+
+        * `stmt`: The select statement to paginate.
+        * `cursor`: The opaque cursor of the current page, if any.
+        * `order_by`: The requested sort column.
+
+        #### Returns
+
+        * A tuple of the paginated statement and the attribute names making up
+          the sort key.
+        """
+        descending = order_by.startswith("-")
+        name = order_by.removeprefix("-")
+        if name not in self.cursor_columns:
+            raise ValueError(
+                f"Cannot order by '{name}', expected one of: "
+                + ", ".join(self.cursor_columns)
+            )
+        keys = [name] if name == "id" else [name, "id"]
+        columns = [getattr(self.model, key) for key in keys]
+        if cursor is not None:
+            values = self.decode_cursor(cursor, order_by)
+            self._check_cursor_values(keys, values)
+            stmt = stmt.where(self._seek(keys, values, descending=descending))
+        ordering = [column.desc() if descending else column.asc() for column in columns]
+        return stmt.order_by(*ordering), keys
+
+    def _check_cursor_values(self, keys: List[str], values: List[Any]) -> None:
+        """
+        Checks that the values of a decoded cursor can be compared with the
+        sort key, so that a forged cursor is rejected instead of failing in
+        the database.
+        """
+        if len(values) != len(keys):
+            raise ValueError("Invalid cursor")
+        mapper = inspect(self.model)
+        for key, value in zip(keys, values):
+            column = mapper.columns[key]
+            if value is None:
+                if not column.nullable:
+                    raise ValueError("Invalid cursor")
+                continue
+            try:
+                expected = column.type.python_type
+            except NotImplementedError:
+                continue
+            if expected is float:
+                expected = (int, float)
+            # bool is a subclass of int, but not a valid value of an integer
+            if isinstance(value, bool) != (expected is bool) or not isinstance(
+                value, expected
+            ):
+                raise ValueError("Invalid cursor")
+            if expected is int and not -(2**63) <= value < 2**63:
+                raise ValueError("Invalid cursor")
+
+    def _seek(
+        self, keys: List[str], values: List[Any], *, descending: bool
+    ) -> ColumnElement[bool]:
+        """
+        Builds the criterion of the rows past a cursor position.
+
+        NULL sort values come last in ascending order and first in descending
+        order, as in PostgreSQL, and are compared by ID among themselves.
+        """
+        columns = [getattr(self.model, key) for key in keys]
+        position = tuple_(*columns)
+        bound = tuple_(*values)
+        past = position < bound if descending else position > bound
+        if len(keys) == 1 or not inspect(self.model).columns[keys[0]].nullable:
+            return past
+        column, id_column, id_value = columns[0], columns[1], values[1]
+        if values[0] is None:
+            past_id = id_column < id_value if descending else id_column > id_value
+            in_nulls = and_(column.is_(None), past_id)
+            return or_(in_nulls, column.is_not(None)) if descending else in_nulls
+        return past if descending else or_(past, column.is_(None))
+
+    @staticmethod
+    def encode_cursor(order_by: str, values: List[Any]) -> str:
+        """
+        Encodes a sort key position into an opaque cursor.
+
+        #### Parameters
+
+        * `order_by`: The sort column the position belongs to.
+        * `values`: The sort key values of the last instance of a page.
+
+        #### Returns
+
+        * The URL-safe cursor string.
+        """
+        raw = json.dumps([order_by, *values], separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
 
-    def create(self, db: Session, *, obj_in: CreateSchemaType) -> ModelType:
+    @staticmethod
+    def decode_cursor(cursor: str, order_by: str) -> List[Any]:
         """
-        Creates a new model instance.
+        Decodes a cursor created by `encode_cursor`.
+
+        #### Parameters
+
+        * `cursor`: The opaque cursor string.
+        * `order_by`: The sort column the cursor is expected to belong to.
+
+        #### Returns
+
+        * The sort key values stored in the cursor.
+
+        #### Raises
+
+        * `ValueError`: If the cursor is malformed or was issued for a
+          different sort column.
+        """
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            decoded = json.loads(raw)
+        except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError):
+            raise ValueError("Invalid cursor")
+        if not isinstance(decoded, list) or not decoded or decoded[0] != order_by:
+            raise ValueError("Cursor does not match the requested ordering")
+        return decoded[1:]
+
+    def stream(
+        self,
+        db: Session,
+        *,
+        columns: Optional[Sequence[str]] = None,
+        filters: Sequence[ColumnElement[bool]] = (),
+        batch_size: int = 1000,
+    ) -> Result:
+        """
+        Streams the rows of the model from a server-side cursor, so that memory
+        use does not grow with the size of the table.
+
+        #### Parameters
+
+        * `db`: The SQLAlchemy database session.
+        * `columns`: The columns to select, out of `export_columns`. Defaults
+          to all of them.
+        * `filters`: Criteria the rows must match.
+        * `batch_size`: The number of rows fetched from the cursor at a time.
+
+        #### Returns
+
+        * The result, yielding the selected columns of each row ordered by ID.
+
+        #### Raises
+
+        * `ValueError`: If a column is not allowed.
+        """
+        return db.execute(self._stream_statement(columns, filters, batch_size))
+
+    def _stream_statement(
+        self,
+        columns: Optional[Sequence[str]],
+        filters: Sequence[ColumnElement[bool]],
+        batch_size: int,
+    ) -> Select:
+        columns = columns or self.export_columns
+        unknown = [column for column in columns if column not in self.export_columns]
+        if unknown:
+            raise ValueError(
+                f"Cannot export {', '.join(unknown)}, expected any of: "
+                + ", ".join(self.export_columns)
+            )
+        return (
+            select(*(getattr(self.model, column) for column in columns))
+            .where(*filters)
+            .order_by(self.model.id)
+            .execution_options(yield_per=batch_size)
+        )
+
+    def create(
+        self, db: Session, *, obj_in: Union[CreateSchemaType, Dict[str, Any]]
+    ) -> ModelType:
+        """
+        Creates a new model instance, with a single INSERT ... RETURNING.
 
         #### Parameters
 
         * `db`: The SQLAlchemy database session.
-        * `obj_in`: The input data for creating the model instance.
+        * `obj_in`: The input data, or the column values, of the instance.
 
         #### Returns
 
         * The created model instance.
+
+        #### Raises
+
+        * `DuplicateError`: If a value of a field of `unique_fields` exists.
         """
-        obj_in_data = jsonable_encoder(obj_in)
-        db_obj = self.model(**obj_in_data)  # type: ignore
-        db.add(db_obj)
+        values = self._column_values(
+            obj_in if isinstance(obj_in, dict) else obj_in.dict()
+        )
+        # The unique constraints are checked by the insert, instead of by a
+        # lookup that concurrent requests could all pass
+        try:
+            db_obj = db.scalars(
+                insert(self.model).values(values).returning(self.model)
+            ).one()
+        except IntegrityError as e:
+            db.rollback()
+            if (field := self.unique_fields.get(violated_constraint(e))) is not None:
+                raise DuplicateError(field) from e
+            raise
         db.commit()
-        db.refresh(db_obj)
         return db_obj
 
+    def create_multi(
+        self,
+        db: Session,
+        *,
+        objs_in: Sequence[Union[CreateSchemaType, Dict[str, Any]]],
+        chunk_size: Optional[int] = None,
+    ) -> List[ModelType]:
+        """
+        Creates model instances in bulk, using multi-row INSERT ... RETURNING
+        statements instead of one round trip per instance.
+
+        #### Parameters
+
+        * `db`: The SQLAlchemy database session.
+        * `objs_in`: The input data, or the column values, of the instances.
+        * `chunk_size`: The number of rows per statement. Defaults to
+          `bulk_chunk_size`.
+
+        #### Returns
+
+        * The created model instances.
+        """
+        stmt = self._returning(insert(self.model))
+        created = self._execute_bulk(db, stmt, objs_in, chunk_size)
+        db.commit()
+        return created
+
+    def upsert_multi(
+        self,
+        db: Session,
+        *,
+        objs_in: Sequence[Union[CreateSchemaType, Dict[str, Any]]],
+        index_elements: Sequence[str],
+        update_fields: Optional[Sequence[str]] = None,
+        chunk_size: Optional[int] = None,
+    ) -> List[ModelType]:
+        """
+        Creates or updates model instances in bulk, using multi-row
+        INSERT ... ON CONFLICT ... RETURNING statements.
+
+        #### Parameters
+
+        * `db`: The SQLAlchemy database session.
+        * `objs_in`: The input data, or the column values, of the instances.
+        * `index_elements`: The fields of the unique constraint to resolve
+          conflicts on. Conflicts on `case_insensitive_fields` are resolved
+          on their lower(field) index.
+        * `update_fields`: The columns to overwrite on conflict. Defaults to
+          every provided column. When empty, conflicting rows are skipped.
+        * `chunk_size`: The number of rows per statement. Defaults to
+          `bulk_chunk_size`.
+
+        #### Returns
+
+        * The created and updated model instances. Skipped rows are omitted.
+        """
+        rows = [self._to_row(obj_in) for obj_in in objs_in]
+        if update_fields is None:
+            update_fields = [
+                key
+                for key in (rows[0] if rows else {})
+                if key not in index_elements and key != "id"
+            ]
+        conflict_target = [
+            func.lower(getattr(self.model, field))
+            if field in self.case_insensitive_fields
+            else field
+            for field in index_elements
+        ]
+        stmt = pg_insert(self.model)
+        if update_fields:
+            set_ = {field: stmt.excluded[field] for field in update_fields}
+            # Bulk statements do not maintain the version of the rows
+            if (version := inspect(self.model).version_id_col) is not None:
+                set_[version.name] = version + 1
+            stmt = stmt.on_conflict_do_update(
+                index_elements=conflict_target, set_=set_
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=conflict_target)
+        upserted = self._execute_bulk(db, self._returning(stmt), rows, chunk_size)
+        db.commit()
+        return upserted
+
+    def _execute_bulk(
+        self,
+        db: Session,
+        stmt: Any,
+        objs_in: Sequence[Union[CreateSchemaType, Dict[str, Any]]],
+        chunk_size: Optional[int],
+    ) -> List[ModelType]:
+        rows = [self._to_row(obj_in) for obj_in in objs_in]
+        chunk_size = chunk_size or self.bulk_chunk_size
+        results: List[ModelType] = []
+        for start in range(0, len(rows), chunk_size):
+            results.extend(
+                self._refresh(db.execute(stmt, rows[start : start + chunk_size]))
+            )
+        return results
+
+    def _returning(self, stmt: Any) -> Any:
+        """
+        Returns the instances written by a statement, followed by the values
+        of their columns, see `_refresh`.
+        """
+        columns = inspect(self.model).column_attrs
+        return stmt.returning(
+            self.model, *(getattr(self.model, attr.key) for attr in columns)
+        )
+
+    def _refresh(self, rows: Any) -> List[ModelType]:
+        """
+        Copies the values returned by a write onto its instances.
+
+        The instances already in the session are only refreshed from the
+        RETURNING rows by the `populate_existing` option of SQLAlchemy 2.0.26
+        and later, so their columns are returned and set explicitly.
+        """
+        keys = [attr.key for attr in inspect(self.model).column_attrs]
+        objs = []
+        for obj, *values in rows:
+            for key, value in zip(keys, values):
+                set_committed_value(obj, key, value)
+            objs.append(obj)
+        return objs
+
+    def _to_row(
+        self, obj_in: Union[CreateSchemaType, Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        Converts the input data of an instance into its column values.
+        """
+        return obj_in if isinstance(obj_in, dict) else jsonable_encoder(obj_in)
+
+    def violation_detail(self, error: IntegrityError) -> str:
+        """
+        Describes the constraint a write violated in terms of the fields of
+        the model, instead of the text of the driver.
+
+        #### Parameters
+
+        * `error`: The error raised by the write.
+
+        #### Returns
+
+        * The description of the violation.
+        """
+        if (field := self.unique_fields.get(violated_constraint(error))) is not None:
+            return str(DuplicateError(field))
+        if getattr(error.orig, "pgcode", None) == UNIQUE_VIOLATION:
+            return "A record with the same values already exists"
+        if getattr(error.orig, "pgcode", None) == FOREIGN_KEY_VIOLATION:
+            name = constraint_name(error)
+            table = self.model.__table__
+            for constraint in table.foreign_key_constraints:
+                columns = [column.key for column in constraint.columns]
+                # Unnamed constraints are named by PostgreSQL after the table
+                # and the columns
+                default_name = f"{table.name}_{'_'.join(columns)}_fkey"
+                if name in (constraint.name, default_name):
+                    return f"The referenced {', '.join(columns)} does not exist"
+        return "The record violates a constraint of the database"
+
+    def unique_key(self, field: str, value: Any) -> Any:
+        """
+        Normalizes the value of a unique field the way its constraint
+        compares it.
+
+        #### Parameters
+
+        * `field`: The unique field.
+        * `value`: The value of the field.
+
+        #### Returns
+
+        * The value, lowercased for `case_insensitive_fields`.
+        """
+        if field in self.case_insensitive_fields and isinstance(value, str):
+            return value.lower()
+        return value
+
     def update(
         self,
         db: Session,
@@ -91,7 +749,11 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         obj_in: Union[UpdateSchemaType, Dict[str, Any]],
     ) -> ModelType:
         """
-        Updates an existing model instance.
+        Updates an existing model instance, with a single
+        UPDATE ... RETURNING.
+
+        The update only applies to the version of the row the instance was
+        read at, if the model has a version column.
 
         #### Parameters
 
@@ -102,23 +764,38 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         #### Returns
 
         * The updated model instance.
+
+        #### Raises
+
+        * `StaleDataError`: If the row was updated or deleted meanwhile.
         """
-        obj_data = jsonable_encoder(db_obj)
-        if isinstance(obj_in, dict):
-            update_data = obj_in
-        else:
-            update_data = obj_in.dict(exclude_unset=True)
-        for field in obj_data:
-            if field in update_data:
-                setattr(db_obj, field, update_data[field])
-        db.add(db_obj)
+        values = self._column_values(
+            obj_in if isinstance(obj_in, dict) else obj_in.dict(exclude_unset=True)
+        )
+        if not values:
+            return db_obj
+        stmt = update(self.model).where(self.model.id == db_obj.id)
+        if self.version_key is not None:
+            version = getattr(self.model, self.version_key)
+            stmt = stmt.where(version == getattr(db_obj, self.version_key))
+            values[self.version_key] = version + 1
+        # The returned row refreshes the instance in the session
+        row = db.execute(
+            self._returning(stmt.values(values)),
+            execution_options={"synchronize_session": False},
+        ).one_or_none()
+        if row is None:
+            db.rollback()
+            raise StaleDataError(
+                f"{self.model.__name__} {db_obj.id} was updated or deleted meanwhile"
+            )
+        (updated,) = self._refresh([row])
         db.commit()
-        db.refresh(db_obj)
-        return db_obj
+        return updated
 
     def remove(self, db: Session, *, id: int) -> ModelType | None:
         """
-        Removes a model instance by its ID.
+        Removes a model instance by its ID, with a single DELETE ... RETURNING.
 
         #### Parameters
 
@@ -129,8 +806,252 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
 
         * The removed model instance if found, otherwise None.
         """
-        if not (obj := db.get(self.model, id)):
-            return None
-        db.delete(obj)
+        obj = db.scalars(self._delete_statement(id)).one_or_none()
         db.commit()
         return obj
+
+    def _delete_statement(self, id: int) -> Any:
+        """
+        Builds the DELETE ... RETURNING statement of `remove`.
+        """
+        return delete(self.model).where(self.model.id == id).returning(self.model)
+
+    def _column_values(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Keeps the values of the columns the writes may set, by attribute.
+        """
+        return {key: v for key, v in data.items() if key in self.writable_columns}
+
+
+class AsyncCRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
+    """
+    Asynchronous counterpart of `CRUDBase`, for use with an `AsyncSession`.
+
+    Every operation runs the synchronous implementation of the wrapped CRUD
+    object through `AsyncSession.run_sync`, so both paths share the same
+    queries while the async one never blocks the event loop on database I/O.
+
+    #### Parameters
+
+    * `ModelType`: The SQLAlchemy model type.
+    * `CreateSchemaType`: The Pydantic model type for create operations.
+    * `UpdateSchemaType`: The Pydantic model type for update operations.
+    """
+
+    def __init__(self, crud: CRUDBase[ModelType, CreateSchemaType, UpdateSchemaType]):
+        """
+        Initializes the async CRUD object with the provided CRUD object.
+
+        #### Parameters
+
+        * `crud`: The synchronous CRUD object to delegate to.
+        """
+        self.crud = crud
+        self.model = crud.model
+
+    async def get(
+        self, db: AsyncSession, id: Any, *, options: Sequence[ORMOption] = ()
+    ) -> Optional[ModelType]:
+        """
+        Retrieves a single model instance by its ID. See `CRUDBase.get`.
+        """
+        return await db.run_sync(
+            lambda session: self.crud.get(session, id=id, options=options)
+        )
+
+    async def get_multi(
+        self,
+        db: AsyncSession,
+        *,
+        skip: int = 0,
+        limit: int = 100,
+        filters: Sequence[ColumnElement[bool]] = (),
+        options: Sequence[ORMOption] = (),
+    ) -> List[ModelType]:
+        """
+        Retrieves multiple instances of the model. See `CRUDBase.get_multi`.
+        """
+        return await db.run_sync(
+            lambda session: self.crud.get_multi(
+                session, skip=skip, limit=limit, filters=filters, options=options
+            )
+        )
+
+    async def count(
+        self, db: AsyncSession, *, filters: Sequence[ColumnElement[bool]] = ()
+    ) -> int:
+        """
+        Counts the instances of the model. See `CRUDBase.count`.
+        """
+        return await db.run_sync(
+            lambda session: self.crud.count(session, filters=filters)
+        )
+
+    async def get_multi_by_cursor(
+        self,
+        db: AsyncSession,
+        *,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        order_by: str = "id",
+        filters: Sequence[ColumnElement[bool]] = (),
+        options: Sequence[ORMOption] = (),
+    ) -> Tuple[List[ModelType], Optional[str]]:
+        """
+        Retrieves a page of model instances using keyset pagination. See
+        `CRUDBase.get_multi_by_cursor`.
+        """
+        return await db.run_sync(
+            lambda session: self.crud.get_multi_by_cursor(
+                session,
+                cursor=cursor,
+                limit=limit,
+                order_by=order_by,
+                filters=filters,
+                options=options,
+            )
+        )
+
+    async def get_multi_projected(
+        self,
+        db: AsyncSession,
+        *,
+        schema: Type[BaseModel],
+        skip: int = 0,
+        limit: int = 100,
+        filters: Sequence[ColumnElement[bool]] = (),
+    ) -> List[Dict[str, Any]]:
+        """
+        Retrieves multiple instances of the model as dictionaries. See
+        `CRUDBase.get_multi_projected`.
+        """
+        return await db.run_sync(
+            lambda session: self.crud.get_multi_projected(
+                session, schema=schema, skip=skip, limit=limit, filters=filters
+            )
+        )
+
+    async def get_multi_projected_by_cursor(
+        self,
+        db: AsyncSession,
+        *,
+        schema: Type[BaseModel],
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        order_by: str = "id",
+        filters: Sequence[ColumnElement[bool]] = (),
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Retrieves a page of instances of the model as dictionaries. See
+        `CRUDBase.get_multi_projected_by_cursor`.
+        """
+        return await db.run_sync(
+            lambda session: self.crud.get_multi_projected_by_cursor(
+                session,
+                schema=schema,
+                cursor=cursor,
+                limit=limit,
+                order_by=order_by,
+                filters=filters,
+            )
+        )
+
+    async def stream(
+        self,
+        db: AsyncSession,
+        *,
+        columns: Optional[Sequence[str]] = None,
+        filters: Sequence[ColumnElement[bool]] = (),
+        batch_size: int = 1000,
+    ) -> AsyncResult:
+        """
+        Streams the rows of the model from a server-side cursor. See
+        `CRUDBase.stream`.
+        """
+        return await db.stream(
+            self.crud._stream_statement(columns, filters, batch_size)
+        )
+
+    async def create(self, db: AsyncSession, *, obj_in: CreateSchemaType) -> ModelType:
+        """
+        Creates a new model instance. See `CRUDBase.create`.
+        """
+        return await db.run_sync(
+            lambda session: self.crud.create(session, obj_in=obj_in)
+        )
+
+    async def create_multi(
+        self,
+        db: AsyncSession,
+        *,
+        objs_in: Sequence[Union[CreateSchemaType, Dict[str, Any]]],
+        chunk_size: Optional[int] = None,
+    ) -> List[ModelType]:
+        """
+        Creates model instances in bulk. See `CRUDBase.create_multi`.
+        """
+        return await db.run_sync(
+            lambda session: self.crud.create_multi(
+                session, objs_in=objs_in, chunk_size=chunk_size
+            )
+        )
+
+    async def upsert_multi(
+        self,
+        db: AsyncSession,
+        *,
+        objs_in: Sequence[Union[CreateSchemaType, Dict[str, Any]]],
+        index_elements: Sequence[str],
+        update_fields: Optional[Sequence[str]] = None,
+        chunk_size: Optional[int] = None,
+    ) -> List[ModelType]:
+        """
+        Creates or updates model instances in bulk. See `CRUDBase.upsert_multi`.
+        """
+        return await db.run_sync(
+            lambda session: self.crud.upsert_multi(
+                session,
+                objs_in=objs_in,
+                index_elements=index_elements,
+                update_fields=update_fields,
+                chunk_size=chunk_size,
+            )
+        )
+
+    async def to_rows(
+        self, objs_in: Sequence[Union[CreateSchemaType, Dict[str, Any]]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Converts the input data of instances into their column values, which
+        the bulk writes take as is, e.g. to write them again after a failure
+        without converting them twice.
+
+        #### Parameters
+
+        * `objs_in`: The input data, or the column values, of the instances.
+
+        #### Returns
+
+        * The column values of the instances, in the same order.
+        """
+        return [self.crud._to_row(obj_in) for obj_in in objs_in]
+
+    async def update(
+        self,
+        db: AsyncSession,
+        *,
+        db_obj: ModelType,
+        obj_in: Union[UpdateSchemaType, Dict[str, Any]],
+    ) -> ModelType:
+        """
+        Updates an existing model instance. See `CRUDBase.update`.
+        """
+        return await db.run_sync(
+            lambda session: self.crud.update(session, db_obj=db_obj, obj_in=obj_in)
+        )
+
+    async def remove(self, db: AsyncSession, *, id: int) -> ModelType | None:
+        """
+        Removes a model instance by its ID. See `CRUDBase.remove`.
+        """
+        return await db.run_sync(lambda session: self.crud.remove(session, id=id))
@@ -1,8 +1,14 @@
-from typing import List
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Type, Union
 
+from pydantic import BaseModel
+from sqlalchemy import func, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.interfaces import ORMOption
 
-from app.crud.base import CRUDBase
+from app.core.principal import principal_cache
+from app.crud.base import AsyncCRUDBase, CRUDBase
+from app.crud.crud_user import user as crud_user
 from app.models.institution import Institution
 from app.models.user import User
 from app.schemas.institution import InstitutionCreate, InstitutionUpdate
@@ -13,9 +19,17 @@ class CRUDInstitution(CRUDBase[Institution, InstitutionCreate, InstitutionUpdate
     CRUD operations for the Institution model.
     """
 
+    cursor_columns = ("id", "name")
+    export_columns = ("id", "name", "address", "email", "contactno", "membership")
+    unique_fields = {
+        "institution_name_key": "name",
+        "ix_institution_lower_name": "name",
+    }
+    case_insensitive_fields = ("name",)
+
     def get_by_name(self, db: Session, *, name: str) -> Institution | None:
         """
-        Retrieves an institution by its name.
+        Retrieves an institution by its name, regardless of case.
 
         #### Parameters
 
@@ -26,27 +40,196 @@ class CRUDInstitution(CRUDBase[Institution, InstitutionCreate, InstitutionUpdate
 
         * An instance of the Institution model if found, otherwise None.
         """
-        return db.query(Institution).filter(Institution.name == name).first()
+        return (
+            db.query(Institution)
+            .filter(func.lower(Institution.name) == name.lower())
+            .first()
+        )
+
+    def update(
+        self,
+        db: Session,
+        *,
+        db_obj: Institution,
+        obj_in: Union[InstitutionUpdate, Dict[str, Any]],
+    ) -> Institution:
+        """
+        Updates an institution, invalidating the cached principals of its users.
+
+        #### Parameters
+
+        * `db`: The SQLAlchemy database session.
+        * `db_obj`: The existing institution object to be updated.
+        * `obj_in`: The input data for updating the institution.
+
+        #### Returns
+
+        * An instance of the updated Institution model.
+        """
+        institution = super().update(db, db_obj=db_obj, obj_in=obj_in)
+        principal_cache.invalidate_where(lambda p: p.institution_id == institution.id)
+        return institution
+
+    def remove(self, db: Session, *, id: int) -> Institution | None:
+        """
+        Removes an institution by its ID, invalidating the cached principals
+        of its users.
+
+        #### Parameters
+
+        * `db`: The SQLAlchemy database session.
+        * `id`: The ID of the institution to remove.
+
+        #### Returns
+
+        * The removed Institution instance if found, otherwise None.
+        """
+        institution = super().remove(db, id=id)
+        principal_cache.invalidate_where(lambda p: p.institution_id == id)
+        return institution
+
+    def _delete_statement(self, id: int) -> Any:
+        """
+        Builds the DELETE ... RETURNING statement of `remove`, detaching the
+        users of the institution in the same statement, as the ORM did when
+        deleting the loaded institution.
+        """
+        # The foreign keys are checked at the end of the statement, once the
+        # users are detached
+        detach_users = (
+            update(User)
+            .where(User.institution_id == id)
+            .values(institution_id=None, version_id=User.version_id + 1)
+            .cte("detach_users")
+        )
+        return super()._delete_statement(id).add_cte(detach_users)
 
     def get_multi_user(
-        self, db: Session, *, id: int, skip: int = 0, limit: int = 100
-    ) -> List[User]:
+        self,
+        db: Session,
+        *,
+        id: int,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        order_by: str = "id",
+        count_total: bool = False,
+        options: Sequence[ORMOption] = (),
+        schema: Optional[Type[BaseModel]] = None,
+    ) -> Optional[Tuple[List[Any], Optional[str], Optional[int]]]:
         """
-        Retrieves multiple users associated with an institution.
+        Retrieves a page of the users associated with an institution.
+
+        The users are paginated by the database, by offset when `skip` is
+        given and by keyset otherwise. See `CRUDBase.get_multi_by_cursor`.
 
         #### Parameters
 
         * `db`: The SQLAlchemy database session.
         * `id`: The ID of the institution.
-        * `skip`: The number of users to skip (for pagination).
+        * `skip`: The number of users to skip (for offset pagination).
         * `limit`: The maximum number of users to retrieve.
+        * `cursor`: The cursor of the page to retrieve (for keyset pagination).
+        * `order_by`: The column to order keyset pages by.
+        * `count_total`: Whether to also count all users of the institution.
+        * `options`: Loader options for the relationships of the users.
+        * `schema`: If given, the users are returned as dictionaries projected
+          on it rather than as User instances. See
+          `CRUDBase.get_multi_projected`.
 
         #### Returns
 
-        * A list of User instances associated with the institution.
+        * A tuple of the list of users, the cursor of the next page
+          (None when paginating by offset or on the last page) and the total
+          number of users (None unless `count_total` is set), or None if the
+          institution does not exist.
+
+        #### Raises
+
+        * `ValueError`: If `order_by` is not allowed or the cursor is invalid.
+        """
+        filters = [User.institution_id == id]
+        if schema is not None:
+            if skip:
+                users = crud_user.get_multi_projected(
+                    db, schema=schema, skip=skip, limit=limit, filters=filters
+                )
+                next_cursor = None
+            else:
+                users, next_cursor = crud_user.get_multi_projected_by_cursor(
+                    db,
+                    schema=schema,
+                    cursor=cursor,
+                    limit=limit,
+                    order_by=order_by,
+                    filters=filters,
+                )
+        elif skip:
+            users = crud_user.get_multi(
+                db, skip=skip, limit=limit, filters=filters, options=options
+            )
+            next_cursor = None
+        else:
+            users, next_cursor = crud_user.get_multi_by_cursor(
+                db,
+                cursor=cursor,
+                limit=limit,
+                order_by=order_by,
+                filters=filters,
+                options=options,
+            )
+        if not users and self.get(db, id=id) is None:
+            return None
+        total = crud_user.count(db, filters=filters) if count_total else None
+        return users, next_cursor, total
+
+
+class AsyncCRUDInstitution(
+    AsyncCRUDBase[Institution, InstitutionCreate, InstitutionUpdate]
+):
+    """
+    Asynchronous CRUD operations for the Institution model.
+    """
+
+    async def get_by_name(self, db: AsyncSession, *, name: str) -> Institution | None:
+        """
+        Retrieves an institution by its name. See `CRUDInstitution.get_by_name`.
+        """
+        return await db.run_sync(
+            lambda session: self.crud.get_by_name(session, name=name)
+        )
+
+    async def get_multi_user(
+        self,
+        db: AsyncSession,
+        *,
+        id: int,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        order_by: str = "id",
+        count_total: bool = False,
+        options: Sequence[ORMOption] = (),
+        schema: Optional[Type[BaseModel]] = None,
+    ) -> Optional[Tuple[List[Any], Optional[str], Optional[int]]]:
+        """
+        Retrieves a page of the users associated with an institution. See
+        `CRUDInstitution.get_multi_user`.
         """
-        institution = self.get(db, id=id)
-        return institution.users[skip : skip + limit]
+        return await db.run_sync(
+            lambda session: self.crud.get_multi_user(
+                session,
+                id=id,
+                skip=skip,
+                limit=limit,
+                cursor=cursor,
+                order_by=order_by,
+                count_total=count_total,
+                options=options,
+                schema=schema,
+            )
+        )
 
 
 institution = CRUDInstitution(Institution)
+async_institution = AsyncCRUDInstitution(institution)
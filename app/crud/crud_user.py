@@ -1,9 +1,17 @@
-from typing import Any, Dict, Optional, Union
+from typing import Any, Dict, List, Optional, Sequence, Union
 
+from sqlalchemy import func, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-
-from app.core.security import get_password_hash, verify_password
-from app.crud.base import CRUDBase
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.core.principal import principal_cache
+from app.core.security import (
+    get_password_hash,
+    password_hasher,
+    verify_and_update_password,
+)
+from app.crud.base import AsyncCRUDBase, CRUDBase
 from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate
 
@@ -13,9 +21,28 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
     CRUD operations for the User model.
     """
 
+    cursor_columns = ("id", "name", "email")
+    export_columns = (
+        "id",
+        "name",
+        "email",
+        "contactno",
+        "title",
+        "department",
+        "role",
+        "enabled",
+        "institution_id",
+    )
+    unique_fields = {
+        "user_email_key": "email",
+        "ix_user_lower_email": "email",
+        "user_contactno_key": "contactno",
+    }
+    case_insensitive_fields = ("email",)
+
     def get_by_email(self, db: Session, *, email: str) -> Optional[User]:
         """
-        Retrieves a user by their email.
+        Retrieves a user by their email, regardless of case.
 
         #### Parameters
 
@@ -26,9 +53,11 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
 
         * An instance of the User model if found, otherwise None.
         """
-        return db.query(User).filter(User.email == email).first()
+        return db.query(User).filter(func.lower(User.email) == email.lower()).first()
 
-    def create(self, db: Session, *, obj_in: UserCreate) -> User:
+    def create(
+        self, db: Session, *, obj_in: UserCreate, hashed_password: Optional[str] = None
+    ) -> User:
         """
         Creates a new user.
 
@@ -36,26 +65,57 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
 
         * `db`: The SQLAlchemy database session.
         * `obj_in`: The input data for creating the user.
+        * `hashed_password`: The precomputed hash of `obj_in.password`. It is
+          computed here if not provided.
 
         #### Returns
 
         * An instance of the created User model.
+
+        #### Raises
+
+        * `DuplicateError`: If the email or the contact number exists.
+        """
+        if hashed_password is None:
+            hashed_password = get_password_hash(obj_in.password.get_secret_value())
+        return super().create(db, obj_in=self.user_row(obj_in, hashed_password))
+
+    def _to_row(self, obj_in: Union[UserCreate, Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Converts the input data of a user into its column values, hashing the
+        password unless column values are given.
         """
-        db_obj = User(
-            name=obj_in.name,
-            email=obj_in.email,
-            contactno=obj_in.contactno,
-            title=obj_in.title,
-            department=obj_in.department,
-            hashed_password=get_password_hash(obj_in.password.get_secret_value()),
-            role=obj_in.role,
-            enabled=obj_in.enabled,
-            institution_id=obj_in.institution_id,
+        if isinstance(obj_in, dict):
+            return obj_in
+        return self.user_row(
+            obj_in, get_password_hash(obj_in.password.get_secret_value())
         )
-        db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
-        return db_obj
+
+    @staticmethod
+    def user_row(obj_in: UserCreate, hashed_password: str) -> Dict[str, Any]:
+        """
+        Maps the input data of a user to its column values.
+
+        #### Parameters
+
+        * `obj_in`: The input data for creating the user.
+        * `hashed_password`: The hash of `obj_in.password`.
+
+        #### Returns
+
+        * The column values of the user.
+        """
+        return {
+            "name": obj_in.name,
+            "email": obj_in.email,
+            "contactno": obj_in.contactno,
+            "title": obj_in.title,
+            "department": obj_in.department,
+            "hashed_password": hashed_password,
+            "role": obj_in.role,
+            "enabled": obj_in.enabled,
+            "institution_id": obj_in.institution_id,
+        }
 
     def update(
         self, db: Session, *, db_obj: User, obj_in: Union[UserUpdate, Dict[str, Any]]
@@ -83,11 +143,57 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
             )
             del update_data["password"]
             update_data["hashed_password"] = hashed_password
-        return super().update(db, db_obj=db_obj, obj_in=update_data)
+        user = super().update(db, db_obj=db_obj, obj_in=update_data)
+        principal_cache.invalidate(user.id)
+        return user
+
+    def upsert_multi(
+        self,
+        db: Session,
+        *,
+        objs_in: Sequence[Union[UserCreate, Dict[str, Any]]],
+        index_elements: Sequence[str],
+        update_fields: Optional[Sequence[str]] = None,
+        chunk_size: Optional[int] = None,
+    ) -> List[User]:
+        """
+        Creates or updates users in bulk. See `CRUDBase.upsert_multi`.
+
+        The cached principals of the updated users are invalidated, as their
+        role or status may have changed.
+        """
+        users = super().upsert_multi(
+            db,
+            objs_in=objs_in,
+            index_elements=index_elements,
+            update_fields=update_fields,
+            chunk_size=chunk_size,
+        )
+        for user in users:
+            principal_cache.invalidate(user.id)
+        return users
+
+    def remove(self, db: Session, *, id: int) -> Optional[User]:
+        """
+        Removes a user by their ID.
+
+        #### Parameters
+
+        * `db`: The SQLAlchemy database session.
+        * `id`: The ID of the user to remove.
+
+        #### Returns
+
+        * The removed User instance if found, otherwise None.
+        """
+        user = super().remove(db, id=id)
+        principal_cache.invalidate(id)
+        return user
 
     def authenticate(self, db: Session, *, email: str, password: str) -> Optional[User]:
         """
-        Authenticates a user.
+        Authenticates a user. If the password was hashed with another scheme
+        or a lower cost than the current policy, its hash is upgraded.
 
         #### Parameters
 
@@ -102,10 +208,37 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
         user = self.get_by_email(db, email=email)
         if not user:
             return None
-        if not verify_password(password, user.hashed_password):
+        verification = verify_and_update_password(password, user.hashed_password)
+        if not verification.valid:
             return None
+        if verification.new_hash is not None:
+            self.upgrade_hash(db, db_obj=user, new_hash=verification.new_hash)
         return user
 
+    def upgrade_hash(self, db: Session, *, db_obj: User, new_hash: str) -> None:
+        """
+        Replaces the outdated password hash of a user.
+
+        The hash is not part of any representation of the user, so its
+        version is left alone, and the hash is only replaced if it did not
+        change since it was verified, so that a concurrent password change
+        wins.
+
+        #### Parameters
+
+        * `db`: The SQLAlchemy database session.
+        * `db_obj`: The authenticated user.
+        * `new_hash`: The hash of the password with the current policy.
+        """
+        db.execute(
+            update(User)
+            .where(User.id == db_obj.id, User.hashed_password == db_obj.hashed_password)
+            .values(hashed_password=new_hash)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        set_committed_value(db_obj, "hashed_password", new_hash)
+
     def is_active(self, user: User) -> bool:
         """
         Checks if a user is active.
@@ -148,4 +281,133 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
         return True if user.role in ("SuperAdmin", "Admin") else False
 
 
+class AsyncCRUDUser(AsyncCRUDBase[User, UserCreate, UserUpdate]):
+    """
+    Asynchronous CRUD operations for the User model.
+
+    Password hashing and verification are CPU bound, so they run in the
+    password hashing process pool instead of the event loop, and raise
+    `PasswordHashingOverloaded` when it is saturated.
+    """
+
+    async def get_by_email(self, db: AsyncSession, *, email: str) -> Optional[User]:
+        """
+        Retrieves a user by their email. See `CRUDUser.get_by_email`.
+        """
+        return await db.run_sync(
+            lambda session: self.crud.get_by_email(session, email=email)
+        )
+
+    async def create(self, db: AsyncSession, *, obj_in: UserCreate) -> User:
+        """
+        Creates a new user. See `CRUDUser.create`.
+        """
+        hashed_password = await password_hasher.hash(
+            obj_in.password.get_secret_value()
+        )
+        return await db.run_sync(
+            lambda session: self.crud.create(
+                session, obj_in=obj_in, hashed_password=hashed_password
+            )
+        )
+
+    async def create_multi(
+        self,
+        db: AsyncSession,
+        *,
+        objs_in: Sequence[Union[UserCreate, Dict[str, Any]]],
+        chunk_size: Optional[int] = None,
+    ) -> List[User]:
+        """
+        Creates users in bulk. See `CRUDBase.create_multi`.
+        """
+        rows = await self.to_rows(objs_in)
+        return await super().create_multi(db, objs_in=rows, chunk_size=chunk_size)
+
+    async def upsert_multi(
+        self,
+        db: AsyncSession,
+        *,
+        objs_in: Sequence[Union[UserCreate, Dict[str, Any]]],
+        index_elements: Sequence[str],
+        update_fields: Optional[Sequence[str]] = None,
+        chunk_size: Optional[int] = None,
+    ) -> List[User]:
+        """
+        Creates or updates users in bulk. See `CRUDBase.upsert_multi`.
+        """
+        rows = await self.to_rows(objs_in)
+        return await super().upsert_multi(
+            db,
+            objs_in=rows,
+            index_elements=index_elements,
+            update_fields=update_fields,
+            chunk_size=chunk_size,
+        )
+
+    async def to_rows(
+        self, objs_in: Sequence[Union[UserCreate, Dict[str, Any]]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Converts the input data of users into their column values, hashing
+        their passwords. See `AsyncCRUDBase.to_rows`.
+        """
+        # Hash the passwords of all users in parallel
+        to_hash = [obj_in for obj_in in objs_in if not isinstance(obj_in, dict)]
+        hashes = iter(
+            await password_hasher.hash_many(
+                [obj_in.password.get_secret_value() for obj_in in to_hash]
+            )
+        )
+        return [
+            obj_in
+            if isinstance(obj_in, dict)
+            else self.crud.user_row(obj_in, next(hashes))
+            for obj_in in objs_in
+        ]
+
+    async def update(
+        self,
+        db: AsyncSession,
+        *,
+        db_obj: User,
+        obj_in: Union[UserUpdate, Dict[str, Any]],
+    ) -> User:
+        """
+        Updates a user. See `CRUDUser.update`.
+        """
+        if isinstance(obj_in, dict):
+            update_data = dict(obj_in)
+        else:
+            update_data = obj_in.dict(exclude_unset=True)
+        if update_data.get("password"):
+            update_data["hashed_password"] = await password_hasher.hash(
+                update_data.pop("password").get_secret_value()
+            )
+        return await super().update(db, db_obj=db_obj, obj_in=update_data)
+
+    async def authenticate(
+        self, db: AsyncSession, *, email: str, password: str
+    ) -> Optional[User]:
+        """
+        Authenticates a user. See `CRUDUser.authenticate`.
+        """
+        user = await self.get_by_email(db, email=email)
+        if not user:
+            return None
+        verification = await password_hasher.verify_and_update(
+            password, user.hashed_password
+        )
+        if not verification.valid:
+            return None
+        if verification.new_hash is not None:
+            await db.run_sync(
+                lambda session: self.crud.upgrade_hash(
+                    session, db_obj=user, new_hash=verification.new_hash
+                )
+            )
+        return user
+
+
 user = CRUDUser(User)
+async_user = AsyncCRUDUser(user)
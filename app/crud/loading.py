@@ -0,0 +1,98 @@
+from functools import lru_cache
+from typing import Any, FrozenSet, List, Optional, Tuple, Type, get_args
+
+from pydantic import BaseModel
+from sqlalchemy import inspect
+from sqlalchemy.ext.associationproxy import AssociationProxy
+from sqlalchemy.orm import (
+    RelationshipDirection,
+    RelationshipProperty,
+    joinedload,
+    selectinload,
+)
+from sqlalchemy.orm.interfaces import ORMOption
+from sqlalchemy.orm.strategy_options import _AbstractLoad
+
+
+def nested_schema(annotation: Any) -> Optional[Type[BaseModel]]:
+    """
+    Finds the Pydantic model of a field or response model, looking through
+    `List[...]` and `Optional[...]`.
+    """
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    for arg in get_args(annotation):
+        if (schema := nested_schema(arg)) is not None:
+            return schema
+    return None
+
+
+def _load(loader: Optional[_AbstractLoad], attribute: Any) -> _AbstractLoad:
+    """
+    Chains the loader of a relationship: a join for a single related object,
+    which costs no extra query, and one batched query for a collection.
+    """
+    prop: RelationshipProperty = attribute.property
+    single = prop.direction is RelationshipDirection.MANYTOONE and not prop.uselist
+    if loader is None:
+        return joinedload(attribute) if single else selectinload(attribute)
+    return loader.joinedload(attribute) if single else loader.selectinload(attribute)
+
+
+def _loader_options(
+    model: Type[Any], schema: Type[BaseModel], seen: FrozenSet[Tuple[Any, Any]]
+) -> List[_AbstractLoad]:
+    if (model, schema) in seen:
+        return []
+    seen = seen | {(model, schema)}
+    descriptors = inspect(model).all_orm_descriptors
+    options = []
+    for name, field in schema.__fields__.items():
+        # Columns and other scalars are loaded with the row
+        nested = nested_schema(field.outer_type_)
+        descriptor = descriptors.get(field.alias)
+        if nested is None or descriptor is None:
+            continue
+        attribute = getattr(model, field.alias)
+        if isinstance(descriptor, AssociationProxy):
+            # Load the intermediate objects, then the proxied objects of each
+            loader = _load(None, attribute.local_attr)
+            if not isinstance(attribute.remote_attr.property, RelationshipProperty):
+                options.append(loader)
+                continue
+            loader = _load(loader, attribute.remote_attr)
+            target = attribute.remote_attr.property.mapper.class_
+        elif isinstance(getattr(attribute, "property", None), RelationshipProperty):
+            loader = _load(None, attribute)
+            target = attribute.property.mapper.class_
+        else:
+            continue
+        nested_options = _loader_options(target, nested, seen)
+        options.append(loader.options(*nested_options) if nested_options else loader)
+    return options
+
+
+@lru_cache(maxsize=None)
+def loader_options(model: Type[Any], schema: Any) -> Tuple[ORMOption, ...]:
+    """
+    Derives the loader options that load every relationship a schema reads
+    from a model, in a number of queries that does not depend on the number of
+    rows.
+
+    Nested schemas are followed through relationships and association
+    proxies. Single related objects are joined, and collections are loaded
+    with one `SELECT ... IN` per relationship.
+
+    #### Parameters
+
+    * `model`: The SQLAlchemy model class.
+    * `schema`: The Pydantic model the instances are serialized with, or a
+      `List` of it, such as the `response_model` of a route.
+
+    #### Returns
+
+    * A tuple of loader options, empty when the schema reads no relationship.
+    """
+    if (nested := nested_schema(schema)) is None:
+        return ()
+    return tuple(_loader_options(model, nested, frozenset()))
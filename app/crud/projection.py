@@ -0,0 +1,130 @@
+from functools import lru_cache
+from typing import Any, Dict, List, Sequence, Tuple, Type
+
+from pydantic import BaseModel
+from sqlalchemy import ColumnElement, Row, Select, inspect, select
+from sqlalchemy.orm import ColumnProperty, RelationshipProperty, aliased
+
+from app.crud.loading import nested_schema
+
+# Kinds of the entries of a projection plan
+_COLUMN, _NESTED, _DEFAULT = range(3)
+
+
+class Projection:
+    """
+    The columns a schema reads from a model, and how to assemble them back
+    into the nested dictionaries the schema would serialize to.
+
+    Related objects read by nested schemas are outer joined, so that a page of
+    rows is fetched in a single statement. Fields the model does not provide
+    get the default of the schema.
+
+    #### Parameters
+
+    * `model`: The SQLAlchemy model class.
+    * `schema`: The Pydantic model to project on.
+
+    #### Raises
+
+    * `ValueError`: If a field cannot be projected, such as a collection, or
+      is required but missing from the model.
+    """
+
+    def __init__(self, model: Type[Any], schema: Type[BaseModel]):
+        self.model = model
+        self.columns: List[ColumnElement[Any]] = []
+        self.joins: List[Any] = []
+        self.plan = self._plan(model, schema)
+
+    def _plan(
+        self, entity: Any, schema: Type[BaseModel]
+    ) -> List[Tuple[str, int, Any]]:
+        mapper = inspect(entity).mapper
+        plan = []
+        for name, field in schema.__fields__.items():
+            prop = mapper.attrs.get(field.alias)
+            nested = nested_schema(field.outer_type_)
+            if isinstance(prop, ColumnProperty) and nested is None:
+                self.columns.append(getattr(entity, field.alias))
+                plan.append((name, _COLUMN, len(self.columns) - 1))
+            elif (
+                isinstance(prop, RelationshipProperty)
+                and nested is not None
+                and not prop.uselist
+            ):
+                target = aliased(prop.mapper.class_)
+                self.joins.append(getattr(entity, field.alias).of_type(target))
+                # A missing related object is told apart by its primary key
+                primary_key = prop.mapper.get_property_by_column(
+                    prop.mapper.primary_key[0]
+                )
+                self.columns.append(getattr(target, primary_key.key))
+                key = len(self.columns) - 1
+                plan.append((name, _NESTED, (key, self._plan(target, nested))))
+            elif prop is None and not field.required:
+                plan.append((name, _DEFAULT, field.get_default()))
+            else:
+                raise ValueError(
+                    f"Cannot project {schema.__name__}.{name} from "
+                    f"{mapper.class_.__name__}"
+                )
+        return plan
+
+    def select(self) -> Select:
+        """
+        Builds the statement selecting the projected columns.
+
+        #### Returns
+
+        * The select statement, to which filters, ordering and extra columns
+          may be added.
+        """
+        stmt = select(*self.columns).select_from(self.model)
+        for join in self.joins:
+            stmt = stmt.outerjoin(join)
+        return stmt
+
+    def to_dict(self, row: Row) -> Dict[str, Any]:
+        """
+        Assembles a row of the projected statement.
+
+        #### Parameters
+
+        * `row`: The row, whose first columns are the projected ones.
+
+        #### Returns
+
+        * The dictionary the schema would serialize the row's object to.
+        """
+        return self._to_dict(self.plan, row)
+
+    @classmethod
+    def _to_dict(cls, plan: List[Tuple[str, int, Any]], row: Sequence[Any]) -> Dict:
+        result = {}
+        for name, kind, value in plan:
+            if kind == _COLUMN:
+                result[name] = row[value]
+            elif kind == _NESTED:
+                key, nested = value
+                result[name] = None if row[key] is None else cls._to_dict(nested, row)
+            else:
+                result[name] = value
+        return result
+
+
+@lru_cache(maxsize=None)
+def projection(model: Type[Any], schema: Type[BaseModel]) -> Projection:
+    """
+    Gets the projection of a model on a schema, built once per pair.
+
+    #### Parameters
+
+    * `model`: The SQLAlchemy model class.
+    * `schema`: The Pydantic model to project on.
+
+    #### Returns
+
+    * The `Projection`.
+    """
+    return Projection(model, schema)
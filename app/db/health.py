@@ -0,0 +1,144 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import settings
+from app.db.pool import pool_stats
+from app.db.session import async_engine
+
+
+class HealthProbe:
+    """
+    Checks that the database answers and that the connection pool has room
+    left, at most once every `interval` seconds.
+
+    Readiness checks are answered from the result of the last probe, and a
+    stale result is refreshed in the background, so that however often load
+    balancers ask, the database sees one probe per interval per process.
+
+    #### Parameters:
+        * `engine`: The engine of the database to probe.
+        * `interval`: The seconds after which a result is refreshed.
+        * `timeout`: The seconds the database has to answer a probe.
+        * `max_saturation`: The fraction of the pool capacity checked out
+          above which the process is not ready for more requests.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        *,
+        interval: float,
+        timeout: float,
+        max_saturation: float,
+    ):
+        self.engine = engine
+        self.interval = interval
+        self.timeout = timeout
+        self.max_saturation = max_saturation
+        self._result: Optional[Dict[str, Any]] = None
+        self._checked_at = 0.0
+        self._probing: Optional[asyncio.Task] = None
+
+    async def status(self) -> Dict[str, Any]:
+        """
+        Get the result of the last probe, refreshing it in the background if
+        it is stale. Only the first call waits for a probe.
+
+        #### Returns:
+            `dict`: See `check`.
+        """
+        if self._result is None:
+            return await self._start_probe()
+        if time.monotonic() - self._checked_at >= self.interval:
+            self._start_probe()
+        return self._result
+
+    def _start_probe(self) -> asyncio.Task:
+        # A single probe runs at a time, whatever the number of callers
+        if self._probing is None or self._probing.done():
+            self._probing = asyncio.create_task(self._probe())
+        return self._probing
+
+    async def _probe(self) -> Dict[str, Any]:
+        self._result = await self.check()
+        self._checked_at = time.monotonic()
+        return self._result
+
+    async def check(self) -> Dict[str, Any]:
+        """
+        Probe the pool and the database.
+
+        A saturated pool is reported without waiting for a connection from
+        it.
+
+        #### Returns:
+            `dict`: Whether the process is ready, and the state of the
+            database and of the pool.
+        """
+        pool = self.pool_status()
+        database: Dict[str, Any] = {"ok": False, "latency_ms": None, "error": None}
+        if not pool["ok"]:
+            database["error"] = "Not probed, the connection pool is saturated"
+        else:
+            start = time.perf_counter()
+            try:
+                await asyncio.wait_for(self._ping(), self.timeout)
+            except asyncio.TimeoutError:
+                database["error"] = f"No answer within {self.timeout}s"
+            except Exception as e:
+                database["error"] = f"{type(e).__name__}: {e}"
+            else:
+                database["ok"] = True
+                database["latency_ms"] = (time.perf_counter() - start) * 1000
+        return {
+            "ready": database["ok"] and pool["ok"],
+            "checked_at": datetime.now(timezone.utc),
+            "database": database,
+            "pool": pool,
+        }
+
+    async def _ping(self) -> None:
+        async with self.engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+
+    def pool_status(self) -> Dict[str, Any]:
+        """
+        Get the share of the pool capacity checked out.
+
+        #### Returns:
+            `dict`: The connections checked out, the capacity, and their
+            ratio, which are None for pools without a bounded capacity.
+        """
+        stats = pool_stats(self.engine.pool)
+        checked_out = capacity = saturation = None
+        if stats is not None and stats["size"] is not None:
+            checked_out = stats["checked_out"]
+            if stats["max_overflow"] >= 0:
+                capacity = stats["size"] + stats["max_overflow"]
+                saturation = checked_out / capacity
+        return {
+            "ok": saturation is None or saturation < self.max_saturation,
+            "checked_out": checked_out,
+            "capacity": capacity,
+            "saturation": saturation,
+        }
+
+    def clear(self) -> None:
+        """
+        Forget the last result, so that the next call of `status` probes.
+        """
+        self._result = None
+        self._probing = None
+
+
+health_probe = HealthProbe(
+    async_engine,
+    interval=settings.HEALTH_CHECK_INTERVAL_SECONDS,
+    timeout=settings.HEALTH_CHECK_TIMEOUT_SECONDS,
+    max_saturation=settings.HEALTH_MAX_POOL_SATURATION,
+)
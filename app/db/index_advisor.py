@@ -0,0 +1,374 @@
+"""
+Recommend the indexes missing from the models, and write them as an Alembic
+revision building them concurrently.
+
+Foreign keys without an index on their columns are reported from the
+metadata: joins on them and the checks of deletes on the referenced table
+scan the whole table. Given a query log, the columns that logged statements
+filter or join on are reported too. The log is either a Postgres log, with
+`log_statement = 'all'` or `log_min_duration_statement`, or a file of SQL
+statements separated by semicolons.
+
+Usage:
+    python -m app.db.index_advisor
+    python -m app.db.index_advisor --query-log postgresql.log --revision
+"""
+import argparse
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from alembic.util import rev_id
+from sqlalchemy import MetaData, Table, UniqueConstraint
+
+from app.data import models as data_models
+from app.db.base import Base
+
+# The metadata the advisor can inspect. Only the tables of the first one are
+# managed by the migrations.
+METADATA: Dict[str, MetaData] = {
+    "app": Base.metadata,
+    "data": data_models.Base.metadata,
+}
+
+# Postgres truncates longer identifiers
+MAX_IDENTIFIER_LENGTH = 63
+
+_IDENTIFIER = r'(?:"[^"]+"|[A-Za-z_][\w$]*)'
+_OPERATOR = r"(?:=|<>|!=|<=|>=|<|>|\bIN\b|\bIS\b|\bLIKE\b|\bILIKE\b|\bBETWEEN\b)"
+# Tables of the FROM and JOIN clauses, with their optional alias
+_TABLE = re.compile(
+    rf"\b(?:FROM|JOIN)\s+({_IDENTIFIER})(?:\s+(?:AS\s+)?({_IDENTIFIER}))?",
+    re.IGNORECASE,
+)
+# Qualified columns, compared in a predicate if an operator is on either side
+_QUALIFIED_COLUMN = re.compile(rf"({_IDENTIFIER})\.({_IDENTIFIER})")
+_OPERATOR_AFTER = re.compile(rf"\s*{_OPERATOR}", re.IGNORECASE)
+_OPERATOR_BEFORE = re.compile(rf"{_OPERATOR}\s*$", re.IGNORECASE)
+# Unqualified columns compared in a predicate, in single table statements
+_PREDICATE = re.compile(rf'(?<![\w."])({_IDENTIFIER})\s*{_OPERATOR}', re.IGNORECASE)
+_WHERE = re.compile(r"\bWHERE\b(.*)", re.IGNORECASE | re.DOTALL)
+# Prefix of the statements in a Postgres log line
+_LOG_STATEMENT = re.compile(r"\b(?:statement|execute [^:]*):\s*(.*)")
+_KEYWORDS = {
+    "cross", "full", "group", "having", "inner", "join", "left", "limit",
+    "natural", "offset", "on", "order", "outer", "right", "using", "where",
+    "for", "union", "returning", "set", "values",
+}  # fmt: skip
+
+
+@dataclass(frozen=True)
+class Recommendation:
+    """
+    An index to create on the columns of a table.
+    """
+
+    table: str
+    columns: Tuple[str, ...]
+    reason: str
+
+    @property
+    def name(self) -> str:
+        return f"ix_{self.table}_{'_'.join(self.columns)}"[:MAX_IDENTIFIER_LENGTH]
+
+
+def _unquote(identifier: str) -> str:
+    if identifier.startswith('"'):
+        return identifier[1:-1]
+    return identifier.lower()
+
+
+def _indexed_prefixes(table: Table) -> List[Tuple[str, ...]]:
+    """
+    The column lists of the indexes of a table, including the ones backing
+    its primary key and unique constraints.
+    """
+    prefixes = [tuple(column.name for column in table.primary_key.columns)]
+    for constraint in table.constraints:
+        if isinstance(constraint, UniqueConstraint):
+            prefixes.append(tuple(column.name for column in constraint.columns))
+    for index in table.indexes:
+        prefixes.append(tuple(getattr(e, "name", str(e)) for e in index.expressions))
+    return prefixes
+
+
+def is_indexed(table: Table, columns: Sequence[str]) -> bool:
+    """
+    Check whether an index can look up the rows of a table by some columns,
+    which must then be its leading columns, in any order.
+
+    #### Parameters:
+        * `table`: The table.
+        * `columns`: The column names.
+
+    #### Returns:
+        `bool`: True if an index leads with the columns, False otherwise.
+    """
+    return any(
+        set(prefix[: len(columns)]) == set(columns)
+        for prefix in _indexed_prefixes(table)
+    )
+
+
+def unindexed_foreign_keys(metadata: MetaData) -> List[Recommendation]:
+    """
+    Find the foreign keys whose columns no index leads with.
+
+    #### Parameters:
+        `metadata`: The metadata of the models.
+
+    #### Returns:
+        `list`: An index recommendation per unindexed foreign key.
+    """
+    recommendations = []
+    for table in metadata.sorted_tables:
+        for foreign_key in table.foreign_key_constraints:
+            columns = tuple(column.name for column in foreign_key.columns)
+            if not is_indexed(table, columns):
+                recommendations.append(
+                    Recommendation(
+                        table.name,
+                        columns,
+                        f"foreign key to {foreign_key.referred_table.name}",
+                    )
+                )
+    return recommendations
+
+
+def read_statements(lines: Iterable[str]) -> Iterator[str]:
+    """
+    Read the statements of a query log.
+
+    #### Parameters:
+        `lines`: The lines of a Postgres log, in which statements follow
+        `statement:` or `execute <name>:` and continue on indented lines, or
+        of a file of SQL statements separated by semicolons.
+
+    #### Returns:
+        An iterator over the statements.
+    """
+    statement: List[str] = []
+    in_log_entry = False
+    for line in lines:
+        if match := _LOG_STATEMENT.search(line):
+            if statement:
+                yield " ".join(statement)
+            statement = [match.group(1)]
+            in_log_entry = True
+            continue
+        if in_log_entry:
+            if line[:1].isspace():
+                statement.append(line.strip())
+                continue
+            # Any other line ends the statement
+            yield " ".join(statement)
+            statement = []
+            in_log_entry = False
+        *complete, rest = line.split(";")
+        for part in complete:
+            statement.append(part.strip())
+            yield " ".join(statement)
+            statement = []
+        if rest.strip():
+            statement.append(rest.strip())
+    if statement:
+        yield " ".join(statement)
+
+
+def filtered_columns(
+    statement: str, tables: Dict[str, Table]
+) -> Iterator[Tuple[str, str]]:
+    """
+    Find the columns a statement filters or joins on.
+
+    #### Parameters:
+        * `statement`: The SQL statement.
+        * `tables`: The known tables, by name.
+
+    #### Returns:
+        An iterator over the `(table, column)` pairs.
+    """
+    aliases = {}
+    for match in _TABLE.finditer(statement):
+        name, alias = _unquote(match.group(1)), match.group(2)
+        if name not in tables:
+            continue
+        aliases[name] = name
+        if alias is not None and _unquote(alias) not in _KEYWORDS:
+            aliases[_unquote(alias)] = name
+    for match in _QUALIFIED_COLUMN.finditer(statement):
+        table = aliases.get(_unquote(match.group(1)))
+        column = _unquote(match.group(2))
+        if table is None or column not in tables[table].c:
+            continue
+        if _OPERATOR_AFTER.match(statement, match.end()) or _OPERATOR_BEFORE.search(
+            statement, 0, match.start()
+        ):
+            yield table, column
+    if len(set(aliases.values())) == 1 and (where := _WHERE.search(statement)):
+        (table,) = set(aliases.values())
+        for match in _PREDICATE.finditer(where.group(1)):
+            if (column := _unquote(match.group(1))) in tables[table].c:
+                yield table, column
+
+
+def unindexed_filters(
+    statements: Iterable[str], metadata: MetaData, *, min_count: int = 1
+) -> List[Recommendation]:
+    """
+    Find the columns that statements filter or join on, and no index leads
+    with.
+
+    #### Parameters:
+        * `statements`: The logged statements.
+        * `metadata`: The metadata of the models.
+        * `min_count`: The number of statements a column must appear in.
+
+    #### Returns:
+        `list`: An index recommendation per column, most used first.
+    """
+    tables = {table.name: table for table in metadata.sorted_tables}
+    counts: Counter[Tuple[str, str]] = Counter()
+    for statement in statements:
+        counts.update(set(filtered_columns(statement, tables)))
+    return [
+        Recommendation(table, (column,), f"filtered by {n} logged statements")
+        for (table, column), n in counts.most_common()
+        if n >= min_count and not is_indexed(tables[table], (column,))
+    ]
+
+
+def render_operations(recommendations: Sequence[Recommendation]) -> Tuple[str, str]:
+    """
+    Render the operations of the migration creating the recommended indexes.
+
+    The indexes are built concurrently, which cannot happen in a transaction,
+    so that the tables remain writable meanwhile.
+
+    #### Parameters:
+        `recommendations`: The recommended indexes.
+
+    #### Returns:
+        `tuple`: The bodies of the `upgrade` and `downgrade` functions.
+    """
+    upgrades = [
+        "# Build the indexes without locking the tables against writes",
+        "with op.get_context().autocommit_block():",
+    ]
+    downgrades = ["with op.get_context().autocommit_block():"]
+    for recommendation in recommendations:
+        upgrades += [
+            "    op.create_index(",
+            f"        {recommendation.name!r},",
+            f"        {recommendation.table!r},",
+            f"        {list(recommendation.columns)!r},",
+            "        unique=False,",
+            "        postgresql_concurrently=True,",
+            "    )",
+        ]
+    for recommendation in reversed(recommendations):
+        downgrades += [
+            "    op.drop_index(",
+            f"        {recommendation.name!r},",
+            f"        table_name={recommendation.table!r},",
+            "        postgresql_concurrently=True,",
+            "    )",
+        ]
+    return "\n    ".join(upgrades), "\n    ".join(downgrades)
+
+
+def write_revision(
+    config: Config, recommendations: Sequence[Recommendation], message: str
+) -> str:
+    """
+    Write an Alembic revision creating the recommended indexes, on top of the
+    current head.
+
+    #### Parameters:
+        * `config`: The Alembic configuration.
+        * `recommendations`: The recommended indexes.
+        * `message`: The message of the revision.
+
+    #### Returns:
+        `str`: The path of the revision file.
+    """
+    upgrades, downgrades = render_operations(recommendations)
+    script = ScriptDirectory.from_config(config).generate_revision(
+        rev_id(),
+        message,
+        head="head",
+        upgrades=upgrades,
+        downgrades=downgrades,
+    )
+    return script.path
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--metadata",
+        nargs="+",
+        choices=METADATA,
+        default=list(METADATA),
+        help="The models to inspect.",
+    )
+    parser.add_argument("--query-log", help="A Postgres log or a file of statements.")
+    parser.add_argument(
+        "--min-count",
+        type=int,
+        default=1,
+        help="Statements that must filter on a column for it to be reported.",
+    )
+    parser.add_argument(
+        "--revision",
+        action="store_true",
+        help="Write an Alembic revision creating the recommended indexes.",
+    )
+    parser.add_argument("-m", "--message", default="add recommended indexes")
+    parser.add_argument("-c", "--config", default="alembic.ini")
+    args = parser.parse_args(argv)
+
+    statements: List[str] = []
+    if args.query_log:
+        with open(args.query_log) as log:
+            statements = list(read_statements(log))
+    # Keyed by table and columns, as foreign keys may also be filtered on
+    recommendations: Dict[Tuple[str, Tuple[str, ...]], Recommendation] = {}
+    for name in args.metadata:
+        metadata = METADATA[name]
+        for recommendation in [
+            *unindexed_foreign_keys(metadata),
+            *unindexed_filters(statements, metadata, min_count=args.min_count),
+        ]:
+            recommendations.setdefault(
+                (recommendation.table, recommendation.columns), recommendation
+            )
+
+    if not recommendations:
+        print("No missing indexes found.")
+        return
+    print(f"{'table':<32}{'columns':<32}reason")
+    for r in recommendations.values():
+        print(f"{r.table:<32}{', '.join(r.columns):<32}{r.reason}")
+
+    if not args.revision:
+        return
+    migrated = {table.name for table in METADATA["app"].sorted_tables}
+    migrations = [r for r in recommendations.values() if r.table in migrated]
+    if skipped := len(recommendations) - len(migrations):
+        print(f"\nSkipped {skipped} indexes on tables not managed by the migrations.")
+    if not migrations:
+        return
+    path = write_revision(Config(args.config), migrations, args.message)
+    # Or autogenerate would report the indexes as removed
+    print(f"\nWrote {path}. Declare the indexes on the models too:")
+    for r in migrations:
+        columns = ", ".join(repr(column) for column in r.columns)
+        print(f"    Index({r.name!r}, {columns})  # {r.table}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# A bound parameter in any of the DBAPI styles, with an optional type cast
+_PARAMETER = r"(?:\$\d+|\?|%s|%\(\w+\)s|:\w+)(?:::\w+(?:\[\])?)?"
+# A parenthesized list of bound parameters, such as the values of an IN
+_PARAMETER_LIST = re.compile(rf"\(\s*{_PARAMETER}(?:\s*,\s*{_PARAMETER})*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class QueryBudgetExceeded(Exception):
+    """
+    Raised when a statement is repeated more often than the budget allows.
+    """
+
+
+def statement_shape(statement: str) -> str:
+    """
+    Normalize a statement, so that statements differing only in the number of
+    parameters of an IN list have the same shape.
+
+    #### Parameters:
+        `statement`: The SQL statement, as sent to the DBAPI.
+
+    #### Returns:
+        `str`: The shape of the statement.
+    """
+    return _PARAMETER_LIST.sub("(...)", _WHITESPACE.sub(" ", statement).strip())
+
+
+@dataclass
+class QueryStats:
+    """
+    The SQL statements executed while handling a request.
+
+    Statements whose shape is repeated more than `repeat_budget` times are
+    logged, or rejected with `QueryBudgetExceeded` if `strict` is set, as they
+    are usually lazy loads issued once per row of a result.
+    """
+
+    statements: int = 0
+    duration: float = 0.0
+    shapes: Counter = field(default_factory=Counter)
+    repeat_budget: Optional[int] = None
+    strict: bool = False
+
+    def record_shape(self, statement: str) -> None:
+        shape = statement_shape(statement)
+        self.shapes[shape] += 1
+        if self.repeat_budget is None or self.shapes[shape] <= self.repeat_budget:
+            return
+        message = (
+            f"Statement repeated {self.shapes[shape]} times, more than the budget "
+            f"of {self.repeat_budget}: {shape}"
+        )
+        if self.strict:
+            raise QueryBudgetExceeded(message)
+        # Only log once per statement per request
+        if self.shapes[shape] == self.repeat_budget + 1:
+            logger.warning(message)
+
+
+# The statistics of the current request. Async sessions execute statements in
+# greenlets spawned from the request's task, which share its context.
+_query_stats: ContextVar[Optional[QueryStats]] = ContextVar(
+    "query_stats", default=None
+)
+
+
+@contextmanager
+def track_queries(
+    *, repeat_budget: Optional[int] = None, strict: bool = False
+) -> Iterator[QueryStats]:
+    """
+    Count the statements executed by the instrumented engines within the block.
+
+    #### Parameters:
+        * `repeat_budget`: The number of times a statement may be repeated.
+          Unlimited by default.
+        * `strict`: Whether to raise rather than log when over the budget.
+
+    #### Returns:
+        `QueryStats`: The statistics, updated as statements are executed.
+    """
+    stats = QueryStats(repeat_budget=repeat_budget, strict=strict)
+    token = _query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _query_stats.reset(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+    if (stats := _query_stats.get()) is not None:
+        stats.record_shape(statement)
+
+
+def _record_statement(conn) -> None:
+    start = conn.info["query_start_time"].pop()
+    if (stats := _query_stats.get()) is not None:
+        stats.statements += 1
+        stats.duration += time.perf_counter() - start
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _record_statement(conn)
+
+
+def _handle_error(exception_context: Any) -> None:
+    # Failed statements are counted too, and must not leave their start time
+    # behind on the connection
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_start_time"):
+        _record_statement(conn)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """
+    Record the statements executed by an engine in the current `QueryStats`.
+
+    #### Parameters:
+        `engine`: The engine, or the `sync_engine` of an async engine.
+    """
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
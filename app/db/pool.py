@@ -0,0 +1,231 @@
+import bisect
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from uuid import uuid4
+
+from sqlalchemy import Connection, exc, text
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, Pool, QueuePool
+
+from app.core.config import settings
+
+# Upper bounds, in milliseconds, of the buckets of the checkout wait histogram
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class WaitHistogram:
+    """
+    Thread-safe histogram of the time spent waiting for a connection.
+
+    #### Parameters:
+        `buckets`: The increasing upper bounds of the buckets, in milliseconds.
+    """
+
+    def __init__(self, buckets: Sequence[float] = WAIT_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        # The last count is for the waits above the largest bound
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._timeouts = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, *, timed_out: bool = False) -> None:
+        """
+        Record a checkout.
+
+        #### Parameters:
+            * `seconds`: The time spent waiting for the connection.
+            * `timed_out`: Whether the checkout gave up waiting.
+        """
+        ms = seconds * 1000
+        index = bisect.bisect_left(self.buckets, ms)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += ms
+            self._timeouts += timed_out
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get a snapshot of the histogram.
+
+        #### Returns:
+            `dict`: The number of checkouts and timeouts, the total wait, and
+            the cumulative count of checkouts per bucket.
+        """
+        with self._lock:
+            counts = list(self._counts)
+            total, timeouts = self._sum, self._timeouts
+        buckets: List[Dict[str, Any]] = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, None), counts):
+            cumulative += count
+            buckets.append({"le_ms": bound, "count": cumulative})
+        return {
+            "checkouts": cumulative,
+            "timeouts": timeouts,
+            "wait_sum_ms": round(total, 3),
+            "wait_buckets": buckets,
+        }
+
+
+class InstrumentedPool(Pool):
+    """
+    Mixin timing every connection checkout of a pool.
+
+    The wait includes opening a new connection when the pool has none idle,
+    and survives the pool being recreated by `Engine.dispose`.
+    """
+
+    wait_histogram: WaitHistogram
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.wait_histogram = WaitHistogram()
+
+    def recreate(self) -> Pool:
+        pool = super().recreate()
+        pool.wait_histogram = self.wait_histogram
+        return pool
+
+    def _do_get(self) -> Any:
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            self.wait_histogram.observe(
+                time.perf_counter() - start, timed_out=timed_out
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the live statistics of the pool.
+
+        #### Returns:
+            `dict`: The pool class, its occupancy (None when the pool does not
+            keep connections) and its checkout wait histogram.
+        """
+        queued = isinstance(self, QueuePool)
+        return {
+            "pool": type(self).__name__,
+            "size": self.size() if queued else None,
+            "checked_in": self.checkedin() if queued else None,
+            "checked_out": self.checkedout() if queued else None,
+            "overflow": self.overflow() if queued else None,
+            "max_overflow": self._max_overflow if queued else None,
+            **self.wait_histogram.stats(),
+        }
+
+
+class InstrumentedQueuePool(InstrumentedPool, QueuePool):
+    pass
+
+
+class InstrumentedAsyncAdaptedQueuePool(InstrumentedPool, AsyncAdaptedQueuePool):
+    pass
+
+
+class InstrumentedNullPool(InstrumentedPool, NullPool):
+    pass
+
+
+def engine_options(*, asynchronous: bool = False) -> Dict[str, Any]:
+    """
+    Build the pooling arguments of an engine from the settings.
+
+    In PgBouncer mode, connections are not pooled by the application, and
+    asyncpg neither caches nor reuses the names of prepared statements, as
+    consecutive transactions may run on different server connections.
+
+    #### Parameters:
+        `asynchronous`: Whether the arguments are for an async engine.
+
+    #### Returns:
+        `dict`: The keyword arguments of `create_engine`.
+    """
+    if settings.DATABASE_PGBOUNCER:
+        options: Dict[str, Any] = {"poolclass": InstrumentedNullPool}
+        if asynchronous:
+            options["connect_args"] = {
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+                "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+            }
+        return options
+    return {
+        "poolclass": (
+            InstrumentedAsyncAdaptedQueuePool if asynchronous else InstrumentedQueuePool
+        ),
+        "pool_size": settings.DATABASE_POOL_SIZE,
+        "max_overflow": settings.DATABASE_MAX_OVERFLOW,
+        "pool_timeout": settings.DATABASE_POOL_TIMEOUT,
+        "pool_recycle": settings.DATABASE_POOL_RECYCLE,
+        "pool_pre_ping": settings.DATABASE_POOL_PRE_PING,
+        "pool_use_lifo": settings.DATABASE_POOL_USE_LIFO,
+    }
+
+
+def server_connection_limit(connection: Connection) -> int:
+    """
+    Get the number of connections the database server accepts from regular
+    roles.
+
+    #### Parameters:
+        `connection`: A connection to the server.
+
+    #### Returns:
+        `int`: `max_connections`, less the connections reserved to superusers.
+    """
+    return connection.scalar(
+        text(
+            "SELECT current_setting('max_connections')::int"
+            " - current_setting('superuser_reserved_connections')::int"
+        )
+    )
+
+
+def worker_pool_size(
+    workers: int, connection_limit: int, *, pool_size: int, max_overflow: int
+) -> Tuple[int, int]:
+    """
+    Shrink the pool of each worker process of a server, so that the pools of
+    all of them together never exceed a connection limit.
+
+    #### Parameters:
+        * `workers`: The number of worker processes.
+        * `connection_limit`: The connections the workers may open in total.
+        * `pool_size`: The configured size of the pools.
+        * `max_overflow`: The configured overflow of the pools, -1 for no limit.
+
+    #### Returns:
+        `tuple`: The size and overflow of the pool of each worker.
+
+    #### Raises:
+        `ValueError`: If the limit leaves less than a connection per worker.
+    """
+    budget = connection_limit // workers
+    if budget < 1:
+        raise ValueError(
+            f"A limit of {connection_limit} connections cannot be shared by "
+            f"{workers} workers"
+        )
+    pool_size = min(pool_size, budget)
+    if max_overflow < 0:
+        max_overflow = budget - pool_size
+    return pool_size, min(max_overflow, budget - pool_size)
+
+
+def pool_stats(pool: Pool) -> Optional[Dict[str, Any]]:
+    """
+    Get the live statistics of a pool, if it is instrumented.
+
+    #### Parameters:
+        `pool`: The pool of an engine.
+
+    #### Returns:
+        `dict`: See `InstrumentedPool.stats`, or None.
+    """
+    return pool.stats() if isinstance(pool, InstrumentedPool) else None
@@ -0,0 +1,185 @@
+import asyncio
+import itertools
+import logging
+import math
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import Connection, event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+logger = logging.getLogger(__name__)
+
+# Seconds the replay of a standby is behind the primary, 0 when it replayed
+# all it received, including when the primary has not written for a while
+_READ_LAG = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0) "
+    "END"
+)
+
+
+def read_only_transactions(engine: Engine) -> None:
+    """
+    Make every transaction of an engine read-only, so that a write sent to it
+    by mistake fails instead of diverging from the primary.
+
+    #### Parameters:
+        `engine`: The engine of a replica.
+    """
+
+    @event.listens_for(engine, "begin")
+    def set_transaction_read_only(connection: Connection) -> None:
+        connection.exec_driver_sql("SET TRANSACTION READ ONLY")
+
+
+class RoutingSession(Session):
+    """
+    Session reading from a replica until it writes, and from the primary it
+    is bound to from then on, so that it reads its own writes.
+
+    Flushes, INSERT, UPDATE and DELETE statements and SELECT ... FOR UPDATE
+    go to the primary.
+
+    #### Parameters:
+        `replica`: The engine of the replica, or None to use the primary.
+    """
+
+    def __init__(self, *args: Any, replica: Optional[Engine] = None, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.replica = replica
+
+    def get_bind(self, mapper=None, clause=None, **kwargs: Any) -> Any:
+        primary = super().get_bind(mapper, clause=clause, **kwargs)
+        if self.replica is not None and (
+            self._flushing
+            or isinstance(clause, UpdateBase)
+            or getattr(clause, "_for_update_arg", None) is not None
+        ):
+            self.replica = None
+        return primary if self.replica is None else self.replica
+
+
+class ReplicaRouter:
+    """
+    Picks the replica to read from, among the ones lagging behind the primary
+    by at most `max_lag` seconds, in turn.
+
+    The lag of the replicas is measured at most once every `interval`
+    seconds, in the background once first measured, so that picking a
+    replica does not wait for the database.
+
+    #### Parameters:
+        * `replicas`: The engines of the replicas.
+        * `max_lag`: The seconds a replica may lag behind to be read from.
+        * `interval`: The seconds after which the lag is measured again.
+        * `timeout`: The seconds a replica has to report its lag.
+    """
+
+    def __init__(
+        self,
+        replicas: Sequence[AsyncEngine],
+        *,
+        max_lag: float,
+        interval: float,
+        timeout: float,
+    ):
+        self.replicas = list(replicas)
+        self.max_lag = max_lag
+        self.interval = interval
+        self.timeout = timeout
+        self._lags: Optional[List[float]] = None
+        self._checked_at = 0.0
+        self._measuring: Optional[asyncio.Task] = None
+        self._turns = itertools.count()
+
+    async def pick(self) -> Optional[AsyncEngine]:
+        """
+        Pick the replica to read from.
+
+        #### Returns:
+            `AsyncEngine`: The engine of the replica, or None if no replica
+            is configured or lags within the tolerance.
+        """
+        if not self.replicas:
+            return None
+        lags = await self.lags()
+        fresh = [r for r, lag in zip(self.replicas, lags) if lag <= self.max_lag]
+        if not fresh:
+            return None
+        return fresh[next(self._turns) % len(fresh)]
+
+    async def lags(self) -> List[float]:
+        """
+        Get the last measured lag of the replicas, measuring it again in the
+        background if it is stale. Only the first call waits.
+
+        #### Returns:
+            `list`: The lag of every replica in seconds, infinite for the
+            ones that could not be measured.
+        """
+        if self._lags is None:
+            return await self._start_measure()
+        if time.monotonic() - self._checked_at >= self.interval:
+            self._start_measure()
+        return self._lags
+
+    def _start_measure(self) -> asyncio.Task:
+        if self._measuring is None or self._measuring.done():
+            self._measuring = asyncio.create_task(self._measure())
+        return self._measuring
+
+    async def _measure(self) -> List[float]:
+        self._lags = list(await asyncio.gather(*map(self.measure, self.replicas)))
+        self._checked_at = time.monotonic()
+        return self._lags
+
+    async def measure(self, replica: AsyncEngine) -> float:
+        """
+        Measure the lag of a replica.
+
+        #### Parameters:
+            `replica`: The engine of the replica.
+
+        #### Returns:
+            `float`: The lag in seconds, infinite if the replica did not
+            answer in time.
+        """
+        try:
+            return await asyncio.wait_for(self._read_lag(replica), self.timeout)
+        except Exception as e:
+            logger.warning("Could not measure the lag of %s: %r", replica.url, e)
+            return math.inf
+
+    async def _read_lag(self, replica: AsyncEngine) -> float:
+        async with replica.connect() as connection:
+            return float(await connection.scalar(_READ_LAG))
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """
+        Report the last measured lag of the replicas.
+
+        #### Returns:
+            `list`: The URL of every replica, without its password, its lag
+            in seconds, None until measured or if it could not be, and
+            whether it is read from.
+        """
+        lags = self._lags or [math.inf] * len(self.replicas)
+        return [
+            {
+                "url": replica.url.render_as_string(hide_password=True),
+                "lag_seconds": None if math.isinf(lag) else lag,
+                "ok": lag <= self.max_lag,
+            }
+            for replica, lag in zip(self.replicas, lags)
+        ]
+
+    def clear(self) -> None:
+        """
+        Forget the measured lag, so that the next pick measures it.
+        """
+        self._lags = None
+        self._measuring = None
@@ -0,0 +1,103 @@
+import hashlib
+from pathlib import Path
+from typing import Optional, Tuple
+
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy import Connection, Enum, MetaData, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import ProgrammingError
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from app.db.base import Base
+
+ROOT = Path(__file__).resolve().parents[2]
+
+# The fingerprint of the schema the migrations were applied for is stored as
+# the comment of the Alembic version table, so that both are read at once
+_READ_VERSION = text(
+    "SELECT version_num, obj_description('alembic_version'::regclass, 'pg_class') "
+    "FROM alembic_version"
+)
+
+
+def alembic_config() -> Config:
+    """
+    Load the Alembic configuration of the project, wherever it is run from.
+
+    #### Returns:
+        `Config`: The Alembic configuration.
+    """
+    config = Config(str(ROOT / "alembic.ini"))
+    config.set_main_option("script_location", str(ROOT / "alembic"))
+    return config
+
+
+def alembic_head(config: Optional[Config] = None) -> str:
+    """
+    Get the head revision of the migration scripts.
+
+    #### Parameters:
+        `config`: The Alembic configuration. Defaults to the project's.
+
+    #### Returns:
+        `str`: The head revision.
+    """
+    return ScriptDirectory.from_config(config or alembic_config()).get_current_head()
+
+
+def schema_fingerprint(metadata: MetaData = Base.metadata) -> str:
+    """
+    Hash the DDL of the tables, indexes and enumerated types of the models.
+
+    #### Parameters:
+        `metadata`: The metadata of the models.
+
+    #### Returns:
+        `str`: The fingerprint of the schema.
+    """
+    dialect = postgresql.dialect()
+    digest = hashlib.sha256()
+    for table in metadata.sorted_tables:
+        digest.update(str(CreateTable(table).compile(dialect=dialect)).encode())
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            digest.update(str(CreateIndex(index).compile(dialect=dialect)).encode())
+        for column in table.columns:
+            if isinstance(column.type, Enum):
+                digest.update(repr(column.type.enums).encode())
+    return digest.hexdigest()
+
+
+def read_schema_version(connection: Connection) -> Optional[Tuple[str, Optional[str]]]:
+    """
+    Read the revision of the database and the fingerprint stored with it.
+
+    #### Parameters:
+        `connection`: The database connection.
+
+    #### Returns:
+        `tuple`: The revision and the fingerprint, which is None if the
+        migrations were applied without storing one, or None if the database
+        was never migrated.
+    """
+    try:
+        # Do not abort the transaction of the caller if the table is missing
+        with connection.begin_nested():
+            row = connection.execute(_READ_VERSION).first()
+    except ProgrammingError:
+        return None
+    return None if row is None else (row[0], row[1])
+
+
+def store_schema_fingerprint(connection: Connection, fingerprint: str) -> None:
+    """
+    Store the fingerprint of the schema with the revision of the database.
+
+    #### Parameters:
+        * `connection`: The database connection.
+        * `fingerprint`: The fingerprint, see `schema_fingerprint`.
+    """
+    if not fingerprint.isalnum():
+        raise ValueError(f"Invalid schema fingerprint {fingerprint!r}")
+    # COMMENT does not take bound parameters
+    connection.execute(text(f"COMMENT ON TABLE alembic_version IS '{fingerprint}'"))
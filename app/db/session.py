@@ -1,7 +1,46 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
 from app.core.config import settings
+from app.db.metrics import instrument_engine
+from app.db.pool import engine_options
+from app.db.replicas import ReplicaRouter, RoutingSession, read_only_transactions
 
-engine = create_engine(settings.SQLALCHEMY_DATABASE_URI, pool_pre_ping=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
\ No newline at end of file
+# Synchronous engine, used by Alembic and the start-up scripts
+engine = create_engine(settings.SQLALCHEMY_DATABASE_URI, **engine_options())
+instrument_engine(engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Asynchronous engine, used by the API
+async_engine = create_async_engine(
+    settings.SQLALCHEMY_ASYNC_DATABASE_URI, **engine_options(asynchronous=True)
+)
+instrument_engine(async_engine.sync_engine)
+# Objects must stay usable after commit, as an async session cannot lazily
+# refresh expired attributes while the response is being serialized.
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
+
+# Read replicas, read from by the requests that do not write, see
+# `app.api.deps.get_db`
+replica_engines = []
+for uri in settings.SQLALCHEMY_ASYNC_REPLICA_URIS:
+    replica_engine = create_async_engine(uri, **engine_options(asynchronous=True))
+    instrument_engine(replica_engine.sync_engine)
+    read_only_transactions(replica_engine.sync_engine)
+    replica_engines.append(replica_engine)
+replica_router = ReplicaRouter(
+    replica_engines,
+    max_lag=settings.DATABASE_REPLICA_MAX_LAG_SECONDS,
+    interval=settings.DATABASE_REPLICA_CHECK_INTERVAL_SECONDS,
+    timeout=settings.DATABASE_REPLICA_CHECK_TIMEOUT_SECONDS,
+)
+# Sessions reading from the replica they are given until they write
+RoutingSessionLocal = async_sessionmaker(
+    async_engine,
+    sync_session_class=RoutingSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
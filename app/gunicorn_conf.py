@@ -0,0 +1,160 @@
+"""
+Gunicorn configuration of the production server, serving the application
+with uvicorn workers:
+
+    gunicorn -c python:app.gunicorn_conf app.api.main:app
+
+The application is imported once by the master process, and the workers
+forked from it share its memory pages until they write to them. The server
+is tuned through the environment:
+
+    WEB_CONCURRENCY      Worker processes, defaults to the available CPUs.
+    BIND                 Address to listen on, defaults to 0.0.0.0:8000.
+    MAX_REQUESTS         Requests after which a worker is replaced.
+    MAX_REQUESTS_JITTER  Random extra requests, so workers are not all
+                         replaced at once.
+    TIMEOUT              Seconds a worker may be unresponsive before it is
+                         killed.
+    GRACEFUL_TIMEOUT     Seconds a worker has to finish its requests when it
+                         is replaced or the server stops.
+    KEEP_ALIVE           Seconds idle keep-alive connections are kept open.
+    PROMETHEUS_MULTIPROC_DIR
+                         Directory the workers record their metrics in,
+                         defaults to a temporary one.
+
+The pools of the workers are shrunk so that together they stay within
+`DATABASE_CONNECTION_LIMIT`, the CPUs are shared out between their password
+hashing processes, and the cost of password hashing is calibrated against
+`PASSWORD_HASH_BUDGET_MS` once, so that every worker hashes alike. The
+workers record their metrics in `PROMETHEUS_MULTIPROC_DIR` with the
+multiprocess mode of prometheus_client, so that `/metrics` reports the ones
+of the whole server whichever worker serves it.
+"""
+import gc
+import glob
+import math
+import os
+import shutil
+import tempfile
+
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.config import settings
+from app.core.hashing import policy_from_settings
+from app.db.pool import server_connection_limit, worker_pool_size
+
+
+def available_cpus() -> int:
+    """
+    Count the CPUs the process may run on, within the CPU quota of its
+    container.
+
+    #### Returns:
+        `int`: The number of CPUs, at least 1.
+    """
+    cpus = len(os.sched_getaffinity(0))
+    try:
+        # cgroup v2, as set by e.g. `docker run --cpus`
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    return max(cpus, 1)
+
+
+cpus = available_cpus()
+
+worker_class = "uvicorn.workers.UvicornWorker"
+# Each worker serves requests concurrently on its event loop, so one per CPU
+# keeps them all busy
+workers = int(os.getenv("WEB_CONCURRENCY", cpus))
+bind = os.getenv("BIND", "0.0.0.0:8000")
+preload_app = True
+
+max_requests = int(os.getenv("MAX_REQUESTS", 10000))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", max_requests // 10))
+timeout = int(os.getenv("TIMEOUT", 60))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("KEEP_ALIVE", 5))
+
+# The settings are changed before the application is imported, as it creates
+# its engines and its password hasher from them
+if settings.PASSWORD_HASH_WORKERS is None:
+    settings.PASSWORD_HASH_WORKERS = max(cpus // workers, 1)
+
+# Calibrated once, while the machine is otherwise idle, so that every worker
+# hashes with the same cost
+hashing_policy = policy_from_settings(calibrated=True)
+settings.BCRYPT_ROUNDS = hashing_policy.bcrypt_rounds
+settings.ARGON2_TIME_COST = hashing_policy.argon2_time_cost
+
+if not settings.DATABASE_PGBOUNCER:
+    if (connection_limit := settings.DATABASE_CONNECTION_LIMIT) is None:
+        engine = create_engine(settings.SQLALCHEMY_DATABASE_URI, poolclass=NullPool)
+        with engine.connect() as connection:
+            connection_limit = server_connection_limit(connection)
+        engine.dispose()
+    settings.DATABASE_POOL_SIZE, settings.DATABASE_MAX_OVERFLOW = worker_pool_size(
+        workers,
+        connection_limit,
+        pool_size=settings.DATABASE_POOL_SIZE,
+        max_overflow=settings.DATABASE_MAX_OVERFLOW,
+    )
+
+# prometheus_client selects where the metrics are stored when it is imported,
+# so the directory is set before the application is
+if (metrics_dir_created := "PROMETHEUS_MULTIPROC_DIR" not in os.environ):
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="metrics-")
+metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+# Drop the metrics of a previous run of the server
+for path in glob.glob(os.path.join(metrics_dir, "*.db")):
+    os.remove(path)
+
+# Collecting garbage would write to the pages of the objects created by the
+# import of the application, copying them in every worker
+gc.disable()
+
+
+def when_ready(server) -> None:
+    server.log.info("Hashing passwords with %s", hashing_policy)
+    if not settings.DATABASE_PGBOUNCER:
+        server.log.info(
+            "Pools of %d + %d connections per worker, within a limit of %d",
+            settings.DATABASE_POOL_SIZE,
+            settings.DATABASE_MAX_OVERFLOW,
+            connection_limit,
+        )
+
+
+def pre_fork(server, worker) -> None:
+    # Share the libraries the application loads on first use with the workers
+    from app.core.security import preload
+
+    preload()
+    # Move the objects of the master out of reach of the collector
+    gc.freeze()
+
+
+def post_fork(server, worker) -> None:
+    gc.enable()
+    # Connections must not be shared with the master or the other workers
+    from app.db.session import async_engine, engine, replica_engines
+
+    engine.dispose(close=False)
+    for shared in (async_engine, *replica_engines):
+        shared.sync_engine.dispose(close=False)
+
+
+def child_exit(server, worker) -> None:
+    # Drop the live gauges of the worker, its counts are kept
+    from prometheus_client.multiprocess import mark_process_dead
+
+    mark_process_dead(worker.pid)
+
+
+def on_exit(server) -> None:
+    if metrics_dir_created:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
@@ -0,0 +1,34 @@
+import logging
+import time
+
+from alembic import command
+
+from app import backend_pre_start, initial_data
+from app.db.schema import alembic_config, schema_fingerprint, store_schema_fingerprint
+from app.db.session import engine
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def migrate() -> None:
+    config = alembic_config()
+    command.upgrade(config, "head")
+    # Fails if the models differ from the migrated database, so that the
+    # fingerprint is only stored for a schema the migrations fully describe
+    command.check(config)
+    with engine.begin() as connection:
+        store_schema_fingerprint(connection, schema_fingerprint())
+
+
+def main() -> None:
+    backend_pre_start.init()
+    logger.info("Applying migrations")
+    start = time.perf_counter()
+    migrate()
+    logger.info("Migrations applied in %.2fs", time.perf_counter() - start)
+    initial_data.main()
+
+
+if __name__ == "__main__":
+    main()
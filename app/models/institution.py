@@ -1,5 +1,5 @@
 from typing import Optional
-from sqlalchemy import BigInteger, String, Text
+from sqlalchemy import BigInteger, Index, String, Text, func, text
 from sqlalchemy.orm import Mapped
 from sqlalchemy.orm import mapped_column
 
@@ -14,3 +14,12 @@ class Institution(Base):
     contactno: Mapped[str] = mapped_column(String(10), nullable=False)
 
     membership: Mapped[Optional[int]]
+    # Incremented by every update, which only applies to the version it was
+    # read at, see `app.api.conditional`
+    version_id: Mapped[int] = mapped_column(server_default=text("1"))
+
+    __mapper_args__ = {"version_id_col": version_id}
+
+
+# Names are unique and looked up regardless of case
+Index("ix_institution_lower_name", func.lower(Institution.name), unique=True)
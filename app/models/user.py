@@ -1,4 +1,4 @@
-from sqlalchemy import BigInteger, String, ForeignKey
+from sqlalchemy import BigInteger, String, ForeignKey, Index, func, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.orm import Mapped
 from sqlalchemy.orm import mapped_column
@@ -11,6 +11,12 @@ from app.db.base_class import Base
 
 
 class User(Base):
+    __table_args__ = (
+        # Serves both the foreign key and the keyset pagination of the users
+        # of an institution
+        Index("ix_user_institution_id", "institution_id", "id"),
+    )
+
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
     name: Mapped[str] = mapped_column(String(255))
     email: Mapped[str] = mapped_column(String(255), unique=True)
@@ -42,5 +48,18 @@ class User(Base):
         ForeignKey(Institution.__tablename__ + ".id")
     )
     enabled: Mapped[bool] = mapped_column(default=False)
+    # Incremented by every update, which only applies to the version it was
+    # read at, see `app.api.conditional`
+    version_id: Mapped[int] = mapped_column(server_default=text("1"))
+
+    # Always embedded in the API representation of a user, and async sessions
+    # cannot lazy load it while the response is being serialized.
+    institution: Mapped["Institution"] = relationship(
+        "Institution", backref="users", lazy="selectin"
+    )
+
+    __mapper_args__ = {"version_id_col": version_id}
+
 
-    institution: Mapped["Institution"] = relationship("Institution", backref="users")
+# Emails are unique and looked up regardless of case
+Index("ix_user_lower_email", func.lower(User.email), unique=True)
@@ -0,0 +1,51 @@
+import logging
+import sys
+import time
+
+from app import backend_pre_start, initial_data, migrate
+from app.core.config import settings
+from app.db.schema import alembic_head, read_schema_version, schema_fingerprint
+from app.db.session import engine
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def schema_is_current() -> bool:
+    """
+    Check that the database was migrated to the head revision by the
+    migration job, for the models of this version of the application.
+
+    The revision and the fingerprint stored by the job are read in a single
+    query, instead of reflecting the database.
+
+    #### Returns:
+        `bool`: True if the database is up to date, False otherwise.
+    """
+    expected = (alembic_head(), schema_fingerprint())
+    with engine.connect() as connection:
+        version = read_schema_version(connection)
+    if version == expected:
+        return True
+    logger.warning(
+        "Database at revision %s with schema %s, expected revision %s with schema %s",
+        *(version or (None, None)),
+        *expected,
+    )
+    return False
+
+
+def main() -> None:
+    start = time.perf_counter()
+    backend_pre_start.init()
+    if not schema_is_current():
+        if not settings.MIGRATE_ON_START:
+            logger.error("Run the migration job, python app/migrate.py")
+            sys.exit(1)
+        migrate.migrate()
+        initial_data.main()
+    logger.info("Database checked in %.2fs", time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
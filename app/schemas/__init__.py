@@ -1,3 +1,6 @@
 from app.schemas.tokens import Token, TokenPayload
-from app.schemas.user import User, UserCreate, UserInDB, UserUpdate, TitleEnum
-from app.schemas.institution import Institution, InstitutionCreate, InstitutionInDB, InstitutionUpdate
\ No newline at end of file
+from app.schemas.user import User, UserCreate, UserInDB, UserUpdate, TitleEnum, RoleEnum
+from app.schemas.institution import Institution, InstitutionCreate, InstitutionInDB, InstitutionUpdate
+from app.schemas.stats import CacheStats, PasswordHashingStats, PoolStats, ReplicaStats, WaitBucket
+from app.schemas.bulk import BulkImportError, BulkImportResult
+from app.schemas.health import DatabaseHealth, Liveness, PoolHealth, Readiness
@@ -0,0 +1,13 @@
+from typing import List
+from pydantic import BaseModel
+
+
+class BulkImportError(BaseModel):
+    # 1-based number of the record in the upload, excluding the CSV header
+    row: int
+    detail: str
+
+
+class BulkImportResult(BaseModel):
+    imported: int
+    errors: List[BulkImportError]
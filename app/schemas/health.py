@@ -0,0 +1,28 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class Liveness(BaseModel):
+    status: str
+
+
+class DatabaseHealth(BaseModel):
+    ok: bool
+    latency_ms: Optional[float]
+    error: Optional[str]
+
+
+class PoolHealth(BaseModel):
+    ok: bool
+    checked_out: Optional[int]
+    capacity: Optional[int]
+    saturation: Optional[float]
+
+
+class Readiness(BaseModel):
+    ready: bool
+    checked_at: datetime
+    database: DatabaseHealth
+    pool: PoolHealth
@@ -7,7 +7,7 @@ class InstitutionBase(BaseModel):
     name: Optional[str] = None
     address: Optional[str] = None
     email: Optional[EmailStr] = None
-    contactno: Optional[int] = None
+    contactno: Optional[str] = None
 
 
 # Properties to recieve via API on creation
@@ -15,7 +15,7 @@ class InstitutionCreate(InstitutionBase):
     name: str
     address: str
     email: EmailStr
-    contactno: int
+    contactno: str
 
 
 # Properties to update via API on creation
@@ -0,0 +1,47 @@
+from typing import List, Optional
+from pydantic import BaseModel
+
+
+class PasswordHashingStats(BaseModel):
+    workers: int
+    max_pending: int
+    pending: int
+    submitted: int
+    rejected: int
+    latency_p50_ms: Optional[float]
+    latency_p95_ms: Optional[float]
+    latency_p99_ms: Optional[float]
+    latency_max_ms: Optional[float]
+
+
+class CacheStats(BaseModel):
+    size: int
+    maxsize: int
+    hits: int
+    misses: int
+    hit_ratio: Optional[float]
+    evictions: int
+
+
+class WaitBucket(BaseModel):
+    le_ms: Optional[float]
+    count: int
+
+
+class PoolStats(BaseModel):
+    pool: str
+    size: Optional[int]
+    checked_in: Optional[int]
+    checked_out: Optional[int]
+    overflow: Optional[int]
+    max_overflow: Optional[int]
+    checkouts: int
+    timeouts: int
+    wait_sum_ms: float
+    wait_buckets: List[WaitBucket]
+
+
+class ReplicaStats(BaseModel):
+    url: str
+    lag_seconds: Optional[float]
+    ok: bool
@@ -0,0 +1,104 @@
+"""
+Compare the request throughput of the synchronous and asynchronous database paths.
+
+Both variants serve the same primary key lookup of a user: the synchronous one
+from a `def` route running in the threadpool on `SessionLocal`, the asynchronous
+one from an `async def` route on `AsyncSessionLocal`. Requests are sent
+in-process through the ASGI interface, so the numbers reflect the application
+and the database rather than the network stack.
+
+Usage:
+    python -m benchmarks.db_session --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import time
+from typing import Any
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app import crud, schemas
+from app.api.deps import get_db
+from app.db.session import SessionLocal
+from app.models import User
+
+
+def get_sync_db():
+    try:
+        db = SessionLocal()
+        yield db
+    finally:
+        db.close()
+
+
+def build_app() -> FastAPI:
+    """
+    Build an application exposing the same lookup through both database paths.
+    """
+    app = FastAPI()
+
+    @app.get("/sync/users/{user_id}", response_model=schemas.User)
+    def read_user_sync(user_id: int, db: Session = Depends(get_sync_db)) -> Any:
+        return crud.user.get(db, id=user_id)
+
+    @app.get("/async/users/{user_id}", response_model=schemas.User)
+    async def read_user_async(
+        user_id: int, db: AsyncSession = Depends(get_db)
+    ) -> Any:
+        return await crud.async_user.get(db, id=user_id)
+
+    return app
+
+
+async def measure(
+    client: httpx.AsyncClient, path: str, *, requests: int, concurrency: int
+) -> float:
+    """
+    Send `requests` GET requests to `path` from `concurrency` concurrent clients.
+
+    #### Returns:
+        `float`: The achieved throughput in requests per second.
+    """
+    remaining = requests
+
+    async def worker() -> None:
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            response = await client.get(path)
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return requests / (time.perf_counter() - start)
+
+
+async def main(requests: int, concurrency: int) -> None:
+    with SessionLocal() as db:
+        user_id = db.scalar(select(User.id).limit(1))
+    if user_id is None:
+        raise SystemExit("No users found, run app/initial_data.py first.")
+
+    transport = httpx.ASGITransport(app=build_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"{'path':<8}{'requests/s':>12}")
+        for path in ("sync", "async"):
+            url = f"/{path}/users/{user_id}"
+            # Warm up the connection pools before measuring
+            await measure(client, url, requests=concurrency, concurrency=concurrency)
+            rps = await measure(
+                client, url, requests=requests, concurrency=concurrency
+            )
+            print(f"{path:<8}{rps:>12.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
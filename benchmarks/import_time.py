@@ -0,0 +1,106 @@
+"""
+Report where the time of importing the application goes, from the output of
+`python -X importtime` in fresh interpreters.
+
+The imports are timed `--repeat` times and the fastest run is reported: its
+total, the modules taking the most time with their imports, and the time the
+modules of every top-level package take themselves. The bytecode is compiled
+by a first untimed run, as in an image shipping it.
+
+Usage:
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --module app.core.security --top 30
+"""
+import argparse
+import subprocess
+import sys
+from collections import Counter
+from dataclasses import dataclass
+from typing import List
+
+
+@dataclass(frozen=True)
+class Import:
+    """
+    A module imported, with the microseconds its own code took and the ones
+    its imports took too.
+    """
+
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+    @property
+    def package(self) -> str:
+        return self.module.split(".")[0]
+
+
+def parse_importtime(output: str) -> List[Import]:
+    """
+    Parse the report of `-X importtime`.
+
+    #### Parameters:
+        `output`: The standard error of the interpreter.
+
+    #### Returns:
+        `list`: The imports, in the order they completed.
+    """
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        module = name.lstrip()
+        depth = (len(name) - len(module) - 1) // 2
+        imports.append(Import(module, int(self_us), int(cumulative_us), depth))
+    return imports
+
+
+def time_imports(module: str) -> List[Import]:
+    """
+    Import a module in a fresh interpreter and time the imports.
+
+    #### Parameters:
+        `module`: The module to import.
+
+    #### Returns:
+        `list`: The imports, see `parse_importtime`.
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return parse_importtime(process.stderr)
+
+
+def total_us(imports: List[Import]) -> int:
+    return sum(i.cumulative_us for i in imports if i.depth == 0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--module", default="app.api.main")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=20, help="Rows per table")
+    args = parser.parse_args()
+
+    time_imports(args.module)
+    imports = min((time_imports(args.module) for _ in range(args.repeat)), key=total_us)
+
+    print(f"Importing {args.module} took {total_us(imports) / 1000:.1f} ms\n")
+    print(f"{'cumulative ms':>14}{'self ms':>10}  module")
+    for i in sorted(imports, key=lambda i: i.cumulative_us, reverse=True)[: args.top]:
+        print(
+            f"{i.cumulative_us / 1000:>14.1f}{i.self_us / 1000:>10.1f}  "
+            f"{'  ' * i.depth}{i.module}"
+        )
+
+    packages: Counter[str] = Counter()
+    for i in imports:
+        packages[i.package] += i.self_us
+    print(f"\n{'self ms':>14}  package")
+    for package, us in packages.most_common(args.top):
+        print(f"{us / 1000:>14.1f}  {package}")
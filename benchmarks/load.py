@@ -0,0 +1,348 @@
+"""
+Replay conference traffic against the API served by uvicorn, and report the
+throughput, latency percentiles and error rate of every scenario.
+
+The scenarios reproduce the traffic of a submission deadline:
+
+    login         Login storm on `/auth/token`.
+    listing       Admins paging through `/users/` and `/institutions/`.
+    registration  Registration spike on `/users/open`.
+    mixed         Reads of users and institutions with occasional updates.
+
+Each scenario runs for `--duration` seconds, with `--concurrency` clients
+sending requests one after the other. The server is started with uvicorn on
+the database configured in the environment, unless `--url` points to one
+already running on that database. Users and an institution are temporarily
+inserted for the scenarios and deleted afterwards, with the users registered
+during the run.
+
+Usage:
+    python -m benchmarks.load --concurrency 50 --duration 30 --workers 2
+    python -m benchmarks.load --scenarios login registration --url http://localhost:8000
+"""
+import argparse
+import asyncio
+import contextlib
+import random
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from collections import Counter
+from itertools import count
+from typing import Awaitable, Callable, Dict, Iterator, List
+
+import httpx
+from sqlalchemy import delete, insert
+
+from app.core.security import get_password_hash
+from app.db.session import SessionLocal
+from app.models import Institution, User
+
+PASSWORD = "load-test-password"
+
+
+class Context:
+    """
+    The data shared by the requests of the scenarios.
+
+    #### Parameters:
+        * `prefix`: The prefix of the emails of the users created by the run.
+        * `institution_id`: The ID of the seeded institution.
+        * `user_ids`: The IDs of the seeded users, the first one a superuser.
+        * `emails`: The emails of the seeded users.
+    """
+
+    def __init__(
+        self, prefix: str, institution_id: int, user_ids: List[int], emails: List[str]
+    ):
+        self.prefix = prefix
+        self.institution_id = institution_id
+        self.user_ids = user_ids
+        self.emails = emails
+        self.headers: Dict[str, str] = {}
+        self.registrations: Iterator[int] = count()
+
+
+Scenario = Callable[[httpx.AsyncClient, Context], Awaitable[httpx.Response]]
+
+
+async def login(client: httpx.AsyncClient, context: Context) -> httpx.Response:
+    return await client.post(
+        "/auth/token",
+        data={"username": random.choice(context.emails), "password": PASSWORD},
+    )
+
+
+async def listing(client: httpx.AsyncClient, context: Context) -> httpx.Response:
+    path = random.choice(("/users/", "/institutions/"))
+    return await client.get(path, params={"limit": 100}, headers=context.headers)
+
+
+async def registration(client: httpx.AsyncClient, context: Context) -> httpx.Response:
+    n = next(context.registrations)
+    return await client.post(
+        "/users/open",
+        json={
+            "password": PASSWORD,
+            "email": f"{context.prefix}-new-{n}@example.com",
+            "name": f"Registered User {n}",
+            "contactno": f"{context.prefix[-6:]}9{n:08d}",
+            "institution_id": context.institution_id,
+        },
+    )
+
+
+async def mixed(client: httpx.AsyncClient, context: Context) -> httpx.Response:
+    user_id = random.choice(context.user_ids)
+    roll = random.random()
+    if roll < 0.7:
+        return await client.get(f"/users/{user_id}", headers=context.headers)
+    if roll < 0.85:
+        return await client.get("/users/me", headers=context.headers)
+    if roll < 0.95:
+        return await client.get(
+            f"/institutions/{context.institution_id}/users",
+            params={"limit": 20},
+            headers=context.headers,
+        )
+    return await client.put(
+        f"/users/{user_id}",
+        json={"department": f"Department {random.randrange(100)}"},
+        headers=context.headers,
+    )
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    "login": login,
+    "listing": listing,
+    "registration": registration,
+    "mixed": mixed,
+}
+
+
+class Results:
+    """
+    The latencies and outcomes of the requests of a scenario.
+    """
+
+    def __init__(self) -> None:
+        self.latencies: List[float] = []
+        self.outcomes: Counter[str] = Counter()
+        self.elapsed = 0.0
+
+    def record(self, latency: float, outcome: str) -> None:
+        self.latencies.append(latency)
+        self.outcomes[outcome] += 1
+
+    @property
+    def errors(self) -> int:
+        """
+        The number of requests that failed or got a response other than 2xx.
+        """
+        return sum(n for outcome, n in self.outcomes.items() if outcome[0] != "2")
+
+    def percentiles(self) -> List[float]:
+        """
+        #### Returns:
+            `list`: The p50, p95 and p99 latencies in milliseconds.
+        """
+        if len(self.latencies) < 2:
+            return [self.latencies[0] * 1000 if self.latencies else 0.0] * 3
+        quantiles = statistics.quantiles(self.latencies, n=100, method="inclusive")
+        return [quantiles[p - 1] * 1000 for p in (50, 95, 99)]
+
+
+async def run(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    context: Context,
+    *,
+    concurrency: int,
+    duration: float,
+) -> Results:
+    """
+    Send the requests of `scenario` from `concurrency` concurrent clients for
+    `duration` seconds.
+    """
+    results = Results()
+    deadline = time.perf_counter() + duration
+
+    async def worker() -> None:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                response = await scenario(client, context)
+                outcome = str(response.status_code)
+            except httpx.TimeoutException:
+                outcome = "timeout"
+            except httpx.TransportError as e:
+                outcome = type(e).__name__
+            results.record(time.perf_counter() - start, outcome)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    results.elapsed = time.perf_counter() - start
+    return results
+
+
+def seed(prefix: str, users: int) -> Context:
+    """
+    Insert an institution and `users` enabled users identified by `prefix`,
+    the first of them a superuser, all with the same password.
+    """
+    hashed_password = get_password_hash(PASSWORD)
+    emails = [f"{prefix}-{i}@example.com" for i in range(users)]
+    with SessionLocal() as db:
+        institution_id = db.scalar(
+            insert(Institution).returning(Institution.id),
+            {
+                "name": prefix,
+                "address": "Load Test Street",
+                "email": f"{prefix}@example.com",
+                "contactno": "0000000000",
+            },
+        )
+        user_ids = db.scalars(
+            insert(User).returning(User.id),
+            [
+                {
+                    "name": f"Load Test User {i}",
+                    "email": email,
+                    "contactno": f"{prefix[-6:]}0{i:08d}",
+                    "hashed_password": hashed_password,
+                    "role": "SuperAdmin" if i == 0 else "Author",
+                    "enabled": True,
+                    "institution_id": institution_id,
+                }
+                for i, email in enumerate(emails)
+            ],
+        ).all()
+        db.commit()
+    return Context(prefix, institution_id, list(user_ids), emails)
+
+
+def cleanup(prefix: str) -> None:
+    with SessionLocal() as db:
+        db.execute(delete(User).where(User.email.startswith(f"{prefix}-")))
+        db.execute(delete(Institution).where(Institution.name == prefix))
+        db.commit()
+
+
+@contextlib.contextmanager
+def serve(port: int, workers: int) -> Iterator[str]:
+    """
+    Run the application with uvicorn until the block exits.
+
+    #### Returns:
+        `str`: The base URL of the server.
+    """
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.api.main:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            "--log-level",
+            "warning",
+            "--no-access-log",
+        ]
+    )
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+async def wait_until_ready(client: httpx.AsyncClient, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        with contextlib.suppress(httpx.TransportError):
+            if (await client.get("/ping")).status_code == 200:
+                return
+        if time.monotonic() > deadline:
+            raise SystemExit("The server did not start in time.")
+        await asyncio.sleep(0.2)
+
+
+async def main(
+    url: str, scenarios: List[str], *, concurrency: int, duration: float, context: Context
+) -> None:
+    async with httpx.AsyncClient(
+        base_url=url,
+        timeout=30,
+        limits=httpx.Limits(max_connections=concurrency),
+    ) as client:
+        await wait_until_ready(client)
+        response = await client.post(
+            "/auth/token", data={"username": context.emails[0], "password": PASSWORD}
+        )
+        response.raise_for_status()
+        context.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+
+        print(
+            f"{'scenario':<14}{'requests':>10}{'req/s':>10}{'p50 ms':>10}"
+            f"{'p95 ms':>10}{'p99 ms':>10}{'errors':>9}"
+        )
+        failures = {}
+        for name in scenarios:
+            results = await run(
+                client,
+                SCENARIOS[name],
+                context,
+                concurrency=concurrency,
+                duration=duration,
+            )
+            total = len(results.latencies)
+            p50, p95, p99 = results.percentiles()
+            print(
+                f"{name:<14}{total:>10}{total / results.elapsed:>10.1f}{p50:>10.1f}"
+                f"{p95:>10.1f}{p99:>10.1f}{results.errors / max(total, 1):>9.1%}"
+            )
+            if results.errors:
+                failures[name] = {
+                    outcome: n
+                    for outcome, n in results.outcomes.items()
+                    if outcome[0] != "2"
+                }
+        for name, outcomes in failures.items():
+            print(f"{name} errors: " + ", ".join(f"{o}: {n}" for o, n in outcomes.items()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS)
+    )
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=30, help="Seconds per scenario")
+    parser.add_argument("--users", type=int, default=200, help="Users to seed")
+    parser.add_argument("--url", help="Base URL of a running server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    args = parser.parse_args()
+
+    prefix = f"load{uuid.uuid4().hex[:6]}"
+    context = seed(prefix, args.users)
+    try:
+        with contextlib.ExitStack() as stack:
+            url = args.url or stack.enter_context(serve(args.port, args.workers))
+            asyncio.run(
+                main(
+                    url,
+                    args.scenarios,
+                    concurrency=args.concurrency,
+                    duration=args.duration,
+                    context=context,
+                )
+            )
+    finally:
+        cleanup(prefix)
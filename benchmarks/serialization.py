@@ -0,0 +1,147 @@
+"""
+Compare the latency of the ORM and projected read paths of the user list.
+
+The ORM variant is the former `/users/` path: it loads `User` instances with
+their institution, and FastAPI validates each one against `schemas.User` in
+`orm_mode` before encoding it. The projected variant is the current one: it
+selects only the columns of `schemas.User` as dictionaries and serializes them
+straight to JSON with orjson. Users are temporarily inserted for the
+benchmark and deleted afterwards.
+
+Usage:
+    python -m benchmarks.serialization --sizes 100 1000 10000 --repeat 20
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from typing import Any, List
+
+import httpx
+from fastapi import Depends, FastAPI
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import delete, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud, schemas
+from app.api.deps import get_db
+from app.crud.loading import loader_options
+from app.db.session import SessionLocal
+from app.models import Institution, User
+
+
+def build_app() -> FastAPI:
+    """
+    Build an application exposing the user list through both read paths.
+    """
+    app = FastAPI()
+
+    @app.get("/orm/users", response_model=List[schemas.User])
+    async def read_users_orm(limit: int, db: AsyncSession = Depends(get_db)) -> Any:
+        return await crud.async_user.get_multi(
+            db, limit=limit, options=loader_options(User, schemas.User)
+        )
+
+    @app.get("/projected/users", response_model=List[schemas.User])
+    async def read_users_projected(
+        limit: int, db: AsyncSession = Depends(get_db)
+    ) -> Any:
+        return ORJSONResponse(
+            await crud.async_user.get_multi_projected(
+                db, schema=schemas.User, limit=limit
+            )
+        )
+
+    return app
+
+
+def seed(count: int, prefix: str) -> None:
+    """
+    Insert `count` users spread over ten institutions, all identified by
+    `prefix`.
+    """
+    with SessionLocal() as db:
+        institution_ids = db.scalars(
+            insert(Institution).returning(Institution.id),
+            [
+                {
+                    "name": f"{prefix}-{i}",
+                    "address": "Benchmark Street",
+                    "email": f"{prefix}-{i}@example.com",
+                    "contactno": "0000000000",
+                }
+                for i in range(10)
+            ],
+        ).all()
+        db.execute(
+            insert(User),
+            [
+                {
+                    "name": f"Benchmark User {i}",
+                    "email": f"{prefix}-{i}@example.com",
+                    "contactno": f"{prefix[:6]}{i:09d}",
+                    "hashed_password": "not-a-real-hash",
+                    "role": "Author",
+                    "enabled": True,
+                    "institution_id": institution_ids[i % 10],
+                }
+                for i in range(count)
+            ],
+        )
+        db.commit()
+
+
+def cleanup(prefix: str) -> None:
+    with SessionLocal() as db:
+        db.execute(delete(User).where(User.email.startswith(f"{prefix}-")))
+        db.execute(delete(Institution).where(Institution.name.startswith(f"{prefix}-")))
+        db.commit()
+
+
+async def measure(client: httpx.AsyncClient, path: str, *, repeat: int) -> float:
+    """
+    Send `repeat` sequential GET requests to `path`.
+
+    #### Returns:
+        `float`: The median latency in milliseconds.
+    """
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = await client.get(path)
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return statistics.median(latencies)
+
+
+async def main(sizes: List[int], repeat: int) -> None:
+    prefix = f"bench{uuid.uuid4().hex[:8]}"
+    seed(max(sizes), prefix)
+    try:
+        transport = httpx.ASGITransport(app=build_app())
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench"
+        ) as client:
+            print(f"{'rows':>8}{'orm ms':>12}{'projected ms':>16}{'speedup':>10}")
+            for size in sizes:
+                results = []
+                for path in ("orm", "projected"):
+                    url = f"/{path}/users?limit={size}"
+                    # Warm up the connection pool and the statement caches
+                    await measure(client, url, repeat=1)
+                    results.append(await measure(client, url, repeat=repeat))
+                orm, projected = results
+                print(
+                    f"{size:>8}{orm:>12.1f}{projected:>16.1f}{orm / projected:>9.1f}x"
+                )
+    finally:
+        cleanup(prefix)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.sizes, args.repeat))
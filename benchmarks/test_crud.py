@@ -0,0 +1,36 @@
+from itertools import count
+
+from sqlalchemy.orm import Session
+
+from app import crud, schemas
+from app.models import User
+
+
+def test_get(benchmark, sync_session: Session, superuser: User):
+    def get() -> User:
+        # Bypass the identity map, as a new request would
+        sync_session.expunge_all()
+        return crud.user.get(sync_session, id=superuser.id)
+
+    assert benchmark(get).id == superuser.id
+
+
+def test_update(benchmark, sync_session: Session, superuser: User):
+    departments = (f"Department {i}" for i in count())
+    user = sync_session.merge(superuser)
+
+    def update() -> User:
+        return crud.user.update(
+            sync_session,
+            db_obj=user,
+            obj_in=schemas.UserUpdate(department=next(departments)),
+        )
+
+    assert benchmark(update).department.startswith("Department")
+
+
+def test_get_multi_projected(benchmark, sync_session: Session):
+    users = benchmark(
+        crud.user.get_multi_projected, sync_session, schema=schemas.User, limit=100
+    )
+    assert len(users) == 100
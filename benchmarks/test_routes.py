@@ -0,0 +1,32 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.models import User
+
+
+@pytest.mark.parametrize("limit", [10, 100, 1000])
+def test_read_users(benchmark, client: TestClient, limit: int):
+    response = benchmark(client.get, "/users/", params={"limit": limit})
+    assert response.status_code == 200
+    assert len(response.json()) == limit
+
+
+def test_read_institutions(benchmark, client: TestClient):
+    response = benchmark(client.get, "/institutions/")
+    assert response.status_code == 200
+
+
+def test_read_users_of_institution(
+    benchmark, client: TestClient, superuser: User
+):
+    response = benchmark(
+        client.get,
+        f"/institutions/{superuser.institution_id}/users",
+        params={"include_total": True},
+    )
+    assert response.status_code == 200
+
+
+def test_read_user(benchmark, client: TestClient, superuser: User):
+    response = benchmark(client.get, f"/users/{superuser.id}")
+    assert response.status_code == 200
@@ -0,0 +1,26 @@
+from jose import jwt
+
+from app.core import security
+from app.core.config import settings
+
+
+def test_create_access_token(benchmark):
+    token = benchmark(security.create_access_token, 1)
+    assert token.count(".") == 2
+
+
+def test_jwt_decode(benchmark):
+    # The signature check and claims validation done on every cache miss of
+    # `get_current_principal`
+    token = security.create_access_token(1)
+    payload = benchmark(
+        jwt.decode, token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
+    )
+    assert payload["sub"] == "1"
+
+
+def test_decode_access_token_cached(benchmark):
+    token = security.create_access_token(1)
+    security.decode_access_token(token)
+    token_data = benchmark(security.decode_access_token, token)
+    assert token_data.sub == 1
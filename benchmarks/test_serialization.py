@@ -0,0 +1,45 @@
+from typing import List
+
+import orjson
+import pytest
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import Session
+
+from app import crud, schemas
+from app.crud.loading import loader_options
+from app.crud.projection import projection
+from app.models import User
+
+
+@pytest.fixture(scope="module")
+def users(sync_session: Session) -> List[User]:
+    return crud.user.get_multi(
+        sync_session, limit=100, options=loader_options(User, schemas.User)
+    )
+
+
+def test_from_orm(benchmark, users: List[User]):
+    user = benchmark(schemas.User.from_orm, users[0])
+    assert user.institution is not None
+
+
+def test_from_orm_page(benchmark, users: List[User]):
+    # What the former list routes did with every page before encoding it
+    def serialize() -> bytes:
+        return orjson.dumps(
+            jsonable_encoder([schemas.User.from_orm(user) for user in users])
+        )
+
+    assert benchmark(serialize).startswith(b"[")
+
+
+def test_projection_page(benchmark, sync_session: Session):
+    # What the list routes do with every page instead
+    rows = sync_session.execute(
+        projection(User, schemas.User).select().order_by(User.id).limit(100)
+    ).all()
+
+    def serialize() -> bytes:
+        return orjson.dumps([projection(User, schemas.User).to_dict(row) for row in rows])
+
+    assert benchmark(serialize).startswith(b"[")
@@ -0,0 +1,6 @@
+#!/bin/bash
+set -e
+
+# One-shot job applying the migrations and creating the initial data, to run
+# once per release before the API containers are started or scaled
+exec python /usr/src/app/app/migrate.py
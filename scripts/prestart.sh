@@ -1,26 +1,10 @@
 #!/bin/bash
+set -e
 
-# Let the DB start
-python /usr/src/app/app/backend_pre_start.py
+# Reported by the application as its cold start time once it is ready
+export STARTED_AT=$(date +%s.%N)
 
-# Check if there are any changes in the database schema
-check_output=$(alembic check)
-if echo "$check_output" | grep -q "New upgrade operations detected"; then
-  echo "Changes detected in the database schema. Creating revision..."
-  # Run the alembic revision command
-  alembic revision --autogenerate -m "auto-generated migration"
-  # Apply Alembic migration
-  alembic upgrade head
-elif echo "$check_output" | grep -q "Target database is not up to date"; then
-  echo "Target database is not up to date. Applying migration..."
-  # Apply Alembic migration
-  alembic upgrade head
-else
-  echo "No changes detected in the database schema."
-fi
-
-# Create initial data in DB
-python /usr/src/app/app/initial_data.py
-
-exec uvicorn app.api.main:app --workers 2 --host 0.0.0.0 --port 8000
+# Let the DB start, and check that the migration job ran for this version
+python /usr/src/app/app/prestart.py
 
+exec gunicorn -c python:app.gunicorn_conf app.api.main:app
@@ -1,20 +1,37 @@
 import os
+from contextlib import contextmanager
+from typing import Iterator, List
+
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import NullPool
 from app import models
 
 from app.db.base import Base
 from app.api.main import app
 from app.core.config import settings
+from app.core.principal import principal_cache
 from app.db.init_db import init_db
+from app.db.metrics import instrument_engine
 
 engine = create_engine(settings.SQLALCHEMY_TEST_DATABASE_URI, pool_pre_ping=True)
 TestingSessionLocal: Session = sessionmaker(
     autocommit=False, autoflush=False, bind=engine
 )
 
+# Each test module runs the app on its own event loop, so async connections
+# must not be pooled across modules.
+async_engine = create_async_engine(
+    settings.SQLALCHEMY_ASYNC_TEST_DATABASE_URI, poolclass=NullPool
+)
+instrument_engine(async_engine.sync_engine)
+TestingAsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
+
 
 @pytest.fixture(scope="module")
 def test_client():
@@ -46,3 +63,31 @@ def setup_sadmin(db_session: Session):
         db_session.execute(table.delete())
 
     db_session.commit()
+    principal_cache.clear()
+
+
+@pytest.fixture
+def assert_max_queries():
+    """
+    Assert that a block executes at most `n` statements through the async
+    engine serving the app, e.g. `with assert_max_queries(2): client.get(...)`.
+    """
+
+    @contextmanager
+    def assert_max_queries(n: int) -> Iterator[List[str]]:
+        statements: List[str] = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+        try:
+            yield statements
+        finally:
+            event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+        assert len(statements) <= n, (
+            f"Expected at most {n} statements, executed {len(statements)}:\n"
+            + "\n".join(statements)
+        )
+
+    return assert_max_queries
@@ -0,0 +1,155 @@
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import Session
+
+from app.api.main import app
+from app.core.config import settings
+from app.core.security import create_access_token
+from app.db.pool import (
+    InstrumentedNullPool,
+    InstrumentedQueuePool,
+    engine_options,
+    server_connection_limit,
+    worker_pool_size,
+)
+from app.api.deps import get_db
+from app import schemas
+
+from tests.conftest import (
+    db_session,
+    test_client,
+    setup_sadmin,
+    TestingAsyncSessionLocal,
+)
+
+
+async def override_get_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+
+app.dependency_overrides[get_db] = override_get_db
+
+
+def test_read_password_hashing_stats(
+    test_client: TestClient, db_session: Session, setup_sadmin: schemas.User
+):
+    access_token = create_access_token(setup_sadmin.id)
+    headers = {"Authorization": f"Bearer {access_token}"}
+
+    # Creating a user hashes its password in the hashing pool
+    response = test_client.post(
+        "/users/open",
+        json={
+            "password": "password",
+            "contactno": "1234567890",
+            "email": "newuser@example.com",
+            "name": "New User",
+        },
+    )
+    assert response.status_code == 200
+
+    response = test_client.get("/admin/stats/password-hashing", headers=headers)
+    assert response.status_code == 200
+    stats = response.json()
+    assert stats["submitted"] >= 1
+    assert stats["pending"] == 0
+
+
+def test_read_principal_cache_stats(
+    test_client: TestClient, db_session: Session, setup_sadmin: schemas.User
+):
+    access_token = create_access_token(setup_sadmin.id)
+    headers = {"Authorization": f"Bearer {access_token}"}
+
+    # The first request caches the principal, the second one hits the cache
+    for _ in range(2):
+        response = test_client.get("/admin/stats/principal-cache", headers=headers)
+        assert response.status_code == 200
+
+    stats = response.json()
+    assert stats["size"] == 1
+    assert stats["hits"] >= 1
+
+
+def test_read_pool_stats(
+    test_client: TestClient, db_session: Session, setup_sadmin: schemas.User
+):
+    access_token = create_access_token(setup_sadmin.id)
+    headers = {"Authorization": f"Bearer {access_token}"}
+
+    response = test_client.get("/admin/stats/pool", headers=headers)
+    assert response.status_code == 200
+    stats = response.json()
+    assert stats["pool"] == "InstrumentedAsyncAdaptedQueuePool"
+    assert stats["size"] == settings.DATABASE_POOL_SIZE
+    assert stats["wait_buckets"][-1]["le_ms"] is None
+
+
+def test_instrumented_pool_records_checkouts():
+    engine = create_engine(
+        settings.SQLALCHEMY_TEST_DATABASE_URI,
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.1,
+    )
+    try:
+        with engine.connect():
+            # The only connection is checked out, so the next checkout times out
+            with pytest.raises(exc.TimeoutError):
+                engine.connect()
+            stats = engine.pool.stats()
+            assert stats["checked_out"] == 1
+        assert stats["checkouts"] == 2
+        assert stats["timeouts"] == 1
+        # The timed out checkout waited for at least the pool timeout
+        assert stats["wait_sum_ms"] >= 100
+
+        # The histogram survives the pool being recreated
+        engine.dispose()
+        assert engine.pool.stats()["checkouts"] == 2
+    finally:
+        engine.dispose()
+
+
+def test_pgbouncer_engine_options(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(settings, "DATABASE_PGBOUNCER", True)
+    options = engine_options(asynchronous=True)
+    assert options["poolclass"] is InstrumentedNullPool
+    assert "pool_size" not in options
+
+    # Statements are neither cached nor prepared under a reused name
+    async def connect_twice():
+        engine = create_async_engine(
+            settings.SQLALCHEMY_ASYNC_TEST_DATABASE_URI, **options
+        )
+        try:
+            for _ in range(2):
+                async with engine.connect() as connection:
+                    assert (await connection.execute(text("SELECT 1"))).scalar() == 1
+            return engine.pool.stats()
+        finally:
+            await engine.dispose()
+
+    assert asyncio.run(connect_twice())["checkouts"] == 2
+
+
+def test_worker_pool_size():
+    # Configured pools fitting in the limit are kept
+    assert worker_pool_size(4, 100, pool_size=5, max_overflow=10) == (5, 10)
+    # The overflow goes first
+    assert worker_pool_size(4, 40, pool_size=5, max_overflow=10) == (5, 5)
+    assert worker_pool_size(8, 30, pool_size=5, max_overflow=10) == (3, 0)
+    # An unlimited overflow is bounded by the limit
+    assert worker_pool_size(2, 30, pool_size=5, max_overflow=-1) == (5, 10)
+    with pytest.raises(ValueError):
+        worker_pool_size(8, 4, pool_size=5, max_overflow=10)
+
+    engine = create_engine(settings.SQLALCHEMY_TEST_DATABASE_URI)
+    with engine.connect() as connection:
+        assert server_connection_limit(connection) > 0
+    engine.dispose()
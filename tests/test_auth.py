@@ -3,19 +3,17 @@ from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 
 from app.api.main import app
-from app.core.security import get_password_hash
+from app.core.hashing import HashingPolicy
+from app.core.security import get_password_hash, password_context
 from app import models
 from app.api.deps import get_db
 
-from tests.conftest import TestingSessionLocal, db_session, test_client
+from tests.conftest import TestingAsyncSessionLocal, db_session, test_client
 
 
-def override_get_db():
-    db = TestingSessionLocal()
-    try:
+async def override_get_db():
+    async with TestingAsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
 app.dependency_overrides[get_db] = override_get_db
@@ -46,3 +44,30 @@ def test_login_for_access_token(test_client: TestClient, db_session: Session):
     data = response.json()
     assert "access_token" in data
     assert data["token_type"] == "bearer"
+
+
+def test_login_upgrades_outdated_hash(test_client: TestClient, db_session: Session):
+    outdated = HashingPolicy(bcrypt_rounds=4).context().hash("password")
+    user = models.User(
+        email="test@example.com",
+        contactno="1234567890",
+        hashed_password=outdated,
+        name="Test User",
+        enabled=True,
+    )
+    db_session.add(user)
+    db_session.commit()
+    version_id = user.version_id
+
+    response = test_client.post(
+        "/auth/token",
+        data={"username": "test@example.com", "password": "password"},
+    )
+    assert response.status_code == 200
+
+    db_session.refresh(user)
+    assert user.hashed_password != outdated
+    assert not password_context().needs_update(user.hashed_password)
+    assert password_context().verify("password", user.hashed_password)
+    # The representation of the user did not change
+    assert user.version_id == version_id
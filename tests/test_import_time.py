@@ -0,0 +1,35 @@
+import os
+import subprocess
+import sys
+
+# Seconds the fastest of a few imports of the application may take, see
+# `python -m benchmarks.import_time` for where the time goes
+IMPORT_TIME_BUDGET = float(os.getenv("IMPORT_TIME_BUDGET", 2.0))
+
+# Loaded on first use, see `app.core.security.preload`
+LAZY_MODULES = ["jose.jwt", "passlib.context"]
+
+_IMPORT = f"""
+import sys, time
+start = time.perf_counter()
+import app.api.main
+print(time.perf_counter() - start)
+print(",".join(m for m in {LAZY_MODULES!r} if m in sys.modules))
+"""
+
+
+def import_app() -> tuple[float, str]:
+    process = subprocess.run(
+        [sys.executable, "-c", _IMPORT],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    elapsed, loaded = process.stdout.splitlines()[-2:]
+    return float(elapsed), loaded
+
+
+def test_import_time():
+    elapsed, loaded = min(import_app() for _ in range(3))
+    assert elapsed < IMPORT_TIME_BUDGET
+    assert loaded == ""
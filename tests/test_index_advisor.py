@@ -0,0 +1,71 @@
+import shutil
+
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+
+from app.db.index_advisor import (
+    METADATA,
+    read_statements,
+    unindexed_filters,
+    unindexed_foreign_keys,
+    write_revision,
+)
+
+LOG = """\
+2026-10-17 10:00:00 UTC [12] LOG:  duration: 1.2 ms  execute __asyncpg_stmt_1__: \
+SELECT "user".id, institution_1.name FROM "user"
+	LEFT OUTER JOIN institution AS institution_1 ON institution_1.id = "user".institution_id
+	WHERE "user".role = $1::user_role_enum AND "user".email = $2
+2026-10-17 10:00:01 UTC [12] LOG:  statement: SELECT * FROM institution WHERE membership = 3
+SELECT id FROM "user"
+WHERE enabled IS true;
+"""
+
+
+def test_unindexed_foreign_keys():
+    # Indexes leading with the columns of the foreign key cover it
+    assert unindexed_foreign_keys(METADATA["app"]) == []
+
+    recommendations = {
+        (r.table, r.columns) for r in unindexed_foreign_keys(METADATA["data"])
+    }
+    assert ("conference_roster", ("conferenceID",)) in recommendations
+    assert ("reviews", ("revisionID",)) in recommendations
+    assert ("paper_status", ("paperID",)) in recommendations
+    # Unique columns are indexed
+    assert ("conference_editors", ("userID",)) not in recommendations
+
+
+def test_unindexed_filters():
+    statements = list(read_statements(LOG.splitlines(keepends=True)))
+    assert len(statements) == 3
+
+    recommendations = unindexed_filters(statements, METADATA["app"])
+    # Joins on the primary key and filters on unique columns are indexed
+    assert [(r.table, r.columns) for r in recommendations] == [
+        ("user", ("role",)),
+        ("institution", ("membership",)),
+        ("user", ("enabled",)),
+    ]
+    assert unindexed_filters(statements, METADATA["app"], min_count=2) == []
+
+
+def test_write_revision(tmp_path):
+    shutil.copytree("alembic", tmp_path / "alembic")
+    config = Config()
+    config.set_main_option("script_location", str(tmp_path / "alembic"))
+    head = ScriptDirectory.from_config(config).get_current_head()
+
+    statements = ['SELECT id FROM "user" WHERE role = $1']
+    path = write_revision(
+        config, unindexed_filters(statements, METADATA["app"]), "index user role"
+    )
+
+    script = ScriptDirectory.from_config(config).get_revision("head")
+    assert script.path == path
+    assert script.down_revision == head
+    with open(path) as f:
+        source = f.read()
+    assert "'ix_user_role'" in source
+    assert "postgresql_concurrently=True" in source
+    compile(source, path, "exec")
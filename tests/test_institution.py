@@ -5,17 +5,20 @@ from sqlalchemy.orm import Session
 from app.api.main import app
 from app.core.security import create_access_token, get_password_hash
 from app.api.deps import get_db
-from app import schemas
+from app import crud, schemas
 from app.models import User, Institution
-from tests.conftest import db_session, setup_sadmin, test_client, TestingSessionLocal
+from tests.conftest import (
+    assert_max_queries,
+    db_session,
+    setup_sadmin,
+    test_client,
+    TestingAsyncSessionLocal,
+)
 
 
-def override_get_db():
-    db: Session = TestingSessionLocal()
-    try:
+async def override_get_db():
+    async with TestingAsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
 app.dependency_overrides[get_db] = override_get_db
@@ -204,3 +207,391 @@ def test_delete_institution(
         success_message["message"]
         == f"Institution with ID '{institution.id}' has been deleted"
     )
+
+
+def test_read_all_institution_details_cursor_pagination(
+    test_client: TestClient, db_session: Session, setup_sadmin: schemas.User
+):
+    # Create test institutions in the database
+    for i in range(5):
+        db_session.add(
+            Institution(
+                name=f"Institution {i}",
+                address=f"Address {i}",
+                email=f"institution{i}@example.com",
+                contactno=f"123456789{i}",
+            )
+        )
+    db_session.commit()
+
+    access_token = create_access_token(setup_sadmin.id)
+    headers = {"Authorization": f"Bearer {access_token}"}
+
+    # Send a GET request for the first page
+    response = test_client.get("/institutions/?limit=3", headers=headers)
+    assert response.status_code == 200
+    assert [i["name"] for i in response.json()] == [
+        "Institution 0",
+        "Institution 1",
+        "Institution 2",
+    ]
+    cursor = response.headers["X-Next-Cursor"]
+
+    # The last page carries no cursor
+    response = test_client.get(
+        "/institutions/", params={"limit": 3, "cursor": cursor}, headers=headers
+    )
+    assert response.status_code == 200
+    assert [i["name"] for i in response.json()] == ["Institution 3", "Institution 4"]
+    assert "X-Next-Cursor" not in response.headers
+
+    # Offset pagination keeps working for older clients
+    response = test_client.get("/institutions/?skip=4&limit=3", headers=headers)
+    assert response.status_code == 200
+    assert [i["name"] for i in response.json()] == ["Institution 4"]
+
+
+def test_read_all_users_of_institution(
+    test_client: TestClient, db_session: Session, setup_sadmin: schemas.User
+):
+    # Create an institution with a few users in the database
+    institution = Institution(
+        name="Test Institution",
+        address="Test Address",
+        email="testemail@example.com",
+        contactno="9876543210",
+    )
+    db_session.add(institution)
+    db_session.commit()
+    for i in range(3):
+        db_session.add(
+            User(
+                name=f"User {i}",
+                email=f"user{i}@example.com",
+                contactno=f"123456789{i}",
+                hashed_password="not-a-real-hash",
+                institution_id=institution.id,
+            )
+        )
+    db_session.commit()
+
+    access_token = create_access_token(setup_sadmin.id)
+    headers = {"Authorization": f"Bearer {access_token}"}
+
+    # Send a GET request for the first page, including the total count
+    response = test_client.get(
+        f"/institutions/{institution.id}/users",
+        params={"limit": 2, "include_total": True},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    assert [u["name"] for u in response.json()] == ["User 0", "User 1"]
+    assert response.headers["X-Total-Count"] == "3"
+
+    # Follow the cursor to the last page
+    response = test_client.get(
+        f"/institutions/{institution.id}/users",
+        params={"limit": 2, "cursor": response.headers["X-Next-Cursor"]},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    assert [u["name"] for u in response.json()] == ["User 2"]
+    assert "X-Next-Cursor" not in response.headers
+    assert "X-Total-Count" not in response.headers
+
+    # Unknown institutions are reported as such
+    response = test_client.get(
+        f"/institutions/{institution.id + 1}/users", headers=headers
+    )
+    assert response.status_code == 404
+
+    # Forged cursors are rejected instead of reaching the database
+    for values in (["abc"], [{"a": 1}], [1, 2]):
+        response = test_client.get(
+            f"/institutions/{institution.id}/users",
+            params={"cursor": crud.user.encode_cursor("id", values)},
+            headers=headers,
+        )
+        assert response.status_code == 400
+
+
+def test_create_institutions_bulk(
+    test_client: TestClient, db_session: Session, setup_sadmin: schemas.User
+):
+    # Create an institution in the database
+    db_session.add(
+        Institution(
+            name="Institution 1",
+            address="Old Address",
+            email="institution1@example.com",
+            contactno="1234567890",
+        )
+    )
+    db_session.commit()
+
+    access_token = create_access_token(setup_sadmin.id)
+    headers = {
+        "Authorization": f"Bearer {access_token}",
+        "Content-Type": "application/x-ndjson",
+    }
+
+    # Upload institutions as NDJSON, updating the existing one
+    upload = "\n".join(
+        [
+            '{"name": "Institution 1", "address": "New Address", '
+            '"email": "institution1@example.com", "contactno": "1234567890"}',
+            '{"name": "Institution 2", "address": "Address 2", '
+            '"email": "institution2@example.com", "contactno": "9876543210"}',
+            "not json",
+        ]
+    )
+    response = test_client.post(
+        "/institutions/bulk?upsert=true", content=upload, headers=headers
+    )
+    assert response.status_code == 200
+
+    # Check the response body for the import report
+    result = response.json()
+    assert result["imported"] == 2
+    assert [error["row"] for error in result["errors"]] == [3]
+
+    # Check the existing institution was updated
+    response = test_client.get("/institutions/", headers=headers)
+    assert [(i["name"], i["address"]) for i in response.json()] == [
+        ("Institution 1", "New Address"),
+        ("Institution 2", "Address 2"),
+    ]
+
+
+def test_export_institutions(
+    test_client: TestClient, db_session: Session, setup_sadmin: schemas.User
+):
+    # Create test institutions in the database
+    for i in range(3):
+        db_session.add(
+            Institution(
+                name=f"Institution {i}",
+                address=f"Address {i}, City",
+                email=f"institution{i}@example.com",
+                contactno=f"123456789{i}",
+                membership=i,
+            )
+        )
+    db_session.commit()
+
+    access_token = create_access_token(setup_sadmin.id)
+    headers = {"Authorization": f"Bearer {access_token}"}
+
+    # Export the matching institutions as CSV, quoting fields as needed
+    response = test_client.get(
+        "/institutions/export",
+        params={"format": "csv", "columns": "name,address", "membership": 1},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.text.splitlines() == [
+        "name,address",
+        'Institution 1,"Address 1, City"',
+    ]
+
+
+def test_read_all_users_of_institution_query_count(
+    test_client: TestClient,
+    db_session: Session,
+    setup_sadmin: schemas.User,
+    assert_max_queries,
+):
+    # Create an institution with a few users in the database
+    institution = Institution(
+        name="Test Institution",
+        address="Test Address",
+        email="testemail@example.com",
+        contactno="9876543210",
+    )
+    db_session.add(institution)
+    db_session.commit()
+    for i in range(5):
+        db_session.add(
+            User(
+                name=f"User {i}",
+                email=f"user{i}@example.com",
+                contactno=f"123456789{i}",
+                hashed_password="not-a-real-hash",
+                institution_id=institution.id,
+            )
+        )
+    db_session.commit()
+
+    access_token = create_access_token(setup_sadmin.id)
+    headers = {"Authorization": f"Bearer {access_token}"}
+    test_client.get("/users/me", headers=headers)
+
+    # Reading the page of users with their institution and counting them does
+    # not depend on the number of users
+    with assert_max_queries(2):
+        response = test_client.get(
+            f"/institutions/{institution.id}/users",
+            params={"include_total": True},
+            headers=headers,
+        )
+    assert response.status_code == 200
+    assert len(response.json()) == 5
+
+
+def test_institution_conditional_requests(
+    test_client: TestClient, db_session: Session, setup_sadmin: schemas.User
+):
+    institution = Institution(
+        name="Test Institution",
+        address="Test Address",
+        email="testemail@example.com",
+        contactno="9876543210",
+    )
+    db_session.add(institution)
+    db_session.commit()
+
+    headers = {"Authorization": f"Bearer {create_access_token(setup_sadmin.id)}"}
+    url = f"/institutions/{institution.id}"
+    response = test_client.get(url, headers=headers)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert response.headers["Cache-Control"] == "private, no-cache"
+    assert response.headers["Vary"] == "Authorization"
+
+    # The client already has the institution
+    response = test_client.get(url, headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+
+    # Updates of another version of the institution are refused
+    response = test_client.put(
+        url,
+        json={"address": "New Address"},
+        headers={**headers, "If-Match": '"institution.0.0"'},
+    )
+    assert response.status_code == 412
+
+    response = test_client.put(
+        url, json={"address": "New Address"}, headers={**headers, "If-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+    response = test_client.get(url, headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["address"] == "New Address"
+
+    # Lists are tagged with a hash of their body
+    response = test_client.get("/institutions/", headers=headers)
+    etag = response.headers["ETag"]
+    response = test_client.get(
+        "/institutions/", headers={**headers, "If-None-Match": f"W/{etag}"}
+    )
+    assert response.status_code == 304
+
+
+def test_upsert_institutions_increments_version(
+    test_client: TestClient, db_session: Session, setup_sadmin: schemas.User
+):
+    institution = Institution(
+        name="Institution 1",
+        address="Old Address",
+        email="institution1@example.com",
+        contactno="1234567890",
+    )
+    db_session.add(institution)
+    db_session.commit()
+    assert institution.version_id == 1
+
+    headers = {
+        "Authorization": f"Bearer {create_access_token(setup_sadmin.id)}",
+        "Content-Type": "application/x-ndjson",
+    }
+    response = test_client.post(
+        "/institutions/bulk?upsert=true",
+        content='{"name": "Institution 1", "address": "New Address", '
+        '"email": "institution1@example.com", "contactno": "1234567890"}',
+        headers=headers,
+    )
+    assert response.status_code == 200
+    db_session.refresh(institution)
+    assert institution.version_id == 2
+
+
+def test_write_institutions_query_count(
+    test_client: TestClient,
+    db_session: Session,
+    setup_sadmin: schemas.User,
+    assert_max_queries,
+):
+    institution = Institution(
+        name="Test Institution",
+        address="Test Address",
+        email="testemail@example.com",
+        contactno="9876543210",
+    )
+    db_session.add(institution)
+    db_session.commit()
+    user = User(
+        name="Test User",
+        email="testuser@example.com",
+        contactno="1234567890",
+        hashed_password="not-a-real-hash",
+        institution_id=institution.id,
+    )
+    db_session.add(user)
+    db_session.commit()
+
+    headers = {"Authorization": f"Bearer {create_access_token(setup_sadmin.id)}"}
+    # Load the current user into the principal cache
+    test_client.get("/users/me", headers=headers)
+
+    with assert_max_queries(2) as statements:
+        response = test_client.put(
+            f"/institutions/{institution.id}",
+            json={"address": "New Address"},
+            headers=headers,
+        )
+    assert response.status_code == 200
+    assert response.json()["address"] == "New Address"
+    assert statements[-1].startswith("UPDATE institution")
+
+    # The users are detached by the statement deleting the institution
+    with assert_max_queries(1):
+        response = test_client.delete(f"/institutions/{institution.id}", headers=headers)
+    assert response.status_code == 200
+    db_session.refresh(user)
+    assert user.institution_id is None
+    assert user.version_id == 2
+
+
+def test_create_institution_duplicate(
+    test_client: TestClient,
+    db_session: Session,
+    setup_sadmin: schemas.User,
+    assert_max_queries,
+):
+    headers = {"Authorization": f"Bearer {create_access_token(setup_sadmin.id)}"}
+    test_client.get("/users/me", headers=headers)
+    institution_payload = {
+        "name": "New Institution",
+        "address": "New Address",
+        "email": "newemail@example.com",
+        "contactno": "1234567890",
+    }
+    with assert_max_queries(1):
+        response = test_client.post(
+            "/institutions/", json=institution_payload, headers=headers
+        )
+    assert response.status_code == 200
+
+    # Names are unique regardless of case
+    response = test_client.post(
+        "/institutions/",
+        json={**institution_payload, "name": "NEW INSTITUTION"},
+        headers=headers,
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Institution with this name already exists"
@@ -0,0 +1,110 @@
+from typing import List, Optional
+
+import pytest
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.orm import Session
+
+from app import schemas
+from app.crud.loading import loader_options
+from app.crud.projection import projection
+from app.data import models as data_models
+from app.data import schemas as data_schemas
+from app.models import Institution, User
+
+
+class ConferenceWithEditors(data_schemas.Conference):
+    coordinator: Optional[data_schemas.User]
+    editors: List[data_schemas.User]
+
+
+def test_loader_options_follow_response_model():
+    # Unwraps the List of a response model, and caches the derived options
+    options = loader_options(User, List[schemas.User])
+    assert len(options) == 1
+    assert loader_options(User, List[schemas.User]) is options
+
+    # Schemas without relationships need no options
+    assert loader_options(Institution, List[schemas.Institution]) == ()
+    assert loader_options(User, None) == ()
+
+
+def test_loader_options_load_association_proxies():
+    engine = create_engine("sqlite://")
+    data_models.Base.metadata.create_all(
+        engine,
+        tables=[
+            data_models.Institution.__table__,
+            data_models.User.__table__,
+            data_models.Conference.__table__,
+            data_models.ConferenceEditor.__table__,
+        ],
+    )
+
+    # Create conferences with a coordinator and a few editors each
+    with Session(engine) as db:
+        institution = data_models.Institution(
+            institutionID=1,
+            institutionName="Institution",
+            institutionAddress="Address",
+            emailID="institution@example.com",
+            contactNum="1234567890",
+            membership="Choice1",
+        )
+        for i in range(3):
+            conference = data_models.Conference(
+                conferenceID=i,
+                conferenceTheme=f"Theme {i}",
+                conferenceTrack="Track",
+                chairDesignation="Chair",
+                chairName="Chair",
+                coordinator=data_models.User(
+                    userID=10 * i,
+                    name=f"Coordinator {i}",
+                    email=f"coordinator{i}@example.com",
+                    password="not-a-real-hash",
+                    institution=institution,
+                ),
+            )
+            for j in range(1, 4):
+                conference.conferenceEditors.append(
+                    data_models.ConferenceEditor(
+                        conferenceEditorID=10 * i + j,
+                        editor=data_models.User(
+                            userID=10 * i + j,
+                            name=f"Editor {i}.{j}",
+                            email=f"editor{i}.{j}@example.com",
+                            password="not-a-real-hash",
+                            institution=institution,
+                        ),
+                    )
+                )
+            db.add(conference)
+        db.commit()
+
+    statements: List[str] = []
+    event.listen(
+        engine, "before_cursor_execute", lambda *args: statements.append(args[2])
+    )
+    options = loader_options(data_models.Conference, List[ConferenceWithEditors])
+    with Session(engine) as db:
+        conferences = db.scalars(
+            select(data_models.Conference).options(*options)
+        ).all()
+        db.expunge_all()
+
+    # Everything the schema reads was loaded by the conferences query and one
+    # query for the editors, whatever the number of conferences
+    assert len(statements) == 2
+    assert [
+        [editor.institution.institutionName for editor in conference.editors]
+        for conference in conferences
+    ] == [["Institution"] * 3] * 3
+    assert all(c.coordinator.institution is not None for c in conferences)
+
+
+def test_projection_rejects_collections():
+    class InstitutionWithUsers(schemas.Institution):
+        users: List[schemas.User] = []
+
+    with pytest.raises(ValueError):
+        projection(Institution, InstitutionWithUsers)
@@ -0,0 +1,134 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import CONTENT_TYPE_LATEST
+from sqlalchemy.orm import Session
+
+from app.api.main import app
+from app.core.config import settings
+from app.core.security import create_access_token
+from app.api.deps import get_db
+from app.db.metrics import QueryBudgetExceeded, QueryStats
+from app import schemas
+
+from tests.conftest import (
+    db_session,
+    test_client,
+    setup_sadmin,
+    TestingAsyncSessionLocal,
+)
+
+
+async def override_get_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+
+app.dependency_overrides[get_db] = override_get_db
+
+
+def sample(exposition: str, name: str) -> float:
+    for line in exposition.splitlines():
+        if line.startswith(name + " "):
+            return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"{name} not found in the exposition")
+
+
+# A worker of the server, recording requests in the metrics directory
+WORKER = """
+import os
+from app.api.middleware import REQUESTS, REQUESTS_IN_PROGRESS
+
+REQUESTS.labels(method="GET", route="/ping", status="200").inc({requests})
+REQUESTS_IN_PROGRESS.labels(method="GET").inc()
+print(os.getpid())
+"""
+
+# The worker serving the scrape, after the exit of another one
+SCRAPE = """
+from prometheus_client.multiprocess import mark_process_dead
+from app.api.main import read_metrics
+
+mark_process_dead({exited})
+print(read_metrics().body.decode())
+"""
+
+
+def test_merge_metrics_of_workers(tmp_path):
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)}
+
+    def run(code: str) -> str:
+        return subprocess.run(
+            [sys.executable, "-c", code],
+            env=env,
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout
+
+    exited = int(run(WORKER.format(requests=2)))
+    run(WORKER.format(requests=3))
+    exposition = run(SCRAPE.format(exited=exited))
+
+    # The counts of every worker are summed, including the exited one, and
+    # the gauges of the running workers only
+    route = 'method="GET",route="/ping",status="200"'
+    assert sample(exposition, f"http_requests_total{{{route}}}") == 5
+    assert sample(exposition, 'http_requests_in_progress{method="GET"}') == 1
+
+
+def test_read_metrics(
+    test_client: TestClient, db_session: Session, setup_sadmin: schemas.User
+):
+    access_token = create_access_token(setup_sadmin.id)
+    headers = {"Authorization": f"Bearer {access_token}"}
+
+    response = test_client.get(f"/users/{setup_sadmin.id}", headers=headers)
+    assert response.status_code == 200
+    response = test_client.get("/does-not-exist")
+    assert response.status_code == 404
+
+    response = test_client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == CONTENT_TYPE_LATEST
+    exposition = response.text
+
+    # Requests are labelled by route template rather than by path
+    labels = 'method="GET",route="/users/{user_id}"'
+    assert sample(exposition, f'http_requests_total{{{labels},status="200"}}') >= 1
+    unmatched = 'method="GET",route="<unmatched>",status="404"'
+    assert sample(exposition, f"http_requests_total{{{unmatched}}}") >= 1
+    assert sample(exposition, f"http_request_duration_seconds_count{{{labels}}}") >= 1
+
+    # Statements executed by the async session are attributed to the request
+    assert sample(exposition, f"http_request_db_statements_sum{{{labels}}}") >= 1
+    assert sample(exposition, f"http_request_db_duration_seconds_sum{{{labels}}}") > 0
+
+
+def test_repeated_statements_over_budget():
+    stats = QueryStats(repeat_budget=1, strict=True)
+    stats.record_shape("SELECT * FROM t WHERE t.id IN ($1::BIGINT)")
+    stats.record_shape("SELECT * FROM t WHERE t.id = $1::BIGINT")
+
+    # Statements differing only in the size of an IN list have the same shape
+    with pytest.raises(QueryBudgetExceeded):
+        stats.record_shape("SELECT * FROM t WHERE t.id IN ($1::BIGINT, $2::BIGINT)")
+
+
+def test_query_budget_raises_in_requests(
+    test_client: TestClient,
+    db_session: Session,
+    setup_sadmin: schemas.User,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    access_token = create_access_token(setup_sadmin.id)
+    headers = {"Authorization": f"Bearer {access_token}"}
+
+    # Every statement is over a budget of no repetition at all
+    monkeypatch.setattr(settings, "QUERY_BUDGET_MODE", "raise")
+    monkeypatch.setattr(settings, "QUERY_REPEAT_BUDGET", 0)
+    with pytest.raises(QueryBudgetExceeded):
+        test_client.get(f"/users/{setup_sadmin.id}", headers=headers)
@@ -0,0 +1,53 @@
+from sqlalchemy import Index, MetaData, text
+
+from app import prestart
+from app.db.base import Base
+from app.db.schema import (
+    alembic_head,
+    read_schema_version,
+    schema_fingerprint,
+    store_schema_fingerprint,
+)
+from tests.conftest import engine
+
+
+def test_schema_fingerprint():
+    assert schema_fingerprint() == schema_fingerprint()
+
+    metadata = MetaData()
+    for table in Base.metadata.sorted_tables:
+        table.to_metadata(metadata)
+    Index("ix_user_name", metadata.tables["user"].c.name)
+    assert schema_fingerprint(metadata) != schema_fingerprint()
+
+
+def test_schema_is_current(monkeypatch):
+    monkeypatch.setattr(prestart, "engine", engine)
+    head, fingerprint = alembic_head(), schema_fingerprint()
+    try:
+        with engine.begin() as connection:
+            assert read_schema_version(connection) is None
+            connection.execute(
+                text(
+                    "CREATE TABLE alembic_version "
+                    "(version_num VARCHAR(32) NOT NULL PRIMARY KEY)"
+                )
+            )
+            connection.execute(
+                text("INSERT INTO alembic_version VALUES (:head)"), {"head": head}
+            )
+            assert read_schema_version(connection) == (head, None)
+        # Migrated without storing the fingerprint
+        assert not prestart.schema_is_current()
+
+        with engine.begin() as connection:
+            store_schema_fingerprint(connection, fingerprint)
+        assert prestart.schema_is_current()
+
+        # Migrated by an older version of the application
+        with engine.begin() as connection:
+            store_schema_fingerprint(connection, "0" * len(fingerprint))
+        assert not prestart.schema_is_current()
+    finally:
+        with engine.begin() as connection:
+            connection.execute(text("DROP TABLE IF EXISTS alembic_version"))
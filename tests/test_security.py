@@ -0,0 +1,139 @@
+import asyncio
+import dataclasses
+from datetime import timedelta
+
+import pytest
+from jose import JWTError
+from prometheus_client import REGISTRY
+
+from app.core import security
+from app.core.config import settings
+from app.core.hashing import (
+    ARGON2_MIN_TIME_COST,
+    BCRYPT_MAX_ROUNDS,
+    BCRYPT_MIN_ROUNDS,
+    HashingPolicy,
+    calibrate,
+)
+from app.core.security import (
+    PasswordHasher,
+    PasswordHashingOverloaded,
+    create_access_token,
+    decode_access_token,
+    token_cache,
+)
+
+# Cheap enough to hash in tests
+FAST_BCRYPT = HashingPolicy(bcrypt_rounds=4)
+FAST_ARGON2 = HashingPolicy(
+    scheme="argon2", argon2_time_cost=2, argon2_memory_cost=1024
+)
+
+
+def test_password_hasher_round_trip():
+    hasher = PasswordHasher(max_workers=1)
+
+    async def hash_and_verify():
+        hashed = await hasher.hash("password")
+        return (
+            await hasher.verify("password", hashed),
+            await hasher.verify("wrong", hashed),
+        )
+
+    try:
+        assert asyncio.run(hash_and_verify()) == (True, False)
+    finally:
+        hasher.shutdown()
+
+    stats = hasher.stats()
+    assert stats["submitted"] == 3
+    assert stats["pending"] == 0
+    assert stats["latency_max_ms"] > 0
+
+
+def test_password_hasher_rejects_when_saturated():
+    hasher = PasswordHasher(max_workers=1, max_pending=2)
+
+    async def hash_many():
+        return await asyncio.gather(
+            *(hasher.hash("password") for _ in range(3)), return_exceptions=True
+        )
+
+    try:
+        results = asyncio.run(hash_many())
+    finally:
+        hasher.shutdown()
+
+    assert sum(isinstance(r, PasswordHashingOverloaded) for r in results) == 1
+    assert hasher.stats()["rejected"] == 1
+
+
+def test_decode_access_token_is_cached(monkeypatch):
+    token = create_access_token(42)
+    token_cache.clear()
+    hits = token_cache.stats()["hits"]
+
+    assert decode_access_token(token).sub == 42
+    assert decode_access_token(token).sub == 42
+    assert token_cache.stats()["hits"] == hits + 1
+
+    # Changing the secret key flushes the cache and invalidates the token
+    monkeypatch.setattr(settings, "SECRET_KEY", "another-secret-key")
+    with pytest.raises(JWTError):
+        decode_access_token(token)
+    assert token_cache.stats()["size"] == 0
+
+
+def test_decode_access_token_rejects_expired_token():
+    token = create_access_token(42, expires_delta=timedelta(seconds=-1))
+    with pytest.raises(JWTError):
+        decode_access_token(token)
+    with pytest.raises(JWTError):
+        decode_access_token(token)
+
+
+def test_calibrate_stays_within_bounds():
+    assert calibrate(HashingPolicy(), budget=0.001).bcrypt_rounds == BCRYPT_MIN_ROUNDS
+    assert calibrate(HashingPolicy(), budget=3600).bcrypt_rounds == BCRYPT_MAX_ROUNDS
+    policy = calibrate(FAST_ARGON2, budget=0.001)
+    assert policy.argon2_time_cost == ARGON2_MIN_TIME_COST
+    assert policy.argon2_memory_cost == FAST_ARGON2.argon2_memory_cost
+
+
+def test_policy_upgrades_outdated_hashes():
+    bcrypt_hash = FAST_BCRYPT.context().hash("password")
+    context = FAST_ARGON2.context()
+    assert context.verify_and_update("wrong", bcrypt_hash) == (False, None)
+    valid, new_hash = context.verify_and_update("password", bcrypt_hash)
+    assert valid and new_hash.startswith("$argon2id$")
+    assert context.verify_and_update("password", new_hash) == (True, None)
+
+    # Hashes of a higher cost are kept
+    cheaper = dataclasses.replace(FAST_ARGON2, argon2_time_cost=1)
+    assert cheaper.context().verify_and_update("password", new_hash) == (True, None)
+    assert HashingPolicy(bcrypt_rounds=5).context().needs_update(bcrypt_hash)
+    assert not HashingPolicy(bcrypt_rounds=4).context().needs_update(bcrypt_hash)
+
+
+def test_password_hasher_uses_configured_policy(monkeypatch):
+    monkeypatch.setattr(security, "_hashing_policy", None)
+    security.configure_password_hashing(FAST_ARGON2)
+    hasher = PasswordHasher(max_workers=1)
+
+    async def hash_and_verify():
+        hashed = await hasher.hash("password")
+        return hashed, await hasher.verify_and_update("password", hashed)
+
+    try:
+        hashed, verification = asyncio.run(hash_and_verify())
+    finally:
+        hasher.shutdown()
+        monkeypatch.undo()
+        security.password_context.cache_clear()
+
+    assert hashed.startswith("$argon2id$v=19$m=1024,t=2,p=1$")
+    assert verification.valid and verification.new_hash is None
+    assert verification.scheme == "argon2"
+    assert REGISTRY.get_sample_value(
+        "password_verify_duration_seconds_count", {"scheme": "argon2"}
+    )
@@ -1,30 +1,35 @@
+import json
 import os
 import pytest
+from fastapi.encoders import jsonable_encoder
 from fastapi.testclient import TestClient
 
+from sqlalchemy import select, update
 from sqlalchemy.orm import Session
 
 from app.api.main import app
-from app.core.security import create_access_token, get_password_hash
+from app.core.security import (
+    create_access_token,
+    get_password_hash,
+    password_hasher,
+)
 from app.api.deps import get_db
 from app import crud
 from app import schemas
-from app.models import User
+from app.models import Institution, User
 
 from tests.conftest import (
+    assert_max_queries,
     db_session,
     test_client,
     setup_sadmin,
-    TestingSessionLocal,
+    TestingAsyncSessionLocal,
 )
 
 
-def override_get_db():
-    db = TestingSessionLocal()
-    try:
+async def override_get_db():
+    async with TestingAsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
 app.dependency_overrides[get_db] = override_get_db
@@ -221,3 +226,627 @@ def test_create_user_open(test_client: TestClient, db_session: Session):
     created_user = response.json()
     assert created_user["name"] == "New User"
     assert created_user["email"] == "newuser@example.com"
+
+
+def test_read_users_cursor_pagination(
+    test_client: TestClient, db_session: Session, setup_sadmin: schemas.User
+):
+    # Create test users in the database
+    for i in range(3):
+        db_session.add(
+            User(
+                name=f"User {i}",
+                email=f"user{i}@example.com",
+                contactno=f"123456789{i}",
+                role="Admin",
+                hashed_password="not-a-real-hash",
+            )
+        )
+    db_session.commit()
+
+    access_token = create_access_token(setup_sadmin.id)
+    headers = {"Authorization": f"Bearer {access_token}"}
+
+    # Walk through the pages by following the cursor header
+    names = []
+    params = {"limit": 2, "order_by": "-email"}
+    while True:
+        response = test_client.get("/users/", params=params, headers=headers)
+        assert response.status_code == 200
+        names.extend(user["name"] for user in response.json())
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params["cursor"] = response.headers["X-Next-Cursor"]
+
+    assert names == ["User 2", "User 1", "User 0", setup_sadmin.name]
+
+    # A cursor is bound to the ordering it was issued for
+    params["order_by"] = "name"
+    response = test_client.get("/users/", params=params, headers=headers)
+    assert response.status_code == 400
+
+    # Only allow-listed columns can be used for ordering
+    response = test_client.get(
+        "/users/", params={"order_by": "hashed_password"}, headers=headers
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        ["id", "abc"],
+        ["id", {"a": 1}],
+        ["id", True],
+        ["id", 2**63],
+        ["id", 1, 2],
+        ["id"],
+        ["name", None, 1],
+        ["name", "User", "1"],
+    ],
+)
+def test_read_users_rejects_malformed_cursor(
+    test_client: TestClient, setup_sadmin: schemas.User, values: list
+):
+    headers = {"Authorization": f"Bearer {create_access_token(setup_sadmin.id)}"}
+    params = {
+        "order_by": values[0],
+        "cursor": crud.user.encode_cursor(values[0], values[1:]),
+    }
+    response = test_client.get("/users/", params=params, headers=headers)
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid cursor"}
+
+
+def test_cursor_pagination_over_nullable_column(
+    db_session: Session, setup_sadmin: schemas.User, monkeypatch
+):
+    for i, department in enumerate(["B", None, "A", None, "B"]):
+        db_session.add(
+            User(
+                name=f"User {i}",
+                email=f"user{i}@example.com",
+                contactno=f"123456789{i}",
+                department=department,
+                hashed_password="not-a-real-hash",
+            )
+        )
+    db_session.commit()
+    monkeypatch.setattr(crud.user, "cursor_columns", ("id", "department"))
+
+    for order_by in ("department", "-department"):
+        expected = list(
+            db_session.scalars(
+                crud.user._apply_cursor(
+                    select(User.id), cursor=None, order_by=order_by
+                )[0]
+            )
+        )
+        ids, cursor = [], None
+        while True:
+            users, cursor = crud.user.get_multi_by_cursor(
+                db_session, cursor=cursor, limit=2, order_by=order_by
+            )
+            ids.extend(user.id for user in users)
+            if cursor is None:
+                break
+        assert ids == expected
+
+
+def test_update_user_invalidates_cached_principal(
+    test_client: TestClient, db_session: Session, setup_sadmin: schemas.User
+):
+    # Create a test user in the database
+    user = User(
+        name="Test User",
+        email="testuser@example.com",
+        contactno="1234567890",
+        role="Admin",
+        enabled=True,
+        hashed_password=get_password_hash("pwd1"),
+    )
+    db_session.add(user)
+    db_session.commit()
+
+    user_headers = {"Authorization": f"Bearer {create_access_token(user.id)}"}
+    sadmin_headers = {"Authorization": f"Bearer {create_access_token(setup_sadmin.id)}"}
+
+    # The user's principal is cached by the first authenticated request
+    response = test_client.get(f"/users/{setup_sadmin.id}", headers=user_headers)
+    assert response.status_code == 200
+
+    # Disable the user
+    response = test_client.put(
+        f"/users/{user.id}", json={"enabled": False}, headers=sadmin_headers
+    )
+    assert response.status_code == 200
+
+    # The cached principal is no longer used
+    response = test_client.get(f"/users/{setup_sadmin.id}", headers=user_headers)
+    assert response.status_code == 403
+
+
+def test_create_users_bulk(
+    test_client: TestClient, db_session: Session, setup_sadmin: schemas.User
+):
+    access_token = create_access_token(setup_sadmin.id)
+    headers = {"Authorization": f"Bearer {access_token}", "Content-Type": "text/csv"}
+
+    # Upload users as CSV, including an invalid row and an existing user
+    upload = (
+        "name,email,contactno,password,role\n"
+        "User 1,user1@example.com,1234567890,pwd1,Admin\n"
+        '"Doe, Jane",jane@example.com,2345678901,pwd2,\n'
+        "User 3,not-an-email,3456789012,pwd3,Author\n"
+        f"Sadmin,{setup_sadmin.email},4567890123,pwd4,Author\n"
+    )
+    response = test_client.post("/users/bulk", content=upload, headers=headers)
+    assert response.status_code == 200
+
+    # Check the response body for the import report
+    result = response.json()
+    assert result["imported"] == 2
+    assert [error["row"] for error in result["errors"]] == [3, 4]
+
+    # The password of the imported users is hashed, and they are not enabled
+    response = test_client.post(
+        "/auth/token", data={"username": "jane@example.com", "password": "pwd2"}
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Inactive user"
+    user = crud.user.get_by_email(db_session, email="jane@example.com")
+    assert user.name == "Doe, Jane"
+    assert user.role is None
+
+
+def test_create_users_bulk_reports_only_rows_violating_constraints(
+    test_client: TestClient,
+    db_session: Session,
+    setup_sadmin: schemas.User,
+    monkeypatch,
+):
+    hashed = []
+    hash_many = password_hasher.hash_many
+
+    async def count_hashes(passwords):
+        hashed.extend(passwords)
+        return await hash_many(passwords)
+
+    monkeypatch.setattr(password_hasher, "hash_many", count_hashes)
+    headers = {
+        "Authorization": f"Bearer {create_access_token(setup_sadmin.id)}",
+        "Content-Type": "text/csv",
+    }
+    upload = (
+        "name,email,contactno,password,institution_id\n"
+        "User 1,user1@example.com,1234567890,pwd1,\n"
+        f"User 2,user2@example.com,{setup_sadmin.contactno},pwd2,\n"
+        "User 3,user3@example.com,3456789012,pwd3,999999\n"
+        "User 4,user4@example.com,4567890123,pwd4,\n"
+    )
+    response = test_client.post("/users/bulk", content=upload, headers=headers)
+    assert response.status_code == 200
+    assert response.json() == {
+        "imported": 2,
+        "errors": [
+            {"row": 2, "detail": "A record with this contactno already exists"},
+            {"row": 3, "detail": "The referenced institution_id does not exist"},
+        ],
+    }
+    # The rows saved again one at a time keep the hashes of the chunk
+    assert sorted(hashed) == ["pwd1", "pwd2", "pwd3", "pwd4"]
+    emails = {user.email for user in crud.user.get_multi(db_session)}
+    assert {"user1@example.com", "user4@example.com"} <= emails
+
+
+def test_create_users_bulk_matches_email_regardless_of_case(
+    test_client: TestClient, db_session: Session, setup_sadmin: schemas.User
+):
+    headers = {
+        "Authorization": f"Bearer {create_access_token(setup_sadmin.id)}",
+        "Content-Type": "text/csv",
+    }
+    upload = (
+        "name,email,contactno,password,role\n"
+        "User 1,user1@example.com,1234567890,pwd1,Admin\n"
+        f"Sadmin,{setup_sadmin.email.upper()},{setup_sadmin.contactno},pwd,Author\n"
+    )
+
+    # The existing user is reported, without failing the other rows
+    response = test_client.post("/users/bulk", content=upload, headers=headers)
+    assert response.status_code == 200
+    assert response.json() == {
+        "imported": 1,
+        "errors": [{"row": 2, "detail": "A record with this email already exists"}],
+    }
+
+    # And updated with upsert, keeping its email
+    response = test_client.post(
+        "/users/bulk", params={"upsert": True}, content=upload, headers=headers
+    )
+    assert response.status_code == 200
+    assert response.json() == {"imported": 2, "errors": []}
+    db_session.expire_all()
+    sadmin = crud.user.get(db_session, setup_sadmin.id)
+    assert (sadmin.email, sadmin.role) == (setup_sadmin.email, "Author")
+
+
+def test_create_users_bulk_with_case_variants_in_one_upload(
+    test_client: TestClient, db_session: Session, setup_sadmin: schemas.User
+):
+    headers = {
+        "Authorization": f"Bearer {create_access_token(setup_sadmin.id)}",
+        "Content-Type": "text/csv",
+    }
+    upload = (
+        "name,email,contactno,password\n"
+        "User 1,user1@example.com,1234567890,pwd1\n"
+        "User 1 again,USER1@example.com,1234567890,pwd1\n"
+    )
+    response = test_client.post("/users/bulk", content=upload, headers=headers)
+    assert response.status_code == 200
+    assert response.json() == {
+        "imported": 1,
+        "errors": [{"row": 2, "detail": "A record with this email already exists"}],
+    }
+
+    # With upsert, the second row updates the user the first one saved
+    response = test_client.post(
+        "/users/bulk", params={"upsert": True}, content=upload, headers=headers
+    )
+    assert response.status_code == 200
+    assert response.json() == {"imported": 2, "errors": []}
+    user = crud.user.get_by_email(db_session, email="user1@example.com")
+    assert user.name == "User 1 again"
+
+
+def test_create_users_bulk_reports_rows_not_in_utf8(
+    test_client: TestClient, setup_sadmin: schemas.User
+):
+    headers = {"Authorization": f"Bearer {create_access_token(setup_sadmin.id)}"}
+    rows = [
+        {"name": "User 1", "email": "user1@example.com", "contactno": "1234567890"},
+        {"name": "Jos\u00e9", "email": "jose@example.com", "contactno": "2345678901"},
+    ]
+    upload = b"\n".join(
+        json.dumps({**row, "password": "pwd"}, ensure_ascii=False).encode("latin-1")
+        for row in rows
+    )
+    response = test_client.post(
+        "/users/bulk",
+        content=upload,
+        headers={**headers, "Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    assert response.json() == {
+        "imported": 1,
+        "errors": [{"row": 2, "detail": "Not valid UTF-8"}],
+    }
+
+    csv_headers = {**headers, "Content-Type": "text/csv"}
+    upload = (
+        "name,email,contactno,password\n"
+        "Jos\u00e9,jose@example.com,2345678901,pwd\n"
+        "User 3,user3@example.com,3456789012,pwd\n"
+    ).encode("latin-1")
+    response = test_client.post("/users/bulk", content=upload, headers=csv_headers)
+    assert response.status_code == 200
+    assert response.json() == {
+        "imported": 1,
+        "errors": [{"row": 1, "detail": "Not valid UTF-8"}],
+    }
+
+    # Nothing can be imported without the header row
+    response = test_client.post(
+        "/users/bulk", content="n\u00e4me\n".encode("latin-1"), headers=csv_headers
+    )
+    assert response.status_code == 400
+
+
+def test_upsert_users_bulk_invalidates_cached_principal(
+    test_client: TestClient, setup_sadmin: schemas.User
+):
+    headers = {"Authorization": f"Bearer {create_access_token(setup_sadmin.id)}"}
+
+    # The principal of the superadmin is cached by the first request
+    response = test_client.get("/users/", headers=headers)
+    assert response.status_code == 200
+
+    # Demote the superadmin through a bulk upsert
+    upload = (
+        "name,email,contactno,password,role\n"
+        f"Sadmin,{setup_sadmin.email},{setup_sadmin.contactno},pwd,Author\n"
+    )
+    response = test_client.post(
+        "/users/bulk",
+        params={"upsert": True},
+        content=upload,
+        headers={**headers, "Content-Type": "text/csv"},
+    )
+    assert response.status_code == 200
+    assert response.json() == {"imported": 1, "errors": []}
+
+    # The cached principal is no longer used
+    response = test_client.get("/users/", headers=headers)
+    assert response.status_code != 200
+
+
+def test_export_users(
+    test_client: TestClient, db_session: Session, setup_sadmin: schemas.User
+):
+    # Create test users in the database
+    for i in range(3):
+        db_session.add(
+            User(
+                name=f"User {i}",
+                email=f"user{i}@example.com",
+                contactno=f"123456789{i}",
+                hashed_password="not-a-real-hash",
+                role="Author",
+                enabled=bool(i % 2),
+            )
+        )
+    db_session.commit()
+
+    access_token = create_access_token(setup_sadmin.id)
+    headers = {"Authorization": f"Bearer {access_token}"}
+
+    # Export the selected columns of the matching users as NDJSON
+    response = test_client.get(
+        "/users/export",
+        params={"columns": "name,email", "role": "Author", "enabled": False},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.text.splitlines() == [
+        '{"name": "User 0", "email": "user0@example.com"}',
+        '{"name": "User 2", "email": "user2@example.com"}',
+    ]
+
+    # Export every column as CSV, starting with the header row
+    response = test_client.get(
+        "/users/export", params={"format": "csv"}, headers=headers
+    )
+    assert response.status_code == 200
+    assert response.headers["content-disposition"] == (
+        'attachment; filename="users.csv"'
+    )
+    lines = response.text.splitlines()
+    assert lines[0] == (
+        "id,name,email,contactno,title,department,role,enabled,institution_id"
+    )
+    assert len(lines) == 5
+
+    # Columns outside of the allow-list are rejected before streaming
+    response = test_client.get(
+        "/users/export", params={"columns": "hashed_password"}, headers=headers
+    )
+    assert response.status_code == 400
+
+
+def test_read_users_query_count(
+    test_client: TestClient,
+    db_session: Session,
+    setup_sadmin: schemas.User,
+    assert_max_queries,
+):
+    # Create users spread over several institutions
+    institutions = [
+        Institution(
+            name=f"Institution {i}",
+            address=f"Address {i}",
+            email=f"institution{i}@example.com",
+            contactno=f"123456789{i}",
+        )
+        for i in range(3)
+    ]
+    db_session.add_all(institutions)
+    db_session.commit()
+    for i in range(9):
+        db_session.add(
+            User(
+                name=f"User {i}",
+                email=f"user{i}@example.com",
+                contactno=f"123456789{i}",
+                hashed_password="not-a-real-hash",
+                institution_id=institutions[i % 3].id,
+            )
+        )
+    db_session.commit()
+
+    access_token = create_access_token(setup_sadmin.id)
+    headers = {"Authorization": f"Bearer {access_token}"}
+
+    # The first request loads the current user into the principal cache
+    with assert_max_queries(2):
+        response = test_client.get("/users/", headers=headers)
+    assert response.status_code == 200
+
+    # The institutions of the users are joined, not loaded once per user
+    with assert_max_queries(1):
+        response = test_client.get("/users/", headers=headers)
+    assert response.status_code == 200
+    assert len({user["institution"]["id"] for user in response.json()[1:]}) == 3
+
+
+def test_read_users_matches_orm_serialization(
+    test_client: TestClient, db_session: Session, setup_sadmin: schemas.User
+):
+    # Create users with and without an institution
+    institution = Institution(
+        name="Institution",
+        address="Address",
+        email="institution@example.com",
+        contactno="1234567890",
+    )
+    db_session.add(institution)
+    db_session.commit()
+    for i in range(4):
+        db_session.add(
+            User(
+                name=f"User {i}",
+                email=f"user{i}@example.com",
+                contactno=f"123456789{i}",
+                title="Dr." if i % 2 else None,
+                role="Reviewer",
+                hashed_password="not-a-real-hash",
+                institution_id=institution.id if i % 2 else None,
+            )
+        )
+    db_session.commit()
+
+    access_token = create_access_token(setup_sadmin.id)
+    headers = {"Authorization": f"Bearer {access_token}"}
+
+    # The projected users serialize exactly like the validated ORM objects
+    expected = [
+        jsonable_encoder(schemas.User.from_orm(user))
+        for user in crud.user.get_multi(db_session)
+    ]
+    response = test_client.get("/users/", headers=headers)
+    assert response.status_code == 200
+    assert response.json() == expected
+
+    response = test_client.get("/users/?skip=1", headers=headers)
+    assert response.json() == expected[1:]
+
+
+def test_get_current_user_information_not_modified(
+    test_client: TestClient, db_session: Session, setup_sadmin: schemas.User
+):
+    headers = {"Authorization": f"Bearer {create_access_token(setup_sadmin.id)}"}
+    response = test_client.get("/users/me", headers=headers)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    response = test_client.get("/users/me", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+
+    # Updating the user changes the tag of its representation
+    response = test_client.put(
+        f"/users/{setup_sadmin.id}",
+        json={"department": "Updated"},
+        headers={**headers, "If-Match": etag},
+    )
+    assert response.status_code == 200
+    response = test_client.get("/users/me", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["department"] == "Updated"
+
+
+def test_update_user_conflict(
+    test_client: TestClient,
+    db_session: Session,
+    setup_sadmin: schemas.User,
+    monkeypatch,
+):
+    get = crud.async_user.get
+
+    async def get_then_update_concurrently(db, id, **kwargs):
+        user = await get(db, id, **kwargs)
+        db_session.execute(
+            update(User)
+            .where(User.id == id)
+            .values(version_id=User.version_id + 1)
+            .execution_options(synchronize_session=False)
+        )
+        db_session.commit()
+        return user
+
+    monkeypatch.setattr(crud.async_user, "get", get_then_update_concurrently)
+    headers = {"Authorization": f"Bearer {create_access_token(setup_sadmin.id)}"}
+    response = test_client.put(
+        f"/users/{setup_sadmin.id}", json={"department": "Lost"}, headers=headers
+    )
+    assert response.status_code == 409
+    db_session.expire_all()
+    assert db_session.get(User, setup_sadmin.id).department != "Lost"
+
+
+def test_write_users_query_count(
+    test_client: TestClient,
+    db_session: Session,
+    setup_sadmin: schemas.User,
+    assert_max_queries,
+):
+    headers = {"Authorization": f"Bearer {create_access_token(setup_sadmin.id)}"}
+    # Load the current user into the principal cache
+    test_client.get("/users/me", headers=headers)
+
+    # The user is inserted and returned at once, the unique constraints
+    # rejecting duplicates
+    with assert_max_queries(1) as statements:
+        response = test_client.post(
+            "/users/",
+            json={
+                "name": "New User",
+                "email": "newuser@example.com",
+                "contactno": "1234567890",
+                "password": "pwd",
+            },
+            headers=headers,
+        )
+    assert response.status_code == 200
+    assert statements[-1].startswith('INSERT INTO "user"')
+    assert "RETURNING" in statements[-1]
+    user_id = response.json()["id"]
+
+    # The user is read for the 404 and If-Match checks, then updated and
+    # returned at once
+    with assert_max_queries(2) as statements:
+        response = test_client.put(
+            f"/users/{user_id}", json={"department": "Updated"}, headers=headers
+        )
+    assert response.status_code == 200
+    assert response.json()["department"] == "Updated"
+    assert statements[-1].startswith('UPDATE "user"')
+    assert "RETURNING" in statements[-1]
+
+    with assert_max_queries(1) as statements:
+        response = test_client.delete(f"/users/{user_id}", headers=headers)
+    assert response.status_code == 200
+    assert statements[0].startswith('DELETE FROM "user"')
+
+    with assert_max_queries(1):
+        response = test_client.delete(f"/users/{user_id}", headers=headers)
+    assert response.status_code == 404
+
+
+def test_create_user_duplicates(
+    test_client: TestClient, db_session: Session, setup_sadmin: schemas.User
+):
+    user_payload = {
+        "password": "password",
+        "contactno": "1234567890",
+        "email": "newuser@example.com",
+        "name": "New User",
+    }
+    response = test_client.post("/users/open", json=user_payload)
+    assert response.status_code == 200
+
+    # Emails are unique regardless of case
+    response = test_client.post(
+        "/users/open",
+        json={**user_payload, "email": "NewUser@example.com", "contactno": "2"},
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == (
+        "The user with this username already exists in the system"
+    )
+
+    headers = {"Authorization": f"Bearer {create_access_token(setup_sadmin.id)}"}
+    response = test_client.post(
+        "/users/",
+        json={**user_payload, "email": "other@example.com"},
+        headers=headers,
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == (
+        "The user with this contactno already exists in the system."
+    )
+
+    # The failed inserts left the session usable
+    user = crud.user.get_by_email(db_session, email="NEWUSER@example.com")
+    assert user is not None
+    assert user.email == "newuser@example.com"